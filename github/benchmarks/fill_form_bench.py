@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+fill_form Benchmark - Batched vs. Per-Field
+
+Loads the captured Address Book add form (profile_management/html) into a
+blank page and fills it with mapped sample profiles, once field by field and
+once in batched mode, then reports field fills per second for each.
+
+No OpenEMR instance is needed; all network requests are blocked so only the
+fill itself is timed.
+
+Usage:
+    uv run python benchmarks/fill_form_bench.py
+    uv run python benchmarks/fill_form_bench.py --rounds 20 --headed
+"""
+
+import asyncio
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from camoufox.async_api import AsyncCamoufox
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from profile_management import fill_form, map_profile_to_address
+
+FORM_HTML = sorted((ROOT_DIR / "profile_management" / "html").glob("02_add_form_iframe_*.html"))[-1]
+PROFILES_FILE = ROOT_DIR / "sample-profile-data.json"
+
+
+async def run_mode(page, records: list, rounds: int, batched: bool) -> dict:
+    """Fill every record `rounds` times and time it"""
+    html = FORM_HTML.read_text()
+    fields = 0
+    elapsed = 0.0
+    for _ in range(rounds):
+        for data in records:
+            await page.set_content(html)
+            started = time.perf_counter()
+            status = await fill_form(page.main_frame, data, batched=batched)
+            elapsed += time.perf_counter() - started
+            fields += sum(1 for s in status.values() if s == "ok")
+    return {
+        "mode": "batched" if batched else "per-field",
+        "fields": fields,
+        "seconds": round(elapsed, 3),
+        "fields_per_second": round(fields / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+async def main(rounds: int = 5, headless: bool = True):
+    profiles = json.loads(PROFILES_FILE.read_text())
+    records = [map_profile_to_address(p) for p in profiles]
+
+    print("=" * 70)
+    print("fill_form BENCHMARK")
+    print("=" * 70)
+    print(f"  Form: {FORM_HTML.name}")
+    print(f"  Records: {len(records)} x {rounds} round(s)")
+
+    async with AsyncCamoufox(headless=headless) as browser:
+        page = await browser.new_page()
+        # Only the fill is measured: keep the form's external assets out
+        await page.route("**/*", lambda route: route.abort())
+
+        results = [
+            await run_mode(page, records, rounds, batched=False),
+            await run_mode(page, records, rounds, batched=True),
+        ]
+
+    print("-" * 70)
+    for r in results:
+        print(f"  {r['mode']:<10} {r['fields']:>5} fields in {r['seconds']:>7}s  "
+              f"-> {r['fields_per_second']} fields/s")
+    if results[0]["fields_per_second"]:
+        print(f"  Speedup: {results[1]['fields_per_second'] / results[0]['fields_per_second']:.1f}x")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batched vs. per-field fill_form")
+    parser.add_argument("--rounds", type=int, default=5, help="Times to fill each sample record")
+    parser.add_argument("--headed", action="store_true", help="Show the browser")
+    args = parser.parse_args()
+
+    asyncio.run(main(rounds=args.rounds, headless=not args.headed))
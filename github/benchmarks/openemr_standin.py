@@ -0,0 +1,729 @@
+#!/usr/bin/env python3
+"""
+Offline OpenEMR Stand-In
+
+A small local HTTP server that answers the OpenEMR URLs the workflows use,
+so they can be run and benchmarked without demo.openemr.io:
+
+- login.php / main_screen.php:  login form and session cookie
+- tabs/main.php:                the tabs UI, with the menu built from
+                                analysis/menu_items.json, tab iframes,
+                                navigateTab()/activateTabByName(), the patient
+                                view model and the Select Encounter dropdown
+- dynamic_finder.php, demographics.php?set_pid=:  Finder and patient selection
+- newpatient/new.php + save.php, encounter_top.php (forms.php child),
+  history/encounters.php:       Create Visit, Current and Visit History
+- addrbook_list.php, addrbook_edit.php:  the captured Address Book pages from
+  profile_management/html, with their table and CSRF token regenerated from
+  the store and the save answering with the dialog-closing page
+
+Paths match OpenEMR under /openemr, so the navigation index and the HTTP
+modes work unchanged. Every response can be delayed (latency_ms, jitter_ms)
+to model a remote server. Records live in a StandinStore (in memory, or a
+JSON file with --store), seeded from the captured Address Book list plus
+optional synthetic patients and entries. The file is written once after
+seeding, then every SAVE_EVERY writes and on shutdown.
+
+Point the workflows at it with EMR_BASE_URL:
+
+    uv run python benchmarks/openemr_standin.py --port 8765 --latency-ms 40
+    EMR_BASE_URL=http://127.0.0.1:8765/openemr uv run python visits/visit_history.py --patient Belford
+
+Only what the workflows exercise is implemented; other menu items load a
+placeholder page.
+"""
+
+import argparse
+import html
+import json
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from emr_common.nav_index import MENU_ITEMS_FILE, path_key
+
+CAPTURE_DIR = ROOT_DIR / "profile_management" / "html"
+LIST_PAGE = sorted(CAPTURE_DIR.glob("01_address_book_iframe_*.html"))[-1]
+EDIT_PAGE = sorted(CAPTURE_DIR.glob("02_add_form_iframe_*.html"))[-1]
+
+PREFIX = "/openemr"
+MAIN_PATH = "/interface/main/tabs/main.php"
+LOGIN_PATH = "/interface/login/login.php"
+FINDER_PATH = "/interface/main/finder/dynamic_finder.php"
+DEMOGRAPHICS_PATH = "/interface/patient_file/summary/demographics.php"
+NEW_ENCOUNTER_PATH = "/interface/forms/newpatient/new.php"
+SAVE_ENCOUNTER_PATH = "/interface/forms/newpatient/save.php"
+ENCOUNTER_TOP_PATH = "/interface/patient_file/encounter/encounter_top.php"
+FORMS_PATH = "/interface/patient_file/encounter/forms.php"
+HISTORY_PATH = "/interface/patient_file/history/encounters.php"
+LIST_PATH = "/interface/usergroup/addrbook_list.php"
+EDIT_PATH = "/interface/usergroup/addrbook_edit.php"
+
+# Menu path -> (URL, tab) for the items the workflows use
+ROUTES = {
+    "Finder": (FINDER_PATH, "fin"),
+    "Patient > Dashboard": (DEMOGRAPHICS_PATH, "pat"),
+    "Patient > Visits > Create Visit": (f"{NEW_ENCOUNTER_PATH}?autoloaded=1&calenc=", "enc"),
+    "Patient > Visits > Current": (ENCOUNTER_TOP_PATH, "enc"),
+    "Patient > Visits > Visit History": (HISTORY_PATH, "enc"),
+    "Admin > Address Book": (LIST_PATH, "adm"),
+}
+CATEGORIES = ["Office Visit", "Established Patient", "New Patient", "Health and Behavioral Assessment"]
+PROVIDER = "Administrator Administrator"
+USERNAME, PASSWORD = "admin", "pass"
+SAVE_EVERY = 100  # store writes per save of a --store file
+
+SEED_PATIENTS = [
+    ("Phil", "Belford", "1972-02-09"),
+    ("Susan", "Underwood", "1967-02-08"),
+    ("Jason", "Ross", "1988-11-17"),
+    ("Nora", "Cohen", "1990-05-02"),
+    ("Wallace", "Buckley", "1958-07-30"),
+]
+SEED_SOAP = {
+    "subjective": "Patient reports intermittent headaches for two weeks.\nWorse in the mornings.",
+    "objective": "BP 128/82, HR 72, afebrile.",
+    "assessment": "Tension-type headache.",
+    "plan": "Hydration, sleep hygiene, review in 4 weeks.",
+}
+
+# Address Book list columns (captured header order) -> form field
+LIST_COLUMNS = [
+    ("Organization", "form_organization"), ("Name", None), ("Local", None), ("Type", "form_abook_type"),
+    ("Specialty", "form_specialty"), ("NPI", "form_npi"), ("Phone(W)", "form_phonew1"),
+    ("Mobile", "form_phonecell"), ("Fax", "form_fax"), ("Email", "form_email"), ("Street", "form_street"),
+    ("City", "form_city"), ("State", "form_state"), ("Postal", "form_zip"),
+]
+
+SCRIPT_TAG = re.compile(r"<script\b[^>]*\bsrc=[^>]*>\s*</script>", re.I)
+INLINE_SCRIPT = re.compile(r"<script\b(?![^>]*\bsrc=)[^>]*>.*?</script>", re.I | re.S)
+CSRF_INPUT = re.compile(r'(name="csrf_token_form" value=")[^"]*(")')
+TBODY = re.compile(r"<tbody>.*?</tbody>", re.S)
+CAPTURED_ROW = re.compile(r'<tr class="address_names[^>]*>(.*?)</tr>', re.S)
+CELL = re.compile(r"<td>(.*?)</td>", re.S)
+TAG = re.compile(r"<[^>]+>")
+
+# Dialog helpers for the Address Book pages (dialog.js is not served)
+DIALOG_SHIM = """<script>
+function dlgopen(url) { top.__standin.openDialog(new URL(url, location.href).href); }
+function dlgclose() { top.__standin.closeDialog(); }
+</script>"""
+# Address Book list handlers normally defined by the list page's scripts
+LIST_SHIM = """<script>
+function refreshme() { location.replace(location.pathname); }
+function doedclick_add(type) { dlgopen('addrbook_edit.php?type=' + encodeURIComponent(type)); }
+function doedclick_edit(userid) { dlgopen('addrbook_edit.php?userid=' + encodeURIComponent(userid)); }
+</script>"""
+
+
+class StandinStore:
+    """
+    Patients, encounters and Address Book entries of the stand-in
+
+    Thread-safe; with a path, writes are saved to that JSON file every
+    save_every writes and on flush(), never while seeding.
+    """
+
+    def __init__(self, path: Path = None, save_every: int = SAVE_EVERY):
+        self.path = Path(path) if path else None
+        self.save_every = save_every
+        self.lock = threading.Lock()
+        self.unsaved = 0          # writes since the last save
+        self.seeding = False
+        self.patients = {}        # pid -> {pid, fname, lname, dob}
+        self.encounters = {}      # pid -> [{id, date, category, reason, provider, billing, soap}]
+        self.address_book = {}    # userid -> form fields
+        self.next_id = {"pid": 1, "encounter": 1, "userid": 1}
+        if self.path and self.path.exists():
+            data = json.loads(self.path.read_text())
+            self.patients = {k: v for k, v in data["patients"].items()}
+            self.encounters = data["encounters"]
+            self.address_book = data["address_book"]
+            self.next_id = data["next_id"]
+
+    @classmethod
+    def seeded(cls, path: Path = None, patients: int = 0, entries: int = 0) -> "StandinStore":
+        """Store with the seed patients, the captured Address Book rows and synthetic extras"""
+        store = cls(path)
+        if store.patients:
+            return store
+
+        store.seeding = True
+        today = date.today()
+        for i, (fname, lname, dob) in enumerate(SEED_PATIENTS):
+            pid = store.add_patient(fname, lname, dob)
+            for k in reversed(range(3 - i % 2)):
+                store.add_encounter(pid, CATEGORIES[k % 2], f"Follow-up {k + 1}",
+                                    (today - timedelta(days=90 * (k + 1))).isoformat(), SEED_SOAP)
+        for i in range(patients):
+            store.add_patient(f"Synth{i}", f"Patient{i:05d}", "1980-01-01")
+
+        for cells in captured_list_rows():
+            words = cells["Name"].split()
+            if not words:
+                continue
+            store.add_entry({
+                "form_fname": words[0], "form_lname": words[-1] if len(words) > 1 else "",
+                "form_organization": cells["Organization"], "form_specialty": cells["Specialty"],
+                "form_email": cells["Email"], "form_city": cells["City"], "form_zip": cells["Postal"],
+                "form_abook_type": "oth",
+            })
+        for i in range(entries):
+            store.add_entry({
+                "form_fname": f"First{i}", "form_lname": f"Last{i:06d}", "form_abook_type": "oth",
+                "form_email": f"entry{i}@example.com", "form_phonecell": f"04{i:08d}",
+                "form_specialty": "Patient Contact",
+            })
+        store.seeding = False
+        store.flush()
+        return store
+
+    def _take(self, kind: str) -> str:
+        value = self.next_id[kind]
+        self.next_id[kind] = value + 1
+        return str(value)
+
+    def save(self):
+        """Write the whole store to its file (caller holds the lock)"""
+        self.unsaved = 0
+        if not self.path:
+            return
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({
+            "patients": self.patients, "encounters": self.encounters,
+            "address_book": self.address_book, "next_id": self.next_id,
+        }))
+        tmp.replace(self.path)
+
+    def changed(self):
+        """Count a write; save once save_every have piled up (caller holds the lock)"""
+        self.unsaved += 1
+        if not self.seeding and self.unsaved >= self.save_every:
+            self.save()
+
+    def flush(self):
+        """Save writes not yet on disk"""
+        with self.lock:
+            if self.unsaved:
+                self.save()
+
+    def add_patient(self, fname: str, lname: str, dob: str) -> str:
+        with self.lock:
+            pid = self._take("pid")
+            self.patients[pid] = {"pid": pid, "fname": fname, "lname": lname, "dob": dob}
+            self.encounters[pid] = []
+            self.changed()
+        return pid
+
+    def add_encounter(self, pid: str, category: str, reason: str, when: str = None, soap: dict = None) -> str:
+        with self.lock:
+            eid = self._take("encounter")
+            self.encounters.setdefault(pid, []).insert(0, {
+                "id": eid, "date": when or date.today().isoformat(), "category": category,
+                "reason": reason, "provider": PROVIDER, "billing": "", "soap": soap or {},
+            })
+            self.changed()
+        return eid
+
+    def add_entry(self, fields: dict) -> str:
+        with self.lock:
+            userid = self._take("userid")
+            self.address_book[userid] = dict(fields)
+            self.changed()
+        return userid
+
+    # Readers copy under the lock: request threads add records concurrently
+
+    def patient_list(self) -> list:
+        with self.lock:
+            return list(self.patients.values())
+
+    def patient_encounters(self, pid: str) -> list:
+        with self.lock:
+            return list(self.encounters.get(pid, []))
+
+    def entries(self) -> list:
+        """(userid, fields) pairs of the Address Book"""
+        with self.lock:
+            return list(self.address_book.items())
+
+    def encounter(self, pid: str, eid: str):
+        return next((e for e in self.patient_encounters(pid) if e["id"] == eid), None)
+
+
+def captured_list_rows() -> list:
+    """Rows of the captured Address Book list, as {column: text}"""
+    rows = []
+    for body in CAPTURED_ROW.findall(LIST_PAGE.read_text()):
+        cells = [html.unescape(TAG.sub("", c)).strip() for c in CELL.findall(body)]
+        rows.append({name: (cells[i] if i < len(cells) else "") for i, (name, _) in enumerate(LIST_COLUMNS)})
+    return rows
+
+
+def strip_external_scripts(page: str) -> str:
+    return SCRIPT_TAG.sub("", page)
+
+
+def menu_tree(items: list) -> list:
+    """Nest the flat, depth-annotated menu_items.json list"""
+    roots, stack = [], []
+    for item in items:
+        node = {**item, "children": []}
+        stack = stack[:item["depth"]]
+        (stack[-1]["children"] if stack else roots).append(node)
+        stack.append(node)
+    return roots
+
+
+def render_menu(nodes: list, path: list = ()) -> str:
+    parts = []
+    for node in nodes:
+        key = path_key([*path, node["name"]])
+        label = html.escape(node["name"])
+        if node["children"]:
+            parts.append(
+                f'<li class="menuSection dropdown"><div class="menuLabel px-1 dropdown-toggle">{label}</div>'
+                f'<ul class="menuEntries dropdown-menu">{render_menu(node["children"], [*path, node["name"]])}</ul></li>'
+            )
+            continue
+        url, tab = ROUTES.get(key, (f"/interface/main/placeholder.php?item={html.escape(node['name'])}", "msc"))
+        disabled = " menuDisabled" if node.get("disabled") and key not in ROUTES else ""
+        parts.append(f'<li class="menuSection"><div class="menuLabel px-1{disabled}" '
+                     f'data-url="{PREFIX}{html.escape(url)}" data-tab="{tab}">{label}</div></li>')
+    return "".join(parts)
+
+
+MAIN_TEMPLATE = """<!DOCTYPE html><html><head><title>OpenEMR</title>
+<style>
+#mainMenu ul { list-style: none; margin: 0; padding: 0; }
+#mainMenu > ul > li { display: inline-block; position: relative; }
+.menuLabel { cursor: pointer; padding: 4px 8px; white-space: nowrap; }
+.menuDisabled { color: #999; }
+.menuSection { position: relative; }
+.menuEntries { display: none; position: absolute; left: 0; top: 100%; background: #fff; border: 1px solid #ccc; z-index: 10; min-width: 180px; }
+.menuEntries .menuEntries { left: 100%; top: 0; }
+.menuSection.open > .menuEntries, .menuEntries .menuSection:hover > .menuEntries { display: block; }
+#tabs iframe { width: 100%; height: 80vh; border: 0; display: none; }
+#tabs iframe.active { display: block; }
+#encounter-list { display: none; position: absolute; background: #fff; border: 1px solid #ccc; }
+#encounter-list.show { display: block; }
+.dialogModal { position: fixed; inset: 5vh 20vw; background: #fff; border: 1px solid #888; z-index: 20; }
+.dialogModal iframe { width: 100%; height: 100%; border: 0; }
+</style>
+<script>
+var tabs_view_model = {};
+var __patient = null;
+var app_view_model = {application_data: {patient: function () { return __patient; }}};
+function restoreSession() { return true; }
+function activateTabByName(name) {
+    document.querySelectorAll('#tabs iframe').forEach(function (f) { f.classList.toggle('active', f.name === name); });
+}
+function navigateTab(url, name) {
+    var frame = document.querySelector('#tabs iframe[name="' + name + '"]');
+    if (!frame) {
+        frame = document.createElement('iframe');
+        frame.name = name;
+        document.getElementById('tabs').appendChild(frame);
+    }
+    frame.src = url;
+    activateTabByName(name);
+}
+window.__standin = {
+    setPatient: function (patient) {
+        __patient = {pid: function () { return patient.pid; }};
+        document.getElementById('patient-name').textContent = patient.name;
+        var list = document.getElementById('encounter-list');
+        list.innerHTML = '';
+        patient.encounters.forEach(function (e) {
+            var a = document.createElement('a');
+            a.className = 'dropdown-item';
+            a.href = '#';
+            a.textContent = e.date + ' ' + e.category;
+            a.addEventListener('click', function (event) {
+                event.preventDefault();
+                list.classList.remove('show');
+                navigateTab('__PREFIX__/interface/patient_file/encounter/encounter_top.php?set_encounter=' + e.id, 'enc');
+            });
+            list.appendChild(a);
+        });
+    },
+    openDialog: function (url) {
+        var modal = document.createElement('div');
+        modal.className = 'modal dialogModal';
+        var frame = document.createElement('iframe');
+        frame.id = 'modalframe';
+        frame.className = 'modalIframe';
+        frame.name = 'dlg' + Date.now();
+        frame.src = url;
+        modal.appendChild(frame);
+        document.body.appendChild(modal);
+    },
+    closeDialog: function () {
+        document.querySelectorAll('.dialogModal').forEach(function (m) { m.remove(); });
+        var list = document.querySelector('#tabs iframe[name="adm"]');
+        if (list && list.contentWindow.refreshme) list.contentWindow.refreshme();
+    },
+};
+document.addEventListener('click', function (event) {
+    var label = event.target.closest('.menuLabel');
+    if (!label || !document.getElementById('mainMenu').contains(label)) return;
+    if (label.classList.contains('dropdown-toggle')) {
+        label.parentElement.classList.toggle('open');
+        return;
+    }
+    if (label.classList.contains('menuDisabled')) return;
+    document.querySelectorAll('#mainMenu .open').forEach(function (s) { s.classList.remove('open'); });
+    navigateTab(label.dataset.url, label.dataset.tab);
+});
+</script>
+</head><body>
+<div id="mainMenu"><ul>__MENU__</ul></div>
+<div id="patient-bar">
+  <span id="patient-name"></span>
+  <button class="btn" id="select-encounter" onclick="document.getElementById('encounter-list').classList.toggle('show')">Select Encounter</button>
+  <div class="dropdown-menu" id="encounter-list"></div>
+</div>
+<div id="tabs"></div>
+</body></html>"""
+
+LOGIN_TEMPLATE = """<!DOCTYPE html><html><head><title>OpenEMR Login</title></head><body>
+<form method="post" action="__PREFIX__/interface/main/main_screen.php?auth=login&amp;site=default">
+  <input type="text" id="authUser" name="authUser">
+  <input type="password" id="clearPass" name="clearPass">
+  <button type="submit" id="login-button" class="btn btn-primary">Login</button>
+</form>__ERROR__
+</body></html>"""
+
+
+def page(title: str, body: str, head: str = "") -> str:
+    return (f"<!DOCTYPE html><html><head><title>{html.escape(title)}</title>{head}</head>"
+            f"<body class=\"body_top\">{body}</body></html>")
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """Routes one request; state lives on self.server (StandinHTTPServer)"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    # -- plumbing ---------------------------------------------------------
+
+    def _delay(self):
+        latency, jitter = self.server.latency_ms, self.server.jitter_ms
+        if latency or jitter:
+            time.sleep((latency + random.uniform(0, jitter)) / 1000)
+
+    def _send(self, status: int, body: str = "", headers: dict = None, content_type: str = "text/html"):
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _redirect(self, location: str, headers: dict = None):
+        self._send(302, "", {"Location": location, **(headers or {})})
+
+    def _form(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length).decode() if length else ""
+        return {k: v[-1] for k, v in parse_qs(raw, keep_blank_values=True).items()}
+
+    def _session(self):
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        token = cookie["OpenEMR"].value if "OpenEMR" in cookie else None
+        return self.server.sessions.get(token)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def _handle(self, method: str):
+        self._delay()
+        self.server.count(method)
+        url = urlsplit(self.path)
+        if not url.path.startswith(PREFIX):
+            return self._send(404, "Not found")
+        path = url.path[len(PREFIX):]
+        query = {k: v[-1] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+        form = self._form() if method == "POST" else {}
+
+        if path == LOGIN_PATH:
+            return self.login_page(query)
+        if path == "/interface/main/main_screen.php" and method == "POST":
+            return self.do_login(form)
+
+        session = self._session()
+        if session is None:
+            if path.endswith(".php"):
+                return self._redirect(f"{PREFIX}{LOGIN_PATH}?site=default")
+            return self._send(404, "Not found")
+
+        handlers = {
+            MAIN_PATH: self.main_page,
+            FINDER_PATH: self.finder_page,
+            DEMOGRAPHICS_PATH: self.demographics_page,
+            NEW_ENCOUNTER_PATH: self.new_encounter_page,
+            SAVE_ENCOUNTER_PATH: self.save_encounter,
+            ENCOUNTER_TOP_PATH: self.encounter_top_page,
+            FORMS_PATH: self.forms_page,
+            HISTORY_PATH: self.history_page,
+            LIST_PATH: self.list_page,
+            EDIT_PATH: self.edit_page,
+        }
+        handler = handlers.get(path)
+        if handler is None:
+            if path.endswith(".php"):
+                return self._send(200, page("OpenEMR", f"<p>{html.escape(path)}</p>"))
+            return self._send(404, "Not found")
+        return handler(session, method, query, form)
+
+    # -- login and tabs UI ------------------------------------------------
+
+    def login_page(self, query: dict):
+        error = '<div class="alert alert-danger">Invalid username or password</div>' if "error" in query else ""
+        body = LOGIN_TEMPLATE.replace("__PREFIX__", PREFIX).replace("__ERROR__", error)
+        return self._send(200, body)
+
+    def do_login(self, form: dict):
+        if form.get("authUser") != USERNAME or form.get("clearPass") != PASSWORD:
+            return self._redirect(f"{PREFIX}{LOGIN_PATH}?site=default&error=1")
+        token = secrets.token_urlsafe(24)
+        self.server.sessions[token] = {"pid": None, "encounter": None, "csrf": secrets.token_hex(20)}
+        cookie = f"OpenEMR={token}; Path={PREFIX}/; HttpOnly; SameSite=Strict"
+        return self._redirect(f"{PREFIX}{MAIN_PATH}", {"Set-Cookie": cookie})
+
+    def main_page(self, session, method, query, form):
+        return self._send(200, self.server.main_html)
+
+    # -- patients ---------------------------------------------------------
+
+    def finder_page(self, session, method, query, form):
+        rows = "".join(
+            f'<tr><td><a href="#" onclick="return openPatient({html.escape(p["pid"])})">'
+            f'{html.escape(p["lname"])}, {html.escape(p["fname"])}</a></td>'
+            f'<td>{html.escape(p["pid"])}</td><td>{html.escape(p["dob"])}</td></tr>'
+            for p in self.server.store.patient_list()
+        )
+        script = (f"<script>function openPatient(pid) {{ top.navigateTab('{PREFIX}{DEMOGRAPHICS_PATH}?set_pid=' + pid, 'pat');"
+                  f" top.activateTabByName('pat', true); return false; }}</script>")
+        body = ("<table id=\"pt_table\"><thead><tr><th>Name</th><th>PID</th><th>DOB</th></tr></thead>"
+                f"<tbody>{rows}</tbody></table>")
+        return self._send(200, page("Patient Finder", body, script))
+
+    def demographics_page(self, session, method, query, form):
+        store = self.server.store
+        pid = query.get("set_pid") or session["pid"]
+        patient = store.patients.get(pid or "")
+        if patient is None:
+            return self._send(200, page("Dashboard", "<p>No patient selected</p>"))
+        if session["pid"] != pid:
+            session["pid"], session["encounter"] = pid, None
+        name = f'{patient["lname"]}, {patient["fname"]}'
+        encounters = [{"id": e["id"], "date": e["date"], "category": e["category"]}
+                      for e in store.patient_encounters(pid)]
+        data = json.dumps({"pid": pid, "name": name, "encounters": encounters})
+        script = f"<script>if (top.__standin) top.__standin.setPatient({data});</script>"
+        body = (f"<h2>{html.escape(name)}</h2><p>DOB: {html.escape(patient['dob'])}</p>"
+                f"<p>PID: {html.escape(pid)}</p>")
+        return self._send(200, page("Dashboard", body, script))
+
+    # -- encounters -------------------------------------------------------
+
+    def new_encounter_page(self, session, method, query, form):
+        if not session["pid"]:
+            return self._send(200, page("New Encounter", "<p>No patient selected</p>"))
+        options = "".join(f'<option value="{i + 5}">{html.escape(c)}</option>' for i, c in enumerate(CATEGORIES))
+        body = (f'<form method="post" action="{PREFIX}{SAVE_ENCOUNTER_PATH}" id="new-encounter-form">'
+                f'<select name="pc_catid" id="pc_catid"><option value="">-- Select One --</option>{options}</select>'
+                '<select name="class_code"><option value="AMB">Outpatient</option></select>'
+                '<textarea name="reason" id="reason" rows="4"></textarea>'
+                '<button type="submit" id="save-form" class="btn btn-primary">Save</button></form>')
+        return self._send(200, page("New Encounter", body))
+
+    def save_encounter(self, session, method, query, form):
+        if method != "POST" or not session["pid"]:
+            return self._redirect(f"{PREFIX}{NEW_ENCOUNTER_PATH}")
+        catid = form.get("pc_catid", "")
+        category = CATEGORIES[int(catid) - 5] if catid.isdigit() and 0 <= int(catid) - 5 < len(CATEGORIES) else ""
+        eid = self.server.store.add_encounter(session["pid"], category, form.get("reason", ""))
+        session["encounter"] = eid
+        return self._redirect(f"{PREFIX}{ENCOUNTER_TOP_PATH}?set_encounter={eid}")
+
+    def encounter_top_page(self, session, method, query, form):
+        if query.get("set_encounter"):
+            session["encounter"] = query["set_encounter"]
+        body = (f'<div id="encounter-top"><iframe name="Forms" src="{PREFIX}{FORMS_PATH}" '
+                'style="width:100%;height:70vh;border:0"></iframe></div>')
+        return self._send(200, page("Encounter", body))
+
+    def forms_page(self, session, method, query, form):
+        encounter = self.server.store.encounter(session["pid"] or "", session["encounter"] or "")
+        if encounter is None:
+            return self._send(200, page("Encounter Forms", "<p>No encounter selected</p>"))
+        soap = "".join(
+            f"<div>{heading.title()}: {html.escape(text).replace(chr(10), '<br>')}</div>"
+            for heading, text in encounter["soap"].items()
+        )
+        body = (f'<h3>Visit Summary ({html.escape(encounter["date"])})</h3>'
+                f'<div class="encounter-summary"><div class="visit-reason">{html.escape(encounter["reason"])}</div>'
+                f'<div>Provider: {html.escape(encounter["provider"])}</div>'
+                f'<div>{html.escape(encounter["category"])}</div></div>'
+                + (f'<h4>SOAP (by admin)</h4><div class="soap">{soap}</div>' if soap else "")
+                + '<h4>Vitals (by admin)</h4><div>Weight 80 kg</div>')
+        return self._send(200, page("Encounter Forms", body))
+
+    def history_page(self, session, method, query, form):
+        rows = "".join(
+            f'<tr><td>{html.escape(e["date"])}</td><td></td>'
+            f'<td>{html.escape(e["reason"])} / {html.escape(e["category"])}</td>'
+            f'<td>{html.escape(e["provider"])}</td><td>{html.escape(e["billing"])}</td></tr>'
+            for e in self.server.store.patient_encounters(session["pid"] or "")
+        )
+        body = ('<table class="table"><thead><tr><th>Date</th><th>Issue</th><th>Reason/Form</th>'
+                f'<th>Provider</th><th>Billing</th></tr></thead><tbody>{rows}</tbody></table>')
+        return self._send(200, page("Encounter History", body))
+
+    # -- Address Book -----------------------------------------------------
+
+    def list_page(self, session, method, query, form):
+        filters = {name: form.get(name, "").strip().lower()
+                   for name in ("form_fname", "form_lname", "form_organization", "form_specialty")}
+        rows = []
+        for userid, entry in self.server.store.entries():
+            if any(value and not str(entry.get(name, "")).lower().startswith(value)
+                   for name, value in filters.items()):
+                continue
+            name = f'{entry.get("form_fname", "")} {entry.get("form_mname", "")} {entry.get("form_lname", "")}'
+            cells = [name if field is None and column == "Name" else str(entry.get(field, "")) if field else ""
+                     for column, field in LIST_COLUMNS]
+            tds = "".join(f"\n  <td>{html.escape(c)}</td>" for c in cells)
+            rows.append(f'<tr class="address_names detail" style="cursor:pointer" '
+                        f'onclick="doedclick_edit(&quot;{userid}&quot;)" title="Edit {html.escape(name)}">{tds}\n </tr>')
+
+        body = self.server.list_html
+        body = TBODY.sub(lambda _: "<tbody>" + "\n ".join(rows) + "</tbody>", body, count=1)
+        body = CSRF_INPUT.sub(lambda m: m.group(1) + session["csrf"] + m.group(2), body)
+        for name, value in filters.items():
+            body = body.replace(f'name="{name}" size="10" value=""',
+                                f'name="{name}" size="10" value="{html.escape(form.get(name, ""))}"', 1)
+        return self._send(200, body)
+
+    def edit_page(self, session, method, query, form):
+        if method == "POST" and "form_save" in form:
+            if form.get("csrf_token_form") != session["csrf"]:
+                return self._send(200, CSRF_INPUT.sub(lambda m: m.group(1) + session["csrf"] + m.group(2),
+                                                      self.server.edit_html))
+            self.server.store.add_entry({k: v for k, v in form.items() if k.startswith("form_") and k != "form_save"})
+            return self._send(200, page("Saved", "", DIALOG_SHIM + "<script>dlgclose('refreshme', false);</script>"))
+        body = CSRF_INPUT.sub(lambda m: m.group(1) + session["csrf"] + m.group(2), self.server.edit_html)
+        return self._send(200, body)
+
+
+class StandinHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, store: StandinStore, latency_ms: float = 0, jitter_ms: float = 0):
+        super().__init__(address, StandinHandler)
+        self.store = store
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.sessions = {}
+        self.requests = {"GET": 0, "POST": 0}
+        self.count_lock = threading.Lock()
+
+        menu = render_menu(menu_tree(json.loads(MENU_ITEMS_FILE.read_text())))
+        self.main_html = MAIN_TEMPLATE.replace("__MENU__", menu).replace("__PREFIX__", PREFIX)
+        self.list_html = strip_external_scripts(LIST_PAGE.read_text()).replace(
+            "</title>", "</title>" + DIALOG_SHIM + LIST_SHIM, 1)
+        edit_html = INLINE_SCRIPT.sub("", strip_external_scripts(EDIT_PAGE.read_text()))
+        self.edit_html = edit_html.replace("</title>", "</title>" + DIALOG_SHIM, 1)
+
+    def count(self, method: str):
+        with self.count_lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+
+
+class StandinServer:
+    """
+    The stand-in running on a background thread
+
+    Usage:
+        with StandinServer(latency_ms=40) as server:
+            os.environ["EMR_BASE_URL"] = server.base_url
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0, jitter_ms: float = 0,
+                 store: StandinStore = None):
+        self.store = store or StandinStore.seeded()
+        self.httpd = StandinHTTPServer((host, port), self.store, latency_ms, jitter_ms)
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{PREFIX}"
+
+    def start(self) -> "StandinServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="openemr-standin", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.store.flush()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def report(self) -> str:
+        r = self.httpd.requests
+        return (f"Stand-in: {r['GET']} GET, {r['POST']} POST, {len(self.store.patients)} patient(s), "
+                f"{len(self.store.address_book)} Address Book entries, latency {self.httpd.latency_ms}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the offline OpenEMR stand-in")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Random extra delay, 0..jitter")
+    parser.add_argument("--store", default=None, help="JSON file to load and save records (default: in memory)")
+    parser.add_argument("--patients", type=int, default=0, help="Synthetic patients to add to the seed data")
+    parser.add_argument("--entries", type=int, default=0, help="Synthetic Address Book entries to add")
+    args = parser.parse_args()
+
+    store = StandinStore.seeded(args.store, patients=args.patients, entries=args.entries)
+    server = StandinServer(args.host, args.port, args.latency_ms, args.jitter_ms, store)
+    print(f"OpenEMR stand-in at {server.base_url} (login {USERNAME}/{PASSWORD})")
+    print(f"  export EMR_BASE_URL={server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(server.report())
+        server.httpd.server_close()
+        store.flush()
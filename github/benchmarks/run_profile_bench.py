@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Run Profile Benchmark - human vs. throughput
+
+Runs the same workload against a live OpenEMR once per run profile, each in
+its own browser launch (cursor humanization is a launch option), and prints
+the per-step timings side by side:
+
+- menu:    Admin > Address Book through the menus
+- typing:  type a last name into the Address Book search box
+- visits:  Patient > Visits > Visit History for an already selected patient
+
+The navigation index is pointed at a scratch file and emptied before every
+round, so each round clicks through the menus instead of loading the learned
+URL, and the real index is left untouched.
+
+Usage:
+    uv run python benchmarks/run_profile_bench.py
+    uv run python benchmarks/run_profile_bench.py --rounds 5 --patient Belford --headless
+"""
+
+import asyncio
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from camoufox.async_api import AsyncCamoufox
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from emr_common.nav_index import NAV_INDEX
+from emr_common.run_profile import current_profile, use_profile
+from profile_management import find_content_frame, type_human
+from visits.create_visit import OpenEMRSession
+
+STEPS = ("menu", "typing", "visits")
+SEARCH_FIELD = 'input[name="form_lname"]'
+TYPED_TEXT = "Benchmark Lastname"
+
+
+async def run_profile(name: str, rounds: int, patient: str, headless: bool) -> dict:
+    """Run the workload `rounds` times under one profile and time each step"""
+    use_profile(name)
+    timings = {step: [] for step in STEPS}
+
+    async with AsyncCamoufox(**current_profile().launch_options(headless=headless)) as browser:
+        session = OpenEMRSession()
+        if not await session.open(browser):
+            raise RuntimeError("Login failed")
+        page = session.page
+        if not await session.select_patient(patient):
+            raise RuntimeError(f"Patient not found: {patient}")
+
+        for _ in range(rounds):
+            NAV_INDEX.entries.clear()
+
+            started = time.perf_counter()
+            if not await session.navigate_to_menu("Admin", "Address Book", wait_frame="addrbook_list"):
+                raise RuntimeError("Address Book menu item not available")
+            timings["menu"].append(time.perf_counter() - started)
+
+            list_frame = await find_content_frame(page, "addrbook_list")
+            await list_frame.fill(SEARCH_FIELD, "")
+            await list_frame.click(SEARCH_FIELD)
+            started = time.perf_counter()
+            await type_human(page, TYPED_TEXT)
+            timings["typing"].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            if not await session.navigate_to_menu("Patient", "Visits", "Visit History", wait_frame="encounters.php"):
+                raise RuntimeError("Visit History menu item not available")
+            timings["visits"].append(time.perf_counter() - started)
+
+        await session.context.close()
+
+    return {step: statistics.median(values) for step, values in timings.items()}
+
+
+async def main(rounds: int = 3, patient: str = "Belford", headless: bool = False):
+    # Keep the real navigation index out of the benchmark
+    scratch = tempfile.TemporaryDirectory()
+    NAV_INDEX.index_file = Path(scratch.name) / "nav_index.json"
+
+    print("=" * 70)
+    print("RUN PROFILE BENCHMARK")
+    print("=" * 70)
+    print(f"  Patient: {patient}")
+    print(f"  Rounds: {rounds} per profile (median shown)")
+
+    results = {}
+    for name in ("human", "throughput"):
+        print(f"\n  Running {name}...")
+        results[name] = await run_profile(name, rounds, patient, headless)
+
+    print("-" * 70)
+    print(f"  {'step':<10} {'human':>10} {'throughput':>12} {'speedup':>9}")
+    for step in STEPS + ("total",):
+        if step == "total":
+            human, fast = sum(results["human"].values()), sum(results["throughput"].values())
+        else:
+            human, fast = results["human"][step], results["throughput"][step]
+        speedup = f"{human / fast:.1f}x" if fast else "-"
+        print(f"  {step:<10} {human:>9.2f}s {fast:>11.2f}s {speedup:>9}")
+    print("=" * 70)
+    scratch.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the human and throughput run profiles")
+    parser.add_argument("--rounds", type=int, default=3, help="Workload repetitions per profile")
+    parser.add_argument("--patient", default="Belford", help="Patient to open Visit History for")
+    parser.add_argument("--headless", action="store_true", help="Run in headless mode")
+    args = parser.parse_args()
+
+    asyncio.run(main(rounds=args.rounds, patient=args.patient, headless=args.headless))
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Table Extraction Benchmark - One Shot vs. Chunked
+
+Renders a generated Address Book style table of --rows rows into a blank
+page and reads it back:
+
+- one-shot:  extract_table_data (every row and column in one evaluate)
+- chunked:   iter_table_rows, all columns, --chunk rows per evaluate
+- columns:   iter_table_rows reading only Name and Email
+- paginated: iter_table_rows over the same rows split into pages of
+             --page-size, rendered in place by a Next link
+
+Reports rows per second and the largest single payload held in Python.
+No OpenEMR instance is needed; all network requests are blocked.
+
+Usage:
+    uv run python benchmarks/table_extract_bench.py
+    uv run python benchmarks/table_extract_bench.py --rows 50000 --chunk 1000 --headed
+"""
+
+import asyncio
+import argparse
+import sys
+import time
+from pathlib import Path
+from camoufox.async_api import AsyncCamoufox
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from profile_management import extract_table_data, iter_table_rows
+
+HEADERS = ["Organization", "Name", "Local", "Type", "Specialty", "Phone(W)", "Mobile", "Fax", "Email",
+           "Street", "City", "State", "Postal"]
+
+# Builds the rows in the page so a large table does not travel as HTML.
+# With pageSize, only one page is rendered and #next swaps in the next one.
+TABLE_SCRIPT = """
+    ([headers, count, pageSize]) => {
+        const row = i => [`Org ${i % 97}`, `First${i} M Last${i}`, '', 'Specialist', 'Cardiology',
+            `555-01${String(i % 100).padStart(2, '0')}`, `555-02${String(i % 100).padStart(2, '0')}`, '',
+            `user${i}@example.com`, `${i} Main St`, 'Springfield', 'IL', '62701'];
+        document.body.innerHTML = `<table><thead><tr>${headers.map(h => `<th>${h}</th>`).join('')}</tr></thead>
+            <tbody></tbody></table><a id="next" href="#">Next</a>`;
+        const body = document.querySelector('tbody');
+        let page = 0;
+        const render = () => {
+            const end = pageSize ? Math.min(count, (page + 1) * pageSize) : count;
+            const html = [];
+            for (let i = pageSize ? page * pageSize : 0; i < end; i++) {
+                html.push(`<tr class="address_names">${row(i).map(c => `<td>${c}</td>`).join('')}</tr>`);
+            }
+            body.innerHTML = html.join('');
+            if (end >= count) document.querySelector('#next').className = 'disabled';
+        };
+        document.querySelector('#next').addEventListener('click', e => {
+            e.preventDefault();
+            page += 1;
+            setTimeout(render, 0);
+        });
+        render();
+    }
+"""
+NEXT_SELECTOR = "#next:not(.disabled)"
+
+
+async def run_mode(page, name: str, rows: int, chunk: int, page_size: int = 0, columns: list = None) -> dict:
+    """Render the table and time reading it back in one mode"""
+    await page.set_content("<html><body></body></html>")
+    await page.evaluate(TABLE_SCRIPT, [HEADERS, rows, page_size])
+
+    read = 0
+    largest = 0
+    started = time.perf_counter()
+    if name == "one-shot":
+        data = await extract_table_data(page.main_frame)
+        read = largest = len(data)
+    else:
+        async for batch in iter_table_rows(page.main_frame, columns=columns, chunk_size=chunk,
+                                           next_selector=NEXT_SELECTOR if page_size else None):
+            read += len(batch)
+            largest = max(largest, len(batch))
+    elapsed = time.perf_counter() - started
+    return {
+        "mode": name,
+        "rows": read,
+        "largest": largest,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(read / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+async def main(rows: int = 20000, chunk: int = 500, page_size: int = 1000, headless: bool = True):
+    print("=" * 70)
+    print("TABLE EXTRACTION BENCHMARK")
+    print("=" * 70)
+    print(f"  Rows: {rows} x {len(HEADERS)} columns")
+    print(f"  Chunk: {chunk} rows, page size (paginated): {page_size}")
+
+    async with AsyncCamoufox(headless=headless) as browser:
+        page = await browser.new_page()
+        await page.route("**/*", lambda route: route.abort())
+
+        results = [
+            await run_mode(page, "one-shot", rows, chunk),
+            await run_mode(page, "chunked", rows, chunk),
+            await run_mode(page, "columns", rows, chunk, columns=["Name", "Email"]),
+            await run_mode(page, "paginated", rows, chunk, page_size=page_size),
+        ]
+
+    print("-" * 70)
+    for r in results:
+        print(f"  {r['mode']:<10} {r['rows']:>7} rows in {r['seconds']:>7}s  "
+              f"-> {r['rows_per_second']:>9} rows/s  (max {r['largest']} rows held)")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark one-shot vs. chunked table extraction")
+    parser.add_argument("--rows", type=int, default=20000, help="Rows in the generated table")
+    parser.add_argument("--chunk", type=int, default=500, help="Rows per chunk for iter_table_rows")
+    parser.add_argument("--page-size", type=int, default=1000, help="Rows per page in paginated mode")
+    parser.add_argument("--headed", action="store_true", help="Show the browser")
+    args = parser.parse_args()
+
+    asyncio.run(main(rows=args.rows, chunk=args.chunk, page_size=args.page_size, headless=not args.headed))
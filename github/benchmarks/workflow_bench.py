@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Workflow Benchmark - End-to-End Against the Offline Stand-In
+
+Starts the OpenEMR stand-in (benchmarks/openemr_standin.py) on a local port,
+points the workflows at it through EMR_BASE_URL, and runs each workflow
+--rounds times on one warm, logged-in page:
+
+- add_entry:     AddAddressEntry.execute (add, then verify by search)
+- import:        ImportProfiles.import_all over --batch sample profiles
+- import_http:   the same batch posted with HttpAddressBookClient
+- create_visit:  create_visit_on_page
+- current_visit: get_current_visit_on_page
+- history:       get_visit_history_on_page
+
+Reports operations per second and p50/p95 latency per workflow (an import
+operation is one record). --latency-ms adds a fixed delay to every stand-in
+response to model a remote server. The session cache, patient cache and
+navigation index point at scratch files, so the real caches are untouched
+and every run starts cold.
+
+Usage:
+    uv run python benchmarks/workflow_bench.py
+    uv run python benchmarks/workflow_bench.py --rounds 20 --latency-ms 40 --only add_entry history
+"""
+
+import asyncio
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# The workflows read EMR_BASE_URL at import time; always the stand-in, never
+# a server exported in the shell
+STANDIN_PORT = int(os.environ.get("STANDIN_PORT", "8765"))
+os.environ["EMR_BASE_URL"] = f"http://127.0.0.1:{STANDIN_PORT}/openemr"
+
+from camoufox.async_api import AsyncCamoufox
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from benchmarks.openemr_standin import StandinServer, StandinStore
+from emr_common import BASE_URL
+from emr_common.nav_index import NAV_INDEX
+from emr_common.patient_cache import PATIENT_CACHE
+from emr_common.run_profile import current_profile, use_profile
+from emr_common.session_cache import SESSION_CACHE
+from emr_common.tracing import percentile
+from profile_management import map_profile_to_address, navigate_to, open_logged_in_page
+from profile_management.add_address_entry import AddAddressEntry
+from profile_management.http_submit import HttpAddressBookClient
+from profile_management.import_profiles import ImportProfiles
+from visits.create_visit import VisitData, create_visit_on_page
+from visits.current import get_current_visit_on_page
+from visits.visit_history import get_visit_history_on_page
+
+WORKFLOWS = ("add_entry", "import", "import_http", "create_visit", "current_visit", "history")
+SAMPLE_FILE = ROOT_DIR / "sample-profile-data.json"
+
+
+def unique_profiles(count: int, round_no: int) -> list:
+    """`count` sample profiles with last names unique to this round"""
+    samples = json.loads(SAMPLE_FILE.read_text())
+    profiles = []
+    for i in range(count):
+        profile = dict(samples[i % len(samples)])
+        profile["last_name"] = f"{profile.get('last_name', 'Bench')}{round_no:03d}{i:03d}"
+        profiles.append(profile)
+    return profiles
+
+
+async def open_address_book(page):
+    if not await navigate_to(page, ["Admin", "Address Book"], wait_frame="addrbook_list"):
+        raise RuntimeError("Address Book not reachable on the stand-in")
+
+
+async def run_round(workflow: str, page, context, round_no: int, patient: str, batch: int) -> int:
+    """Run one round of a workflow; returns the number of operations done"""
+    if workflow == "add_entry":
+        await open_address_book(page)
+        data = map_profile_to_address(unique_profiles(1, round_no)[0])
+        result = await AddAddressEntry(page).execute(data)
+        if not result["success"]:
+            raise RuntimeError(result["message"])
+        return 1
+
+    if workflow in ("import", "import_http"):
+        await open_address_book(page)
+        profiles = unique_profiles(batch, round_no)
+        if workflow == "import":
+            results = await ImportProfiles(page).import_all(profiles)
+        else:
+            async with HttpAddressBookClient(BASE_URL) as http:
+                await http.open(context)
+                results = await ImportProfiles(page, http=http).import_all(profiles)
+        if results["failed"]:
+            raise RuntimeError(f"{results['failed']} record(s) failed")
+        return batch
+
+    if workflow == "create_visit":
+        result = await create_visit_on_page(page, patient, VisitData(reason=f"Benchmark round {round_no}"))
+    elif workflow == "current_visit":
+        result = await get_current_visit_on_page(page, patient)
+    else:
+        result = await get_visit_history_on_page(page, patient)
+    if not result.success:
+        raise RuntimeError(result.message)
+    return 1
+
+
+async def run_workflow(workflow: str, page, context, rounds: int, patient: str, batch: int) -> dict:
+    """Time `rounds` rounds of one workflow (after one untimed warm-up)"""
+    await run_round(workflow, page, context, 0, patient, batch)
+
+    latencies = []
+    operations = 0
+    started = time.perf_counter()
+    for round_no in range(1, rounds + 1):
+        round_started = time.perf_counter()
+        done = await run_round(workflow, page, context, round_no, patient, batch)
+        elapsed = time.perf_counter() - round_started
+        latencies.extend([elapsed / done] * done)
+        operations += done
+    total = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "workflow": workflow,
+        "operations": operations,
+        "seconds": round(total, 3),
+        "ops_per_second": round(operations / total, 2) if total else 0.0,
+        "p50": round(percentile(latencies, 0.50), 3),
+        "p95": round(percentile(latencies, 0.95), 3),
+    }
+
+
+async def main(rounds: int = 10, batch: int = 5, latency_ms: float = 0, jitter_ms: float = 0,
+               workflows: tuple = WORKFLOWS, patient: str = "Belford", headless: bool = True,
+               output: Path = None):
+    # Scratch caches: the real ones are left alone and every run starts cold
+    scratch = tempfile.TemporaryDirectory()
+    SESSION_CACHE.cache_dir = Path(scratch.name) / "sessions"
+    PATIENT_CACHE.cache_file = Path(scratch.name) / "patients.json"
+    PATIENT_CACHE.entries = {}
+    NAV_INDEX.index_file = Path(scratch.name) / "nav_index.json"
+    NAV_INDEX.entries.clear()
+    use_profile("throughput")
+
+    server = StandinServer(port=STANDIN_PORT, latency_ms=latency_ms, jitter_ms=jitter_ms,
+                           store=StandinStore.seeded())
+    if BASE_URL != server.base_url:
+        raise RuntimeError(f"Workflows point at {BASE_URL}, not the stand-in at {server.base_url}")
+    print("=" * 70)
+    print("WORKFLOW BENCHMARK (offline stand-in)")
+    print("=" * 70)
+    print(f"  Stand-in: {server.base_url} (latency {latency_ms}ms, jitter {jitter_ms}ms)")
+    print(f"  Workflows use: {BASE_URL}")
+    print(f"  Rounds: {rounds} per workflow, import batch: {batch}, patient: {patient}")
+
+    results = []
+    with server:
+        async with AsyncCamoufox(**current_profile().launch_options(headless=headless)) as browser:
+            context, page, logged_in = await open_logged_in_page(browser)
+            if not logged_in:
+                raise RuntimeError("Login to the stand-in failed")
+            for workflow in workflows:
+                print(f"\n  Running {workflow}...")
+                results.append(await run_workflow(workflow, page, context, rounds, patient, batch))
+            await context.close()
+        print(f"\n  {server.report()}")
+
+    print("-" * 70)
+    print(f"  {'workflow':<14} {'ops':>5} {'ops/s':>8} {'p50':>8} {'p95':>8}")
+    for r in results:
+        print(f"  {r['workflow']:<14} {r['operations']:>5} {r['ops_per_second']:>8} "
+              f"{r['p50']:>7.3f}s {r['p95']:>7.3f}s")
+    print("=" * 70)
+
+    if output:
+        output.write_text(json.dumps({"latency_ms": latency_ms, "jitter_ms": jitter_ms, "results": results}, indent=2))
+        print(f"  Results saved to {output}")
+    scratch.cleanup()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the workflows against the offline OpenEMR stand-in")
+    parser.add_argument("--rounds", type=int, default=10, help="Timed rounds per workflow")
+    parser.add_argument("--batch", type=int, default=5, help="Profiles per import round")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every stand-in response")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Random extra delay, 0..jitter")
+    parser.add_argument("--only", nargs="+", choices=WORKFLOWS, default=list(WORKFLOWS), help="Workflows to run")
+    parser.add_argument("--patient", default="Belford", help="Stand-in patient for the visit workflows")
+    parser.add_argument("--headed", action="store_true", help="Show the browser")
+    parser.add_argument("--output", type=Path, default=None, help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    asyncio.run(main(rounds=args.rounds, batch=args.batch, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                     workflows=tuple(args.only), patient=args.patient, headless=not args.headed,
+                     output=args.output))
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Camoufox Command Client
+
+Sends named operations to the command channel of a running start_server.py.
+The server executes them on its already logged-in page and returns the
+result, so a call costs only the work itself - no browser launch, no login.
+
+Usage:
+    uv run python command_client.py ping
+    uv run python command_client.py get_visit_history -p patient_name=Belford
+    uv run python command_client.py create_visit --params '{"patient_name": "Belford", "visit_data": {"reason": "Checkup"}}'
+
+Programmatic:
+    from command_client import CommandClient
+
+    async with CommandClient() as client:
+        history = await client.call("get_visit_history", patient_name="Belford")
+
+    # Lease the least-loaded browser of the server's pool for direct use
+    async with CommandClient() as client, client.lease() as lease:
+        browser = await playwright.firefox.connect(lease["ws_url"])
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+from pathlib import Path
+
+
+CMD_SOCKET_FILE = Path(__file__).parent / ".camoufox_cmd.sock"
+
+
+class CommandError(Exception):
+    """Error returned by the command server"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class CommandClient:
+    """Connection to the command server, reusable for many calls"""
+
+    def __init__(self, socket_path: Path = CMD_SOCKET_FILE):
+        self.socket_path = Path(socket_path)
+        self.reader = None
+        self.writer = None
+        self._ids = itertools.count(1)
+
+    async def connect(self):
+        if not self.socket_path.exists():
+            raise FileNotFoundError(
+                f"Command socket not found: {self.socket_path} (is start_server.py running?)"
+            )
+        self.reader, self.writer = await asyncio.open_unix_connection(
+            str(self.socket_path), limit=64 * 1024 * 1024
+        )
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            await self.writer.wait_closed()
+            self.writer = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def call(self, method: str, **params):
+        """
+        Run a named operation on the server
+
+        Args:
+            method: Operation name (e.g. "create_visit")
+            **params: Operation parameters
+
+        Returns:
+            The operation result (dataclass results arrive as dicts)
+        """
+        request = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params}
+        self.writer.write(json.dumps(request).encode() + b"\n")
+        await self.writer.drain()
+
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Command server closed the connection")
+
+        response = json.loads(line)
+        if "error" in response:
+            raise CommandError(response["error"]["code"], response["error"]["message"])
+        return response["result"]
+
+    def lease(self, ttl: float = None) -> "BrowserLease":
+        """
+        Lease the least-loaded browser of the server's pool
+
+        Use as `async with client.lease() as lease:`; lease["ws_url"] is the
+        endpoint to connect to. The lease is released on exit, or expires
+        after ttl seconds (server default) if the client dies.
+        """
+        return BrowserLease(self, ttl)
+
+
+class BrowserLease:
+    """Lease on a pool browser, released when the block exits"""
+
+    def __init__(self, client: CommandClient, ttl: float = None):
+        self.client = client
+        self.ttl = ttl
+        self.lease = None
+
+    async def __aenter__(self) -> dict:
+        params = {"ttl": self.ttl} if self.ttl else {}
+        self.lease = await self.client.call("lease", **params)
+        return self.lease
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.client.call("release", lease_id=self.lease["lease_id"])
+
+
+async def call(method: str, socket_path: Path = CMD_SOCKET_FILE, **params):
+    """One-shot call over a fresh connection"""
+    async with CommandClient(socket_path) as client:
+        return await client.call(method, **params)
+
+
+def parse_params(params_json: str, pairs: list) -> dict:
+    params = json.loads(params_json) if params_json else {}
+    for pair in pairs or []:
+        key, _, value = pair.partition("=")
+        try:
+            params[key] = json.loads(value)
+        except json.JSONDecodeError:
+            params[key] = value
+    return params
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run an operation on a running camoufox server"
+    )
+    parser.add_argument("method", help="Operation name (e.g. ping, create_visit, get_visit_history)")
+    parser.add_argument("--params", default=None, help="Operation parameters as a JSON object")
+    parser.add_argument("-p", "--param", action="append", metavar="KEY=VALUE",
+                        help="Single parameter (value parsed as JSON if possible)")
+    parser.add_argument("--socket", default=str(CMD_SOCKET_FILE), help="Command socket path")
+
+    args = parser.parse_args()
+    params = parse_params(args.params, args.param)
+
+    try:
+        result = asyncio.run(call(args.method, Path(args.socket), **params))
+    except CommandError as e:
+        print(f"ERROR ({e.code}): {e}")
+        raise SystemExit(1)
+
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+"""
+Shared OpenEMR Automation Helpers
+
+Building blocks used by both the profile_management and visits workflows.
+
+BASE_URL is the OpenEMR instance every workflow talks to. It defaults to the
+public demo and can be pointed elsewhere (e.g. the offline stand-in in
+benchmarks/openemr_standin.py) with EMR_BASE_URL.
+"""
+import os
+
+BASE_URL = os.environ.get("EMR_BASE_URL", "https://demo.openemr.io/openemr").rstrip("/")
@@ -0,0 +1,165 @@
+"""
+Event-Maintained Frame Registry
+
+OpenEMR renders every screen in a tab iframe, so most steps start by finding
+"the frame whose URL contains X". Instead of scanning page.frames each time,
+a FrameRegistry listens to the page's framenavigated/framedetached events and
+keeps an index of frame by name:
+
+- Logical names (FRAME_NAMES) map to the URL keyword of a screen, e.g.
+  "finder" -> "dynamic_finder". Any other name is used as the URL keyword
+  itself, so existing keyword lookups ("addrbook_list") keep working.
+- A name is tracked from its first lookup on; after that get() is a dict
+  lookup and the index is updated by events only.
+- wait_for() resolves the moment a matching frame navigates, and
+  next_navigation() gives a future for the next navigation of a name,
+  registered before the action that causes it.
+
+One registry is kept per page (frame_registry(page)); it is dropped when the
+page closes.
+"""
+import asyncio
+
+# Logical frame names -> URL keyword of the screen
+FRAME_NAMES = {
+    "finder": "dynamic_finder",
+    "demographics": "demographics",
+    "new_encounter": "newpatient",
+    "encounter": "encounter_top",
+    "visit_history": "encounters.php",
+    "addrbook_list": "addrbook_list",
+    "addrbook_edit": "addrbook_edit",
+}
+
+_REGISTRIES = {}
+
+
+def keyword_for(name: str) -> str:
+    return FRAME_NAMES.get(name, name)
+
+
+class FrameRegistry:
+    """Frames of one page indexed by name, maintained from frame events"""
+
+    def __init__(self, page):
+        self.page = page
+        self.frames = {}    # keyword -> most recently navigated matching frame
+        self.waiters = {}   # keyword -> futures for the next matching navigation
+        self.stats = {"hits": 0, "misses": 0, "waits": 0}
+        page.on("framenavigated", self._on_navigated)
+        page.on("framedetached", self._on_detached)
+
+    def track(self, keyword: str):
+        """Start indexing a keyword, seeded from the frames already attached"""
+        if keyword in self.frames:
+            return
+        self.frames[keyword] = None
+        for frame in self.page.frames:
+            if keyword in frame.url:
+                self.frames[keyword] = frame
+
+    def _on_navigated(self, frame):
+        url = frame.url
+        for keyword, current in self.frames.items():
+            if keyword in url:
+                self.frames[keyword] = frame
+            elif current is frame:
+                # The frame navigated away from this screen
+                self.frames[keyword] = None
+        for keyword, futures in self.waiters.items():
+            if keyword in url:
+                for future in futures:
+                    if not future.done():
+                        future.set_result(frame)
+                futures.clear()
+
+    def _on_detached(self, frame):
+        for keyword, current in self.frames.items():
+            if current is frame:
+                self.frames[keyword] = None
+
+    def get(self, name: str):
+        """Frame currently showing a screen, or None"""
+        keyword = keyword_for(name)
+        self.track(keyword)
+        frame = self.frames[keyword]
+        if frame is not None and frame.is_detached():
+            frame = self.frames[keyword] = None
+        self.stats["hits" if frame else "misses"] += 1
+        return frame
+
+    def candidates(self, name: str) -> list:
+        """
+        Frames to search for a screen's content
+
+        The frame for the name and its child frames if it is known,
+        otherwise every frame of the page.
+        """
+        frame = self.get(name)
+        return [frame, *frame.child_frames] if frame else list(self.page.frames)
+
+    def next_navigation(self, name: str) -> asyncio.Future:
+        """Future resolved with the next frame that navigates to a screen"""
+        keyword = keyword_for(name)
+        self.track(keyword)
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(keyword, []).append(future)
+        return future
+
+    def discard(self, name: str, future: asyncio.Future):
+        """Stop waiting on a future from next_navigation()"""
+        futures = self.waiters.get(keyword_for(name), [])
+        if future in futures:
+            futures.remove(future)
+        if not future.done():
+            future.cancel()
+
+    async def wait_for(self, name: str, timeout_ms: float, load_state: str = "domcontentloaded"):
+        """
+        Frame for a name once it exists and has reached load_state
+
+        Returns immediately for a frame that is already there.
+
+        Returns:
+            Frame object or None on timeout
+        """
+        pending = []
+
+        async def _wait():
+            frame = self.get(name)
+            if frame is None:
+                self.stats["waits"] += 1
+                pending.append(self.next_navigation(name))
+                frame = await pending[0]
+            await frame.wait_for_load_state(load_state)
+            return frame
+
+        try:
+            return await asyncio.wait_for(_wait(), timeout_ms / 1000)
+        except Exception:
+            return self.get(name)
+        finally:
+            for future in pending:
+                self.discard(name, future)
+
+    def close(self):
+        self.page.remove_listener("framenavigated", self._on_navigated)
+        self.page.remove_listener("framedetached", self._on_detached)
+        for futures in self.waiters.values():
+            for future in futures:
+                if not future.done():
+                    future.cancel()
+        self.waiters.clear()
+
+
+def frame_registry(page) -> FrameRegistry:
+    """The registry of a page, created on first use"""
+    registry = _REGISTRIES.get(page)
+    if registry is None:
+        registry = _REGISTRIES[page] = FrameRegistry(page)
+
+        def on_close(_):
+            _REGISTRIES.pop(page, None)
+            registry.close()
+        page.on("close", on_close)
+    return registry
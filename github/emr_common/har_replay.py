@@ -0,0 +1,265 @@
+"""
+HAR Record and Replay
+
+Record a workflow run's network traffic once, then replay it without a
+server, so the automation side can be profiled on its own and production
+traces can be re-run exactly:
+
+- record: every browser context writes its own HAR (bodies embedded) to
+  DIR/<run>_<timestamp>_<n>.har, saved when the context closes.
+- replay: requests are answered from a HAR with route_from_har (same method,
+  URL and POST body). A request the HAR has no exact entry for, such as an
+  addrbook_edit.php POST with different form data or a URL with another
+  query string, gets the last recorded response for the same method and
+  path. Anything else gets a 404 (documents) or is aborted; nothing reaches
+  the network. Other route handlers (RoutePolicy) must pass requests on with
+  route.fallback(), not continue_(); any response that did not come from the
+  replay is counted as network in report().
+
+Both modes skip the session cache: a recording has to contain the login,
+and a cached session cannot be validated offline. The HTTP modes (httpx
+submits, HttpHistoryReader) do not go through the browser and are neither
+recorded nor replayed.
+
+report() splits each run's wall time (context open to close) into server
+time (the HAR "wait" phase: request sent to first byte), other network time
+(DNS, connect, send, receive) and client time (no request in flight: Python,
+Playwright and the browser). Overlapping requests count once. A replay has
+no server time, so replaying a recording shows the client side alone.
+
+Environment:
+    EMR_HAR_RECORD=DIR     Record every context to DIR
+    EMR_HAR_REPLAY=FILE    Replay every context from FILE
+"""
+import json
+import os
+import re
+import time
+from base64 import b64decode
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+# Response headers that no longer describe a decoded HAR body
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+ALL_URLS = re.compile(r".*")
+
+
+def merged_seconds(intervals: list) -> float:
+    """Total length of the union of (start, end) intervals"""
+    total = 0.0
+    end = None
+    for start, stop in sorted(intervals):
+        if end is None or start > end:
+            total += stop - start
+            end = stop
+        elif stop > end:
+            total += stop - end
+            end = stop
+    return total
+
+
+def har_breakdown(path: Path) -> dict:
+    """
+    Network and server time of a HAR file
+
+    Returns:
+        dict with requests, network_seconds and server_seconds (overlaps
+        counted once)
+    """
+    entries = json.loads(Path(path).read_text())["log"]["entries"]
+    network, server = [], []
+    for entry in entries:
+        start = datetime.fromisoformat(entry["startedDateTime"].replace("Z", "+00:00")).timestamp()
+        total = max(entry.get("time") or 0, 0) / 1000
+        timings = entry.get("timings", {})
+        wait = max(timings.get("wait") or 0, 0) / 1000
+        receive = max(timings.get("receive") or 0, 0) / 1000
+        first_byte = start + max(total - receive, 0)
+        network.append((start, start + total))
+        server.append((first_byte - min(wait, total), first_byte))
+    return {
+        "requests": len(entries),
+        "network_seconds": merged_seconds(network),
+        "server_seconds": merged_seconds(server),
+    }
+
+
+class HarMode:
+    """Records or replays browser contexts as HAR files"""
+
+    def __init__(self, mode: str = "off", path: Optional[str] = None, name: str = "run"):
+        self.mode = "off"
+        self.path = None
+        self.name = name
+        self.runs = []          # {"path", "context", "opened", "closed"} per context
+        self.entries = None     # (method, url without query) -> recorded entries, for replay
+        self.stats = {"requests": 0, "replayed": 0, "loose": 0, "missing": 0, "network": 0}
+        self.replayed = set()   # requests that reached the replay routes, until their response
+        if mode == "record":
+            self.record(path, name)
+        elif mode == "replay":
+            self.replay(path)
+
+    @classmethod
+    def from_env(cls) -> "HarMode":
+        if os.environ.get("EMR_HAR_REPLAY"):
+            return cls("replay", os.environ["EMR_HAR_REPLAY"])
+        if os.environ.get("EMR_HAR_RECORD"):
+            return cls("record", os.environ["EMR_HAR_RECORD"])
+        return cls()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def record(self, out_dir: str, name: Optional[str] = None):
+        """Record every new context to out_dir, files prefixed with name"""
+        self.mode = "record"
+        self.path = Path(out_dir)
+        self.name = name or self.name
+
+    def replay(self, har_path: str):
+        """Serve every new context from har_path"""
+        path = Path(har_path)
+        if not path.is_file():
+            raise FileNotFoundError(f"HAR file not found: {path}")
+        self.mode = "replay"
+        self.path = path
+        self.entries = None
+
+    def _index(self) -> dict:
+        """Recorded entries by (method, URL without query), loaded once"""
+        if self.entries is None:
+            self.entries = {}
+            for entry in json.loads(self.path.read_text())["log"]["entries"]:
+                request = entry["request"]
+                key = (request["method"], request["url"].split("?")[0])
+                self.entries.setdefault(key, []).append(entry)
+        return self.entries
+
+    async def new_context(self, browser, **context_kwargs):
+        """browser.new_context() that records or replays according to the mode"""
+        if self.mode == "record":
+            self.path.mkdir(parents=True, exist_ok=True)
+            stamp = time.strftime("%Y%m%d_%H%M%S")
+            har_path = self.path / f"{self.name}_{stamp}_{len(self.runs) + 1}.har"
+            context_kwargs = {**context_kwargs, "record_har_path": str(har_path),
+                              "record_har_content": "embed"}
+        else:
+            har_path = self.path
+
+        context = await browser.new_context(**context_kwargs)
+        if self.mode == "replay":
+            # Routes run newest first: mark, exact HAR matches, then the loose fallback
+            await context.route(ALL_URLS, self._fallback)
+            await context.route_from_har(str(self.path), not_found="fallback")
+            await context.route(ALL_URLS, self._mark)
+            context.on("request", self._count)
+            context.on("response", self._check_response)
+
+        if self.enabled:
+            run = {"path": har_path, "context": context, "opened": time.perf_counter(), "closed": None}
+            context.on("close", lambda _: run.update(closed=run["closed"] or time.perf_counter()))
+            self.runs.append(run)
+        return context
+
+    def _count(self, request):
+        self.stats["requests"] += 1
+
+    async def _mark(self, route):
+        """Note that a request is answered by the replay, then pass it on"""
+        self.stats["replayed"] += 1
+        self.replayed.add(route.request)
+        await route.fallback()
+
+    def _check_response(self, response):
+        """Count responses that did not come from the replay routes"""
+        if response.request in self.replayed:
+            self.replayed.discard(response.request)
+        else:
+            self.stats["network"] += 1
+
+    async def _fallback(self, route):
+        """Last recorded response for the same method and path, else 404/abort"""
+        request = route.request
+        candidates = self._index().get((request.method, request.url.split("?")[0]))
+        if not candidates:
+            self.stats["missing"] += 1
+            if request.resource_type == "document":
+                await route.fulfill(status=404, body=f"Not in HAR: {request.method} {request.url}")
+            else:
+                await route.abort()
+            return
+
+        self.stats["loose"] += 1
+        exact = [e for e in candidates if e["request"]["url"] == request.url]
+        response = (exact or candidates)[-1]["response"]
+        content = response.get("content", {})
+        body = content.get("text", "")
+        body = b64decode(body) if content.get("encoding") == "base64" else body.encode()
+        headers = {h["name"]: h["value"] for h in response.get("headers", [])
+                   if h["name"].lower() not in DROPPED_HEADERS}
+        await route.fulfill(status=response["status"], headers=headers, body=body)
+
+    async def finish(self):
+        """Close contexts still open so their HARs are written (before the browser closes)"""
+        for run in self.runs:
+            if run["closed"] is None:
+                run["closed"] = time.perf_counter()
+                try:
+                    await run["context"].close()
+                except Exception:
+                    pass
+
+    def breakdown(self) -> list:
+        """Wall, server, network and client seconds per finished run"""
+        rows = []
+        for run in self.runs:
+            if run["closed"] is None:
+                continue
+            wall = run["closed"] - run["opened"]
+            if self.mode == "record" and Path(run["path"]).exists():
+                har = har_breakdown(run["path"])
+            else:
+                har = {"requests": None, "network_seconds": 0.0, "server_seconds": 0.0}
+            network = min(har["network_seconds"], wall)
+            rows.append({
+                "har": str(run["path"]),
+                "requests": har["requests"],
+                "wall_seconds": round(wall, 3),
+                "server_seconds": round(min(har["server_seconds"], network), 3),
+                "network_seconds": round(network, 3),
+                "client_seconds": round(wall - network, 3),
+            })
+        return rows
+
+    def report(self) -> str:
+        """Time split per run, and replay hit counts"""
+        if not self.enabled:
+            return "HAR: off"
+        lines = []
+        for row in self.breakdown():
+            wall = row["wall_seconds"] or 1e-9
+            if self.mode == "record":
+                other = row["network_seconds"] - row["server_seconds"]
+                lines.append(
+                    f"HAR {Path(row['har']).name}: {row['requests']} request(s), wall {row['wall_seconds']:.2f}s = "
+                    f"server {row['server_seconds']:.2f}s ({row['server_seconds'] / wall:.0%}) + "
+                    f"other network {other:.2f}s + client {row['client_seconds']:.2f}s "
+                    f"({row['client_seconds'] / wall:.0%})"
+                )
+            else:
+                side = "all client-side" if not self.stats["network"] else "includes network requests"
+                lines.append(f"HAR replay of {Path(row['har']).name}: wall {row['wall_seconds']:.2f}s, {side}")
+        if self.mode == "replay":
+            s = self.stats
+            exact = s["replayed"] - s["loose"] - s["missing"]
+            lines.append(f"HAR replay: {s['requests']} request(s), {exact} exact, "
+                         f"{s['loose']} by method and path, {s['missing']} not in HAR, "
+                         f"{s['network']} reached the network")
+        return "\n".join(lines) or f"HAR: {self.mode}, no finished runs"
+
+
+# Shared instance so every context of a run records or replays the same way
+HAR_MODE = HarMode.from_env()
@@ -0,0 +1,268 @@
+// OpenEMR automation helper bundle
+//
+// Installed once per browser context by emr_common/js_helpers.py (as an init
+// script, so it exists in every document and frame) and called by name with
+// JSON arguments: window.__emr.<name>(...args). Bump BUNDLE_VERSION in
+// js_helpers.py whenever this file changes.
+(version) => {
+    if (window.__emr && window.__emr.version >= version) return;
+
+    const norm = s => (s || '').toLowerCase().split(/\s+/).filter(Boolean).join(' ');
+    const digits = s => (s || '').replace(/\D/g, '');
+    const findByText = (selector, text) =>
+        Array.from(document.querySelectorAll(selector)).find(e => e.textContent.trim() === text);
+
+    window.__emr = {
+        version,
+
+        // Center point of a menu label, for hover-then-click on submenus
+        menuPosition(label) {
+            const el = findByText('.menuLabel', label);
+            if (!el) return null;
+            const r = el.getBoundingClientRect();
+            return {x: r.x + r.width / 2, y: r.y + r.height / 2, disabled: el.classList.contains('menuDisabled')};
+        },
+
+        // Click a menu label, or a dropdown toggle, by its text
+        menuClick(label) {
+            const el = findByText('.menuLabel', label) || findByText('.dropdown-toggle', label);
+            if (!el) return false;
+            el.click();
+            return true;
+        },
+
+        // Load a URL into a named tab of the tabs UI and bring it to the front
+        navigateTab(url, name) {
+            if (typeof top.navigateTab !== 'function') return false;
+            top.navigateTab(url, name);
+            if (typeof top.activateTabByName === 'function') top.activateTabByName(name, true);
+            return true;
+        },
+
+        // pid of the active patient, from the tabs UI view model
+        currentPid() {
+            try {
+                const pid = top.app_view_model.application_data.patient().pid();
+                return pid ? String(pid) : null;
+            } catch (e) {
+                return null;
+            }
+        },
+
+        // Click the first element matching a selector in this document
+        click(selector) {
+            const el = document.querySelector(selector);
+            if (!el) return false;
+            el.click();
+            return true;
+        },
+
+        // Table rows as objects keyed by header text (col_<i> without a header)
+        tableData(selector) {
+            const table = document.querySelector(selector || 'table');
+            if (!table) return [];
+            const headers = Array.from(table.querySelectorAll('th')).map(th => th.textContent.trim());
+            const rows = [];
+            table.querySelectorAll('tbody tr').forEach(tr => {
+                const row = {};
+                tr.querySelectorAll('td').forEach((td, i) => {
+                    row[headers[i] || `col_${i}`] = td.textContent.trim();
+                });
+                rows.push(row);
+            });
+            return rows;
+        },
+
+        // One chunk of a table's body rows, from row `start`, at most `limit`
+        // rows. With `columns` (header texts) only those cells are read.
+        // signature identifies the rendered page (its first row's text).
+        tableChunk(selector, start, limit, columns) {
+            const table = document.querySelector(selector || 'table');
+            if (!table) return {rows: [], total: 0, signature: ''};
+            const headers = Array.from(table.querySelectorAll('th')).map(th => th.textContent.trim());
+            const body = table.tBodies.length === 1
+                ? table.tBodies[0].rows
+                : table.querySelectorAll('tbody tr');
+            const wanted = columns ? columns.map(c => headers.indexOf(c)) : null;
+            const rows = [];
+            const end = Math.min(body.length, start + limit);
+            for (let r = start; r < end; r++) {
+                const tds = body[r].querySelectorAll('td');
+                const row = {};
+                if (wanted) {
+                    wanted.forEach((i, k) => { row[columns[k]] = i >= 0 && tds[i] ? tds[i].textContent.trim() : ''; });
+                } else {
+                    tds.forEach((td, i) => { row[headers[i] || `col_${i}`] = td.textContent.trim(); });
+                }
+                rows.push(row);
+            }
+            return {rows, total: body.length, signature: body.length ? body[0].textContent : ''};
+        },
+
+        // Scroll the table's scroll container (or the document) to the bottom,
+        // so a virtual list renders its next rows
+        scrollTable(selector) {
+            const table = document.querySelector(selector || 'table');
+            if (!table) return false;
+            let el = table.parentElement;
+            while (el && el.scrollHeight <= el.clientHeight) el = el.parentElement;
+            const target = el || document.scrollingElement || document.documentElement;
+            target.scrollTop = target.scrollHeight;
+            return true;
+        },
+
+        // Set every field of a form, using the field kind from the schema when
+        // given. Per field status: "ok", "missing" (no element) or "fallback"
+        // (needs the per-field path)
+        fillForm(fields) {
+            const status = {};
+            const fire = (el) => {
+                el.dispatchEvent(new Event('input', {bubbles: true}));
+                el.dispatchEvent(new Event('change', {bubbles: true}));
+            };
+            for (const {name, selector, value, kind} of fields) {
+                const el = document.querySelector(selector);
+                if (!el) { status[name] = 'missing'; continue; }
+                try {
+                    const tag = kind || (el.type === 'checkbox' ? 'checkbox' : el.tagName.toLowerCase());
+                    if (tag === 'select') {
+                        const text = String(value);
+                        const option = Array.from(el.options)
+                            .find(o => o.value === text || o.label.trim() === text);
+                        if (!option) { status[name] = 'fallback'; continue; }
+                        el.value = option.value;
+                    } else if (tag === 'checkbox') {
+                        if (!value) { status[name] = 'ok'; continue; }
+                        el.checked = true;
+                    } else if (tag === 'input' || tag === 'text' || tag === 'textarea') {
+                        el.value = String(value);
+                    } else {
+                        status[name] = 'fallback';
+                        continue;
+                    }
+                    fire(el);
+                    status[name] = 'ok';
+                } catch (e) {
+                    status[name] = 'fallback';
+                }
+            }
+            return status;
+        },
+
+        // Address Book list rows matching the expected values, as userids taken
+        // from each row's doedclick_edit("<userid>") handler. Empty expected
+        // values are not compared.
+        matchEntries(expected) {
+            const table = document.querySelector('table');
+            if (!table) return [];
+            const headers = Array.from(table.querySelectorAll('th')).map(th => th.textContent.trim());
+            const matches = [];
+            table.querySelectorAll('tbody tr.address_names').forEach(tr => {
+                const cells = {};
+                tr.querySelectorAll('td').forEach((td, i) => { cells[headers[i]] = td.textContent; });
+                const words = norm(cells['Name']).split(' ');
+
+                if (expected.fname && words[0] !== norm(expected.fname)) return;
+                if (expected.lname && words[words.length - 1] !== norm(expected.lname)) return;
+                if (expected.email && norm(cells['Email']) !== norm(expected.email)) return;
+                if (expected.specialty && norm(cells['Specialty']) !== norm(expected.specialty)) return;
+                if (expected.phone) {
+                    const phones = [cells['Mobile'], cells['Phone(W)']].map(digits);
+                    if (!phones.includes(digits(expected.phone))) return;
+                }
+
+                const m = (tr.getAttribute('onclick') || '').match(/doedclick_edit\(["']?(\d+)/);
+                matches.push(m ? m[1] : null);
+            });
+            return matches;
+        },
+
+        // Rows of the Visit History table (the table with a "Date" header),
+        // skipping rows whose first cell is not a YYYY-MM-DD date
+        visitRows() {
+            const table = Array.from(document.querySelectorAll('table'))
+                .find(t => Array.from(t.querySelectorAll('th')).some(th => th.textContent.trim() === 'Date'));
+            if (!table) return null;
+            const visits = [];
+            for (const row of table.querySelectorAll('tbody tr, tr:not(:first-child)')) {
+                const cells = row.querySelectorAll('td');
+                if (cells.length < 4) continue;
+                const date = cells[0]?.textContent?.trim() || '';
+                if (!/^\d{4}-\d{2}-\d{2}$/.test(date)) continue;
+                visits.push({
+                    date,
+                    issue: cells[1]?.textContent?.trim() || '',
+                    reason_form: cells[2]?.textContent?.trim() || '',
+                    provider: cells[3]?.textContent?.trim() || '',
+                    billing: cells[4]?.textContent?.trim() || '',
+                });
+            }
+            return visits.length > 0 ? visits : null;
+        },
+
+        // Visit summary and SOAP sections of an encounter document. A section
+        // runs from its heading to the next heading or to the title line of
+        // another form ("Vitals (by admin)")
+        extractEncounter() {
+            const text = (document.body && document.body.innerText) || '';
+            const summary = {};
+
+            const reason = document.querySelector('[class*="reason"], .visit-reason');
+            if (reason && reason.textContent.trim()) summary.reason = reason.textContent.trim();
+
+            const provider = text.match(/(?:Provider|by)\s*[:\-]?\s*([A-Za-z\s,]+)/i);
+            if (provider) summary.provider = provider[1].trim();
+
+            const patientType = text.match(/(Established Patient|New Patient)/i);
+            if (patientType) summary.patientType = patientType[1];
+
+            const heading = /^\s*(Subjective|Objective|Assessment|Plan)\s*(?::\s*(.*)|$)/i;
+            const formTitle = /\(by\s+[^)]*\)\s*$/i;
+            const soap = {};
+            let current = null;
+            for (const line of text.split('\n')) {
+                const match = line.match(heading);
+                if (match) {
+                    current = match[1].toLowerCase();
+                    soap[current] = match[2] ? [match[2]] : [];
+                } else if (current && formTitle.test(line)) {
+                    current = null;
+                } else if (current) {
+                    soap[current].push(line);
+                }
+            }
+            for (const key of Object.keys(soap)) {
+                soap[key] = soap[key].join('\n').trim();
+                if (!soap[key]) delete soap[key];
+            }
+
+            return {
+                summary: Object.keys(summary).length > 0 ? summary : null,
+                soap: Object.keys(soap).length > 0 ? soap : null,
+            };
+        },
+
+        // Resolves true once the DOM has had no mutations for quietMs, or
+        // false after maxMs
+        domSettled(quietMs, maxMs) {
+            return new Promise(resolve => {
+                const root = document.documentElement || document;
+                let timer = null;
+                let observer = null;
+                const finish = (settled) => {
+                    if (observer) observer.disconnect();
+                    clearTimeout(timer);
+                    clearTimeout(cap);
+                    resolve(settled);
+                };
+                const cap = setTimeout(() => finish(false), maxMs);
+                timer = setTimeout(() => finish(true), quietMs);
+                observer = new MutationObserver(() => {
+                    clearTimeout(timer);
+                    timer = setTimeout(() => finish(true), quietMs);
+                });
+                observer.observe(root, {childList: true, subtree: true, attributes: true, characterData: true});
+            });
+        },
+    };
+}
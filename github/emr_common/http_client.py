@@ -0,0 +1,47 @@
+"""
+Authenticated HTTP Client
+
+Builds a pooled, keep-alive httpx client that carries the cookies (and user
+agent) of a logged-in browser context, for requests that do not need a
+rendered page.
+
+httpx is optional: it is imported only when a client is opened, and a
+missing install raises ImportError so callers can stay on the browser path.
+"""
+
+
+async def open_http_client(context, base_url: str, max_connections: int = 8, timeout: float = 30.0):
+    """
+    Create an httpx.AsyncClient authenticated like a browser context
+
+    Args:
+        context: Logged-in Playwright browser context
+        base_url: OpenEMR base URL; request paths are relative to it
+        max_connections: Size of the connection pool
+        timeout: Request timeout in seconds
+
+    Returns:
+        httpx.AsyncClient (close with aclose())
+    """
+    try:
+        import httpx
+    except ImportError:
+        raise ImportError("HTTP mode needs httpx: uv add httpx") from None
+
+    cookies = httpx.Cookies()
+    for c in await context.cookies(base_url):
+        cookies.set(c["name"], c["value"], domain=c["domain"], path=c["path"])
+
+    headers = {}
+    for page in context.pages[:1]:
+        headers["User-Agent"] = await page.evaluate("navigator.userAgent")
+
+    return httpx.AsyncClient(
+        base_url=base_url,
+        cookies=cookies,
+        headers=headers,
+        timeout=timeout,
+        follow_redirects=False,
+        limits=httpx.Limits(max_connections=max_connections,
+                            max_keepalive_connections=max_connections),
+    )
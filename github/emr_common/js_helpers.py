@@ -0,0 +1,66 @@
+"""
+Preinstalled JavaScript Helpers
+
+The in-page helpers (menu lookup, table extraction, form fill, ...) live in
+one versioned bundle, emr_common/helpers.js. It is installed once per
+browser context with add_init_script, so every document and frame already
+defines window.__emr, and each call sends one short constant script plus JSON
+arguments:
+
+    rows = await call(frame, "tableData", "table")
+    await call(page, "menuClick", "Address Book")
+
+Arguments travel as JSON, so labels and selectors with quotes are safe. A
+document that was loaded before the bundle was installed (or that holds an
+older version) gets the bundle injected on its first call.
+"""
+from pathlib import Path
+
+HELPERS_FILE = Path(__file__).resolve().parent / "helpers.js"
+BUNDLE_VERSION = 2
+
+BUNDLE_SCRIPT = f"({HELPERS_FILE.read_text().strip()})({BUNDLE_VERSION})"
+
+CALL_SCRIPT = """
+    ([version, name, args]) => {
+        const helpers = window.__emr;
+        if (!helpers || helpers.version < version) return {__emrMissing: true};
+        return helpers[name](...args);
+    }
+"""
+MISSING = {"__emrMissing": True}
+
+# Contexts that already have the bundle as an init script
+_INSTALLED = set()
+
+
+async def install(context):
+    """Install the helper bundle in every future document of a context"""
+    if context in _INSTALLED:
+        return
+    await context.add_init_script(BUNDLE_SCRIPT)
+    _INSTALLED.add(context)
+    context.on("close", lambda _: _INSTALLED.discard(context))
+
+
+async def call(target, name: str, *args):
+    """
+    Run a helper from the bundle
+
+    Args:
+        target: Playwright page or frame to run in
+        name: Helper name, e.g. "tableData"
+        *args: JSON-serializable helper arguments
+
+    Returns:
+        The helper's return value (awaited if it is a promise)
+    """
+    page = getattr(target, "page", target)
+    await install(page.context)
+
+    payload = [BUNDLE_VERSION, name, list(args)]
+    result = await target.evaluate(CALL_SCRIPT, payload)
+    if result == MISSING:
+        await target.evaluate(BUNDLE_SCRIPT)
+        result = await target.evaluate(CALL_SCRIPT, payload)
+    return result
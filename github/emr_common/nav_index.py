@@ -0,0 +1,192 @@
+"""
+Direct-URL Navigation Index
+
+Maps OpenEMR menu paths (e.g. "Admin > Address Book") to the URL the menu
+item loads and the tab it loads into. The list of paths is compiled from
+analysis/menu_items.json; target URLs are learned the first time a path is
+reached by clicking through the menu, by recording which tab iframe navigated.
+
+Once learned, navigation loads the content frame directly through OpenEMR's
+own navigateTab() instead of clicking through every menu level. If a direct
+load does not produce the expected frame the entry is treated as stale: the
+caller falls back to menu clicking and the entry is re-learned from that run.
+Learned entries are saved to analysis/nav_index.json as they are recorded.
+"""
+import json
+import time
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+from emr_common import js_helpers
+from emr_common.waits import WaitBudget, expect_frame
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+MENU_ITEMS_FILE = ROOT_DIR / "analysis" / "menu_items.json"
+INDEX_FILE = ROOT_DIR / "analysis" / "nav_index.json"
+
+SEPARATOR = " > "
+
+
+def path_key(menu_path) -> str:
+    return SEPARATOR.join(menu_path)
+
+
+def compile_menu_paths(menu_items: list) -> dict:
+    """
+    Build full menu paths from the flat, depth-annotated menu_items.json list
+
+    Returns:
+        dict: path key -> entry for every leaf (non-dropdown) item
+    """
+    entries = {}
+    stack = []
+    for item in menu_items:
+        stack = stack[:item["depth"]] + [item["name"]]
+        if item.get("is_dropdown"):
+            continue
+        entries[path_key(stack)] = {
+            "path": list(stack),
+            "url": None,
+            "tab": None,
+            "learned_at": None,
+        }
+    return entries
+
+
+class FrameRecorder:
+    """Records the first tab iframe navigation while a menu is clicked through"""
+
+    def __init__(self, page, keyword: str = None):
+        self.page = page
+        self.keyword = keyword
+        self.url = None
+        self.tab = None
+
+    def _on_navigated(self, frame):
+        if self.url is not None or frame.parent_frame != self.page.main_frame:
+            return
+        if not frame.url.startswith("http"):
+            return
+        if self.keyword and self.keyword not in frame.url:
+            return
+        self.url = frame.url
+        self.tab = frame.name
+
+    def __enter__(self):
+        self.page.on("framenavigated", self._on_navigated)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.page.remove_listener("framenavigated", self._on_navigated)
+        return False
+
+
+class NavigationIndex:
+    """Menu path -> content frame URL index with menu-click fallback"""
+
+    def __init__(self, index_file: Path = INDEX_FILE, menu_items_file: Path = MENU_ITEMS_FILE):
+        self.index_file = Path(index_file)
+        self.entries = {}
+        self.stats = {"direct": 0, "menu": 0, "learned": 0, "stale": 0}
+
+        if Path(menu_items_file).exists():
+            self.entries = compile_menu_paths(json.loads(Path(menu_items_file).read_text()))
+        if self.index_file.exists():
+            try:
+                learned = json.loads(self.index_file.read_text()).get("entries", {})
+            except ValueError:
+                learned = {}
+            for key, entry in learned.items():
+                self.entries.setdefault(key, {}).update(entry)
+
+    def get(self, menu_path):
+        return self.entries.get(path_key(menu_path))
+
+    def learn(self, menu_path, url: str, tab: str):
+        """Record the URL and tab a menu path loads, and save the index"""
+        self.entries[path_key(menu_path)] = {
+            "path": list(menu_path),
+            # Store the path only, so the entry survives a host change
+            "url": urlsplit(url)._replace(scheme="", netloc="").geturl(),
+            "tab": tab,
+            "learned_at": time.time(),
+        }
+        self.stats["learned"] += 1
+        self.save()
+
+    def forget(self, menu_path):
+        entry = self.get(menu_path)
+        if entry:
+            entry.update({"url": None, "tab": None, "learned_at": None})
+            self.save()
+
+    def save(self):
+        learned = {k: v for k, v in self.entries.items() if v.get("url")}
+        self.index_file.parent.mkdir(exist_ok=True)
+        tmp = self.index_file.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"version": 1, "entries": learned}, indent=2))
+        tmp.replace(self.index_file)
+
+    async def load_direct(self, page, entry: dict, wait_frame: str = None, budget: WaitBudget = None):
+        """
+        Load a learned entry straight into its tab
+
+        Returns:
+            Frame object, or None if the frame did not load as expected
+        """
+        url = urljoin(page.url, entry["url"])
+        keyword = wait_frame or entry["url"].split("?")[0].rsplit("/", 1)[-1]
+
+        async with expect_frame(page, keyword, budget=budget) as nav:
+            ok = await js_helpers.call(page, "navigateTab", url, entry["tab"])
+            if not ok:
+                nav.cancel()
+
+        if nav.frame is None or "login" in nav.frame.url.lower():
+            return None
+        return nav.frame
+
+    async def navigate(self, page, menu_path, click_through, wait_frame: str = None,
+                       budget: WaitBudget = None) -> bool:
+        """
+        Navigate to a menu path, directly when the index knows its URL
+
+        Args:
+            page: Playwright page object
+            menu_path: List of menu labels, e.g. ["Admin", "Address Book"]
+            click_through: Async callable that clicks through the menu and
+                returns bool; used when there is no usable index entry
+            wait_frame: Keyword of the frame URL the path loads, if known
+            budget: Optional WaitBudget shared with other steps
+
+        Returns:
+            bool: True if navigation successful
+        """
+        entry = self.get(menu_path)
+        if entry and entry.get("url"):
+            try:
+                if await self.load_direct(page, entry, wait_frame, budget):
+                    self.stats["direct"] += 1
+                    return True
+            except Exception:
+                pass
+            self.stats["stale"] += 1
+            self.forget(menu_path)
+
+        with FrameRecorder(page, wait_frame) as recorder:
+            ok = await click_through()
+
+        if ok:
+            self.stats["menu"] += 1
+            if recorder.url and recorder.tab:
+                self.learn(menu_path, recorder.url, recorder.tab)
+        return ok
+
+    def report(self) -> str:
+        s = self.stats
+        return (f"Navigation index: {s['direct']} direct, {s['menu']} via menu, "
+                f"{s['learned']} learned, {s['stale']} stale")
+
+
+# Shared instance so every workflow in a run learns into the same index
+NAV_INDEX = NavigationIndex()
@@ -0,0 +1,100 @@
+"""
+Patient Resolution Cache
+
+Maps a patient name, as passed to the visits workflows, to the OpenEMR pid
+the Finder resolved it to. On a hit the patient is set directly by loading
+demographics.php?set_pid=<pid> into the patient tab, skipping the Finder.
+
+Entries are persisted per base_url and expire after the TTL. A hit whose
+demographics page does not show the expected name is dropped and resolved
+through the Finder again.
+"""
+import json
+import time
+from pathlib import Path
+
+from emr_common.session_cache import CACHE_DIR
+
+CACHE_FILE = CACHE_DIR / "patients.json"
+DEFAULT_TTL = 24 * 60 * 60  # seconds
+
+DEMOGRAPHICS_PATH = "/interface/patient_file/summary/demographics.php"
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+class PatientCache:
+    """On-disk name -> pid cache with hit/miss latency stats"""
+
+    def __init__(self, cache_file: Path = CACHE_FILE, ttl: float = DEFAULT_TTL):
+        self.cache_file = Path(cache_file)
+        self.ttl = ttl
+        self.entries = None
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "hit_seconds": 0.0, "miss_seconds": 0.0}
+
+    def _load(self):
+        if self.entries is not None:
+            return
+        try:
+            self.entries = json.loads(self.cache_file.read_text())
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def _save(self):
+        self.cache_file.parent.mkdir(mode=0o700, exist_ok=True)
+        tmp = self.cache_file.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.entries, indent=2))
+        tmp.replace(self.cache_file)
+
+    def key(self, base_url: str, name: str) -> str:
+        return f"{base_url}|{normalize_name(name)}"
+
+    def get(self, base_url: str, name: str):
+        """
+        Cached pid for a patient name
+
+        Returns:
+            str pid, or None if unknown or expired
+        """
+        self._load()
+        entry = self.entries.get(self.key(base_url, name))
+        if not entry:
+            return None
+        if time.time() - entry.get("saved_at", 0) > self.ttl:
+            self.entries.pop(self.key(base_url, name), None)
+            self._save()
+            return None
+        return entry["pid"]
+
+    def put(self, base_url: str, name: str, pid: str):
+        self._load()
+        self.entries[self.key(base_url, name)] = {"pid": str(pid), "saved_at": time.time()}
+        self._save()
+
+    def invalidate(self, base_url: str, name: str):
+        self._load()
+        if self.entries.pop(self.key(base_url, name), None):
+            self.stats["stale"] += 1
+            self._save()
+
+    def record(self, hit: bool, seconds: float):
+        """Count one lookup and its latency"""
+        kind = "hit" if hit else "miss"
+        self.stats[f"{kind}s"] += 1
+        self.stats[f"{kind}_seconds"] += seconds
+
+    def report(self) -> str:
+        """One-line summary of hit rate and per-lookup latency"""
+        s = self.stats
+        lookups = s["hits"] + s["misses"]
+        rate = (s["hits"] / lookups * 100) if lookups else 0.0
+        hit_avg = (s["hit_seconds"] / s["hits"]) if s["hits"] else 0.0
+        miss_avg = (s["miss_seconds"] / s["misses"]) if s["misses"] else 0.0
+        return (f"Patient cache: {s['hits']} hit(s), {s['misses']} miss(es) ({rate:.0f}% hit rate), "
+                f"{s['stale']} stale, avg {hit_avg:.2f}s per hit vs {miss_avg:.2f}s via Finder")
+
+
+# Shared instance so one run aggregates its stats
+PATIENT_CACHE = PatientCache()
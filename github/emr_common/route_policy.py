@@ -0,0 +1,220 @@
+"""
+Resource-Blocking Route Policy
+
+The workflows only read and fill the DOM, so images, web fonts, media and
+analytics beacons are pure overhead on every navigation. RoutePolicy is
+applied to each browser context and:
+
+- aborts requests by resource type (image, font, media by default) or by URL
+  pattern (analytics/tracking hosts),
+- injects a stylesheet into every document that disables CSS transitions and
+  animations, so nothing has to wait for an element to finish sliding in,
+- optionally supplies a smaller default viewport for new contexts.
+
+Blocked requests are counted per type. Their size is unknown (they are never
+downloaded), so bytes saved are estimated from the average size of responses
+of the same type seen while the policy was lifted, or from a typical size.
+
+Screenshots need the real rendering: wrap them in `async with
+policy.lifted(page):`, which lets everything through for that context,
+reloads images that were blocked and removes the animation stylesheet until
+the block exits.
+
+Environment:
+    EMR_BLOCK_RESOURCES=0   Turn the policy off (nothing blocked or injected)
+    EMR_VIEWPORT=1280x800   Default viewport for new contexts
+"""
+import os
+import re
+from contextlib import asynccontextmanager
+
+BLOCKED_TYPES = ("image", "font", "media")
+BLOCKED_PATTERNS = (
+    r"google-analytics\.com",
+    r"googletagmanager\.com",
+    r"doubleclick\.net",
+    r"facebook\.net",
+    r"hotjar\.com",
+    r"/analytics(\.js|/)",
+)
+
+# Rough sizes for estimating what a blocked request would have transferred
+TYPICAL_BYTES = {"image": 15_000, "font": 40_000, "media": 250_000}
+DEFAULT_TYPICAL_BYTES = 10_000
+
+STYLE_ID = "emr-route-policy"
+NO_ANIMATION_CSS = (
+    "*, *::before, *::after {"
+    " transition: none !important;"
+    " animation: none !important;"
+    " scroll-behavior: auto !important;"
+    " caret-color: transparent !important; }"
+)
+
+# Runs in every frame before the page's own scripts; the style is attached as
+# soon as there is a document element to hold it
+NO_ANIMATION_SCRIPT = """
+(() => {
+    const add = () => {
+        if (document.getElementById('%s')) return;
+        const style = document.createElement('style');
+        style.id = '%s';
+        style.textContent = %r;
+        (document.head || document.documentElement).appendChild(style);
+    };
+    if (document.documentElement) add();
+    else document.addEventListener('DOMContentLoaded', add, {once: true});
+})();
+""" % (STYLE_ID, STYLE_ID, NO_ANIMATION_CSS)
+
+# Removes the style and re-requests images that failed to load while blocked
+LIFT_SCRIPT = """
+(styleId) => {
+    const style = document.getElementById(styleId);
+    if (style) style.remove();
+    const pending = [];
+    for (const img of document.images) {
+        if (img.src && img.complete && img.naturalWidth === 0) {
+            pending.push(new Promise(resolve => {
+                img.addEventListener('load', resolve, {once: true});
+                img.addEventListener('error', resolve, {once: true});
+            }));
+            const src = img.src;
+            img.src = '';
+            img.src = src;
+        }
+    }
+    return Promise.race([
+        Promise.all(pending),
+        new Promise(resolve => setTimeout(resolve, 5000)),
+    ]).then(() => pending.length);
+}
+"""
+
+RESTORE_SCRIPT = NO_ANIMATION_SCRIPT.strip().rstrip(";")
+
+
+def parse_viewport(value: str):
+    """'1280x800' -> {"width": 1280, "height": 800}; None if unset or malformed"""
+    match = re.fullmatch(r"\s*(\d+)\s*[xX]\s*(\d+)\s*", value or "")
+    if not match:
+        return None
+    return {"width": int(match.group(1)), "height": int(match.group(2))}
+
+
+class RoutePolicy:
+    """Per-context request blocking and render-cost reduction with savings stats"""
+
+    def __init__(self, block_types=BLOCKED_TYPES, block_patterns=BLOCKED_PATTERNS,
+                 disable_animations: bool = True, viewport: dict = None, enabled: bool = True):
+        self.block_types = frozenset(block_types)
+        self.block_pattern = re.compile("|".join(block_patterns)) if block_patterns else None
+        self.disable_animations = disable_animations
+        self.viewport = viewport
+        self.enabled = enabled
+        self.lifted_contexts = set()
+        self.stats = {"blocked": {}, "allowed": 0, "allowed_bytes": 0, "lifts": 0}
+        self.observed = {}  # resource type -> [responses, bytes]
+
+    @classmethod
+    def from_env(cls) -> "RoutePolicy":
+        """Policy configured from EMR_BLOCK_RESOURCES / EMR_VIEWPORT"""
+        enabled = os.environ.get("EMR_BLOCK_RESOURCES", "1").lower() not in ("0", "false", "no", "off")
+        return cls(viewport=parse_viewport(os.environ.get("EMR_VIEWPORT")), enabled=enabled)
+
+    def context_kwargs(self, kwargs: dict) -> dict:
+        """browser.new_context() arguments with the policy viewport as default"""
+        if self.enabled and self.viewport and "viewport" not in kwargs:
+            return {**kwargs, "viewport": self.viewport}
+        return kwargs
+
+    def should_block(self, request) -> bool:
+        if request.resource_type in self.block_types:
+            return True
+        return bool(self.block_pattern and self.block_pattern.search(request.url))
+
+    async def apply(self, context):
+        """Install the route handler and animation stylesheet on a context"""
+        if not self.enabled:
+            return context
+
+        async def handle(route):
+            request = route.request
+            if context not in self.lifted_contexts and self.should_block(request):
+                kind = request.resource_type
+                self.stats["blocked"][kind] = self.stats["blocked"].get(kind, 0) + 1
+                await route.abort("blockedbyclient")
+            else:
+                # Let later-registered handlers (e.g. HAR replay) answer first
+                await route.fallback()
+
+        def on_response(response):
+            try:
+                size = int(response.headers.get("content-length", 0))
+            except (TypeError, ValueError):
+                size = 0
+            self.stats["allowed"] += 1
+            self.stats["allowed_bytes"] += size
+            if size:
+                seen = self.observed.setdefault(response.request.resource_type, [0, 0])
+                seen[0] += 1
+                seen[1] += size
+
+        await context.route("**/*", handle)
+        context.on("response", on_response)
+        if self.disable_animations:
+            await context.add_init_script(NO_ANIMATION_SCRIPT)
+        return context
+
+    @asynccontextmanager
+    async def lifted(self, page):
+        """
+        Let everything load for one page's context, e.g. around a screenshot
+
+        Blocked images are requested again and the animation stylesheet is
+        removed from every frame; both are restored when the block exits.
+        """
+        context = page.context
+        if not self.enabled or context in self.lifted_contexts:
+            yield page
+            return
+
+        self.lifted_contexts.add(context)
+        self.stats["lifts"] += 1
+        try:
+            for frame in page.frames:
+                try:
+                    await frame.evaluate(LIFT_SCRIPT, STYLE_ID)
+                except Exception:
+                    pass
+            yield page
+        finally:
+            self.lifted_contexts.discard(context)
+            if self.disable_animations:
+                for frame in page.frames:
+                    try:
+                        await frame.evaluate(RESTORE_SCRIPT)
+                    except Exception:
+                        pass
+
+    def estimated_bytes(self, kind: str) -> float:
+        seen = self.observed.get(kind)
+        if seen and seen[0]:
+            return seen[1] / seen[0]
+        return TYPICAL_BYTES.get(kind, DEFAULT_TYPICAL_BYTES)
+
+    def report(self) -> str:
+        """One-line summary of requests blocked and bytes saved"""
+        if not self.enabled:
+            return "Route policy: off"
+        blocked = self.stats["blocked"]
+        count = sum(blocked.values())
+        saved = sum(n * self.estimated_bytes(kind) for kind, n in blocked.items())
+        by_type = ", ".join(f"{n} {kind}" for kind, n in sorted(blocked.items())) or "none"
+        return (f"Route policy: {count} request(s) blocked ({by_type}), "
+                f"~{saved / 1024:.0f} KB saved; {self.stats['allowed']} loaded "
+                f"({self.stats['allowed_bytes'] / 1024:.0f} KB), {self.stats['lifts']} lift(s)")
+
+
+# Shared instance so one run aggregates its stats
+ROUTE_POLICY = RoutePolicy.from_env()
@@ -0,0 +1,62 @@
+"""
+Run Profiles
+
+How human-like a run behaves is picked once per run, by name:
+
+- human:      Camoufox cursor humanization, 30-80ms per keystroke in
+              type_human(), submenus opened by moving the mouse to the label
+              and clicking its coordinates, and a pause before the browser
+              closes. For hosts where the automation should look like a person.
+- throughput: No humanization, text typed in one call, menu items clicked
+              directly on the element, no closing pause. For trusted internal
+              OpenEMR instances without bot detection.
+
+Entry points take --profile and call use_profile(); library code reads
+current_profile(). EMR_RUN_PROFILE sets the default (human if unset).
+"""
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+
+@dataclass(frozen=True)
+class RunProfile:
+    """Interaction settings for one run"""
+    name: str
+    humanize: float = 0.0                                 # Camoufox cursor humanization (seconds), 0 = off
+    key_delay_ms: Optional[Tuple[float, float]] = None    # (min, max) pause per keystroke
+    hover_clicks: bool = False                            # Mouse to label coordinates, then click
+    linger_seconds: float = 0.0                           # Keep the browser open at the end of a run
+
+    def launch_options(self, **options) -> dict:
+        """AsyncCamoufox() keyword arguments for this profile"""
+        if self.humanize:
+            options.setdefault("humanize", self.humanize)
+        return options
+
+
+PROFILES = {
+    "human": RunProfile("human", humanize=0.5, key_delay_ms=(30, 80), hover_clicks=True, linger_seconds=3),
+    "throughput": RunProfile("throughput"),
+}
+DEFAULT_PROFILE = os.environ.get("EMR_RUN_PROFILE", "human")
+
+_current = PROFILES.get(DEFAULT_PROFILE, PROFILES["human"])
+
+
+def use_profile(name: str) -> RunProfile:
+    """
+    Select the run profile for this process
+
+    Raises:
+        ValueError: If the name is not one of PROFILES
+    """
+    global _current
+    if name not in PROFILES:
+        raise ValueError(f"Unknown run profile {name!r} (choose from {', '.join(PROFILES)})")
+    _current = PROFILES[name]
+    return _current
+
+
+def current_profile() -> RunProfile:
+    return _current
@@ -0,0 +1,196 @@
+"""
+Authenticated Session Cache
+
+Saves Playwright storage_state (cookies + localStorage) per (base_url,
+username) after a successful login and reuses it for new contexts, so most
+runs skip the login page entirely.
+
+A cached session is used only if:
+- it is younger than the TTL, and
+- one lightweight GET of the main app page with its cookies comes back as
+  the app rather than a redirect to the login screen.
+
+Sessions are also dropped as soon as a page that was opened from the cache
+lands on the login screen (detected logout). A real login happens only when
+there is no usable cached session.
+
+While HAR_MODE records or replays, the cache is bypassed: every context logs
+in, so recordings contain the login and replays never need the network.
+
+Contexts opened from one cached entry share its PHP session, and with it
+session state such as the active patient. Concurrent workers pass fresh=True
+to log in on their own instead.
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+from .har_replay import HAR_MODE
+
+CACHE_DIR = Path(__file__).resolve().parent.parent / ".session_cache"
+DEFAULT_TTL = 30 * 60  # seconds
+
+MAIN_PATH = "/interface/main/tabs/main.php"
+# Only the logged-in tabs UI loads this script; the login screen does not
+APP_MARKER = "tabs_view_model"
+
+
+class SessionCache:
+    """On-disk cache of authenticated storage_state, keyed by (base_url, username)"""
+
+    def __init__(self, cache_dir: Path = CACHE_DIR, ttl: float = DEFAULT_TTL):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "invalidated": 0,
+            "logins": 0,
+            "saved_seconds": 0.0,
+        }
+
+    def path_for(self, base_url: str, username: str) -> Path:
+        key = hashlib.sha1(f"{base_url}|{username}".encode()).hexdigest()[:16]
+        return self.cache_dir / f"{key}.json"
+
+    def load(self, base_url: str, username: str):
+        """
+        Load a cached entry if present and not expired
+
+        Returns:
+            dict with storage_state, saved_at and login_seconds, or None
+        """
+        path = self.path_for(base_url, username)
+        if not path.exists():
+            return None
+        try:
+            entry = json.loads(path.read_text())
+        except (OSError, ValueError):
+            path.unlink(missing_ok=True)
+            return None
+
+        if time.time() - entry.get("saved_at", 0) > self.ttl:
+            self.stats["expired"] += 1
+            path.unlink(missing_ok=True)
+            return None
+        return entry
+
+    def save(self, base_url: str, username: str, storage_state: dict, login_seconds: float):
+        """Write storage_state for (base_url, username), readable by the owner only"""
+        self.cache_dir.mkdir(mode=0o700, exist_ok=True)
+        path = self.path_for(base_url, username)
+        entry = {
+            "base_url": base_url,
+            "username": username,
+            "saved_at": time.time(),
+            "login_seconds": round(login_seconds, 3),
+            "storage_state": storage_state,
+        }
+        tmp = path.with_suffix(".tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        tmp.replace(path)
+
+    def invalidate(self, base_url: str, username: str):
+        """Drop a cached session (e.g. after a detected logout)"""
+        path = self.path_for(base_url, username)
+        if path.exists():
+            path.unlink(missing_ok=True)
+            self.stats["invalidated"] += 1
+
+    async def validate(self, context, base_url: str, timeout: float = 10000) -> bool:
+        """
+        Check a context's cookies with one GET of the main app page
+
+        Returns:
+            bool: True if the app answered rather than the login screen
+        """
+        try:
+            response = await context.request.get(base_url + MAIN_PATH, timeout=timeout)
+            if not response.ok or "login" in response.url.lower():
+                return False
+            return APP_MARKER in await response.text()
+        except Exception:
+            return False
+
+    def watch_for_logout(self, page, base_url: str, username: str):
+        """Invalidate the cached session as soon as the page lands on the login screen"""
+        def on_navigated(frame):
+            if frame == page.main_frame and "login/login.php" in frame.url:
+                self.invalidate(base_url, username)
+        page.on("framenavigated", on_navigated)
+
+    async def open_context(self, browser, base_url: str, username: str, password: str,
+                           login_fn, policy=None, fresh: bool = False, **context_kwargs):
+        """
+        Open a new context + page that is logged in
+
+        Args:
+            browser: Playwright browser
+            base_url: OpenEMR base URL (e.g. https://demo.openemr.io/openemr)
+            username: Login username
+            password: Login password
+            login_fn: async (page, username, password) -> bool, used on a cache miss
+            policy: Optional RoutePolicy applied to the new context
+            fresh: Always log in, so the context gets a PHP session of its
+                own (the login is still saved for later runs)
+            **context_kwargs: Extra browser.new_context() arguments
+
+        Returns:
+            tuple (context, page, logged_in). On a hit the page is already on
+            the main app page.
+        """
+        if policy:
+            context_kwargs = policy.context_kwargs(context_kwargs)
+
+        entry = None if HAR_MODE.enabled or fresh else self.load(base_url, username)
+        if entry:
+            started = time.perf_counter()
+            context = await browser.new_context(storage_state=entry["storage_state"], **context_kwargs)
+            if policy:
+                await policy.apply(context)
+            if await self.validate(context, base_url):
+                page = await context.new_page()
+                await page.goto(base_url + MAIN_PATH, wait_until="domcontentloaded")
+                if "login" not in page.url.lower():
+                    self.stats["hits"] += 1
+                    spent = time.perf_counter() - started
+                    self.stats["saved_seconds"] += max(0.0, entry.get("login_seconds", 0) - spent)
+                    self.watch_for_logout(page, base_url, username)
+                    return context, page, True
+            self.invalidate(base_url, username)
+            await context.close()
+
+        if not fresh:
+            self.stats["misses"] += 1
+        context = await HAR_MODE.new_context(browser, **context_kwargs)
+        if policy:
+            await policy.apply(context)
+        page = await context.new_page()
+
+        started = time.perf_counter()
+        logged_in = await login_fn(page, username, password)
+        if logged_in:
+            self.stats["logins"] += 1
+        if logged_in and not HAR_MODE.enabled:
+            self.save(base_url, username, await context.storage_state(),
+                      time.perf_counter() - started)
+            self.watch_for_logout(page, base_url, username)
+        return context, page, logged_in
+
+    def report(self) -> str:
+        """One-line summary of cache effectiveness"""
+        s = self.stats
+        lookups = s["hits"] + s["misses"]
+        rate = (s["hits"] / lookups * 100) if lookups else 0.0
+        return (f"Session cache: {s['hits']} hit(s), {s['misses']} miss(es) ({rate:.0f}% hit rate), "
+                f"{s['expired']} expired, {s['invalidated']} invalidated, "
+                f"~{s['saved_seconds']:.1f}s of login saved")
+
+
+# Shared instance so one run aggregates its stats
+SESSION_CACHE = SessionCache()
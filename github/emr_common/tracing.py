@@ -0,0 +1,243 @@
+"""
+Step Timing and Trace Export
+
+Workflows wrap each step in a span:
+
+    with TRACER.span("select_patient", timings=result.timings):
+        await session.select_patient(patient_name)
+
+- timings: A span given a dict adds its duration (seconds) under its name,
+  whether or not tracing is on. The result dataclasses carry this dict as
+  their step breakdown.
+- Tracing on (--trace DIR or EMR_TRACE=DIR): every span is recorded with its
+  asyncio task, so nested spans and concurrent workers show up as separate
+  tracks. Playwright Page/Frame/ElementHandle/Mouse/Keyboard calls are
+  wrapped in spans too (category "playwright").
+- Tracing off: span() without timings returns one shared no-op object and
+  Playwright is left unpatched.
+
+finish() writes DIR/trace_summary.json (count, total, p50, p95, max per span
+name) and DIR/trace.json (Chrome trace-event format, for chrome://tracing or
+https://ui.perfetto.dev).
+"""
+import asyncio
+import functools
+import json
+import math
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+# Playwright calls that get their own span when tracing is on
+PLAYWRIGHT_CALLS = {
+    "Page": ("goto", "click", "fill", "type", "press", "evaluate", "query_selector", "query_selector_all",
+             "wait_for_selector", "wait_for_load_state", "select_option", "screenshot", "set_content",
+             "inner_text", "reload"),
+    "Frame": ("goto", "click", "fill", "type", "press", "evaluate", "query_selector", "query_selector_all",
+              "wait_for_selector", "wait_for_load_state", "wait_for_function", "select_option",
+              "inner_text", "content"),
+    "ElementHandle": ("click", "fill", "select_option", "text_content", "inner_text"),
+    "Mouse": ("move", "click"),
+    "Keyboard": ("type", "press"),
+}
+MAX_EVENTS = 200000
+
+
+def percentile(values: list, q: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
+
+
+def format_timings(timings: dict) -> str:
+    """'login 1.20s, select_patient 0.35s, ...' for printing"""
+    return ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items())
+
+
+class _NoSpan:
+    """Shared span for tracing off and no timings: does nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class Span:
+    """One timed step; see Tracer.span()"""
+    __slots__ = ("tracer", "name", "cat", "args", "timings", "started")
+
+    def __init__(self, tracer, name: str, cat: str, args: dict, timings: Optional[dict]):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.timings = timings
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        if self.timings is not None:
+            self.timings[self.name] = round(self.timings.get(self.name, 0.0) + elapsed, 3)
+        if self.tracer.enabled:
+            if exc_type is not None:
+                self.args["error"] = exc_type.__name__
+            self.tracer.record(self.name, self.cat, self.started, elapsed, self.args)
+        return False
+
+
+class Tracer:
+    """Collects spans in memory and writes the summary and Chrome trace"""
+
+    def __init__(self, out_dir: Optional[str] = None):
+        self.enabled = False
+        self.out_dir = None
+        self.origin = time.perf_counter()
+        self.events = []      # (name, cat, start, duration, tid, args)
+        self.durations = {}   # span name -> durations in seconds
+        self.tids = {}        # id of asyncio task -> small track number
+        self.dropped = 0
+        self._patched = False
+        if out_dir:
+            self.enable(out_dir)
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        return cls(os.environ.get("EMR_TRACE") or None)
+
+    def enable(self, out_dir: Optional[str] = None):
+        """Start recording spans (written to out_dir by finish())"""
+        if out_dir:
+            self.out_dir = Path(out_dir)
+        self.enabled = True
+        self.instrument_playwright()
+
+    def span(self, name: str, timings: Optional[dict] = None, cat: str = "step", **args):
+        """Context manager timing one step (see module docstring)"""
+        if not self.enabled and timings is None:
+            return NO_SPAN
+        return Span(self, name, cat, args, timings)
+
+    def traced(self, name: str):
+        """Decorator running an async function inside a span when tracing is on"""
+        def decorate(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return await fn(*args, **kwargs)
+                with self.span(name, cat="workflow"):
+                    return await fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def _tid(self) -> int:
+        try:
+            task = id(asyncio.current_task())
+        except RuntimeError:
+            task = None
+        if task not in self.tids:
+            self.tids[task] = len(self.tids) + 1
+        return self.tids[task]
+
+    def record(self, name: str, cat: str, started: float, elapsed: float, args: dict):
+        self.durations.setdefault(name, []).append(elapsed)
+        if len(self.events) >= MAX_EVENTS:
+            self.dropped += 1
+            return
+        self.events.append((name, cat, started, elapsed, self._tid(), args))
+
+    def instrument_playwright(self):
+        """Wrap the PLAYWRIGHT_CALLS methods in spans (once per process)"""
+        if self._patched:
+            return
+        try:
+            from playwright import async_api
+        except ImportError:
+            return
+        self._patched = True
+
+        def wrap(cls_name, method):
+            @functools.wraps(method)
+            async def call(obj, *args, **kwargs):
+                if not self.enabled:
+                    return await method(obj, *args, **kwargs)
+                detail = {"target": args[0][:80]} if args and isinstance(args[0], str) else {}
+                with self.span(f"{cls_name}.{method.__name__}", cat="playwright", **detail):
+                    return await method(obj, *args, **kwargs)
+            return call
+
+        for cls_name, methods in PLAYWRIGHT_CALLS.items():
+            cls = getattr(async_api, cls_name, None)
+            for name in methods:
+                method = getattr(cls, name, None) if cls else None
+                if method is not None:
+                    setattr(cls, name, wrap(cls_name, method))
+
+    def summary(self) -> dict:
+        """Per span name: count, total, p50, p95 and max seconds"""
+        summary = {}
+        for name, values in self.durations.items():
+            values = sorted(values)
+            summary[name] = {
+                "count": len(values),
+                "total": round(sum(values), 3),
+                "p50": round(percentile(values, 0.50), 3),
+                "p95": round(percentile(values, 0.95), 3),
+                "max": round(values[-1], 3),
+            }
+        return dict(sorted(summary.items(), key=lambda item: -item[1]["total"]))
+
+    def chrome_trace(self) -> dict:
+        """Recorded spans as Chrome trace-event JSON ("X" complete events)"""
+        pid = os.getpid()
+        events = [{
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": round((started - self.origin) * 1e6, 1),
+            "dur": round(elapsed * 1e6, 1),
+            "pid": pid,
+            "tid": tid,
+            "args": args,
+        } for name, cat, started, elapsed, tid, args in self.events]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def finish(self, out_dir: Optional[str] = None) -> list:
+        """
+        Write trace_summary.json and trace.json if tracing is on
+
+        Returns:
+            list of written paths (empty when tracing is off)
+        """
+        out_dir = Path(out_dir) if out_dir else self.out_dir
+        if not self.enabled or out_dir is None:
+            return []
+        out_dir.mkdir(parents=True, exist_ok=True)
+        summary_path = out_dir / "trace_summary.json"
+        trace_path = out_dir / "trace.json"
+        summary_path.write_text(json.dumps(self.summary(), indent=2))
+        trace_path.write_text(json.dumps(self.chrome_trace()))
+        return [summary_path, trace_path]
+
+    def report(self) -> str:
+        """One-line summary of the slowest spans by p95"""
+        if not self.enabled:
+            return "Trace: off"
+        steps = {n: s for n, s in self.summary().items() if n.split(".")[0] not in PLAYWRIGHT_CALLS}
+        slowest = sorted(steps.items(), key=lambda item: -item[1]["p95"])[:3]
+        top = ", ".join(f"{name} p50 {s['p50']:.2f}s / p95 {s['p95']:.2f}s" for name, s in slowest)
+        dropped = f", {self.dropped} dropped" if self.dropped else ""
+        return f"Trace: {len(self.events)} span(s){dropped}; slowest: {top or '-'}"
+
+
+# Shared instance so one run collects all of its spans
+TRACER = Tracer.from_env()
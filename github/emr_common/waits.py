@@ -0,0 +1,253 @@
+"""
+Event-Driven Wait Conditions
+
+Replacements for fixed asyncio.sleep() calls after clicks and navigations.
+Each step declares what it is waiting for - a frame, a URL change, a visible
+selector, a quiet network or a settled DOM - and continues as soon as that
+condition is met.
+
+Every wait is capped by a "max wait" ceiling and, optionally, by a WaitBudget
+shared across the steps of one operation. Waits never raise: they return
+False/None on timeout so the caller can carry on exactly as it did after a
+sleep.
+"""
+import asyncio
+import time
+
+from emr_common import js_helpers
+from emr_common.frame_registry import frame_registry
+
+# Ceiling for a single wait when the caller gives no timeout (ms)
+DEFAULT_MAX_WAIT = 10000
+
+
+class WaitBudget:
+    """Overall timeout budget shared by the steps of one operation"""
+
+    def __init__(self, total_ms: float = 60000, max_wait_ms: float = DEFAULT_MAX_WAIT):
+        self.total_ms = total_ms
+        self.max_wait_ms = max_wait_ms
+        self.started = time.monotonic()
+
+    @property
+    def remaining_ms(self) -> float:
+        elapsed = (time.monotonic() - self.started) * 1000
+        return max(0.0, self.total_ms - elapsed)
+
+    @property
+    def exhausted(self) -> bool:
+        return self.remaining_ms <= 0
+
+    def timeout(self, ms: float = None) -> float:
+        """
+        Timeout for one step
+
+        Args:
+            ms: Requested timeout (defaults to the max wait ceiling)
+
+        Returns:
+            float: Requested timeout capped by the ceiling and the remaining budget
+        """
+        ms = self.max_wait_ms if ms is None else min(ms, self.max_wait_ms)
+        return max(1.0, min(ms, self.remaining_ms))
+
+
+def resolve_timeout(timeout: float = None, budget: WaitBudget = None) -> float:
+    """Effective timeout in ms for a wait"""
+    if budget is not None:
+        return budget.timeout(timeout)
+    return DEFAULT_MAX_WAIT if timeout is None else timeout
+
+
+async def bounded(coro, timeout_ms: float):
+    """
+    Run a coroutine with a hard time limit
+
+    Returns:
+        The coroutine result, or None on timeout or error
+    """
+    try:
+        return await asyncio.wait_for(coro, timeout_ms / 1000)
+    except Exception:
+        return None
+
+
+def find_frame(page, keyword: str):
+    """Frame whose URL contains keyword (or logical frame name), or None"""
+    return frame_registry(page).get(keyword)
+
+
+async def wait_for_frame(page, keyword: str, timeout: float = None, budget: WaitBudget = None,
+                         load_state: str = "domcontentloaded"):
+    """
+    Wait until a frame whose URL contains keyword is attached and loaded
+
+    Returns immediately if such a frame already exists, otherwise the moment
+    one navigates (see FrameRegistry). Use expect_frame() instead when an
+    action is about to (re)navigate a frame that is already there.
+
+    Args:
+        page: Playwright page object
+        keyword: String to match in frame URL, or a logical frame name
+        timeout: Wait timeout in milliseconds
+        budget: Optional WaitBudget shared with other steps
+        load_state: Load state the frame must reach
+
+    Returns:
+        Frame object or None
+    """
+    return await frame_registry(page).wait_for(keyword, resolve_timeout(timeout, budget), load_state)
+
+
+class FrameNavigation:
+    """
+    Async context manager that waits for a frame to navigate during its block
+
+    The waiter is registered with the page's FrameRegistry before the block
+    runs, so a navigation triggered by a click inside the block cannot be
+    missed. After the block, `frame` holds the navigated frame, or None if it
+    did not happen in time.
+    """
+
+    def __init__(self, page, keyword: str, timeout: float = None, budget: WaitBudget = None,
+                 load_state: str = "domcontentloaded"):
+        self.page = page
+        self.keyword = keyword
+        self.timeout = timeout
+        self.budget = budget
+        self.load_state = load_state
+        self.frame = None
+        self._future = None
+
+    async def __aenter__(self):
+        self._future = frame_registry(self.page).next_navigation(self.keyword)
+        return self
+
+    def cancel(self):
+        """Stop waiting, e.g. when the action that would navigate did not happen"""
+        frame_registry(self.page).discard(self.keyword, self._future)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None and not self._future.cancelled():
+                self.frame = await bounded(self._wait(), resolve_timeout(self.timeout, self.budget))
+        finally:
+            frame_registry(self.page).discard(self.keyword, self._future)
+        return False
+
+    async def _wait(self):
+        frame = await self._future
+        await frame.wait_for_load_state(self.load_state)
+        return frame
+
+
+def expect_frame(page, keyword: str, timeout: float = None, budget: WaitBudget = None,
+                 load_state: str = "domcontentloaded") -> FrameNavigation:
+    """
+    Wait for a frame whose URL contains keyword to navigate during a block
+
+    Usage:
+        async with expect_frame(page, "addrbook_edit") as nav:
+            await add_btn.click()
+        add_frame = nav.frame
+    """
+    return FrameNavigation(page, keyword, timeout, budget, load_state)
+
+
+async def wait_for_url(page, predicate, timeout: float = None, budget: WaitBudget = None) -> bool:
+    """
+    Wait until the top-level URL satisfies predicate
+
+    Args:
+        page: Playwright page object
+        predicate: Callable taking the URL string and returning bool
+        timeout: Wait timeout in milliseconds
+        budget: Optional WaitBudget shared with other steps
+
+    Returns:
+        bool: True if the URL matched in time
+    """
+    ms = resolve_timeout(timeout, budget)
+    try:
+        await page.wait_for_url(predicate, wait_until="domcontentloaded", timeout=ms)
+        return True
+    except Exception:
+        return predicate(page.url)
+
+
+async def wait_for_visible(frame, selector: str, timeout: float = None, budget: WaitBudget = None) -> bool:
+    """
+    Wait until selector is visible in a page or frame
+
+    Returns:
+        bool: True if the element became visible in time
+    """
+    ms = resolve_timeout(timeout, budget)
+    try:
+        await frame.wait_for_selector(selector, state="visible", timeout=ms)
+        return True
+    except Exception:
+        return False
+
+
+async def wait_for_network_quiet(page, quiet_ms: float = 500, timeout: float = None,
+                                 budget: WaitBudget = None) -> bool:
+    """
+    Wait until no request has been in flight for quiet_ms
+
+    Unlike wait_for_load_state("networkidle") this also works after the page
+    has finished loading, e.g. after a click that fires XHRs or reloads a
+    child frame.
+
+    Returns:
+        bool: True if the network went quiet in time
+    """
+    inflight = set()
+    changed = asyncio.Event()
+
+    def on_request(request):
+        inflight.add(request)
+        changed.set()
+
+    def on_done(request):
+        inflight.discard(request)
+        changed.set()
+
+    async def _quiet():
+        while True:
+            changed.clear()
+            if inflight:
+                await changed.wait()
+                continue
+            try:
+                await asyncio.wait_for(changed.wait(), quiet_ms / 1000)
+            except asyncio.TimeoutError:
+                return True
+
+    page.on("request", on_request)
+    page.on("requestfinished", on_done)
+    page.on("requestfailed", on_done)
+    try:
+        return bool(await bounded(_quiet(), resolve_timeout(timeout, budget)))
+    finally:
+        page.remove_listener("request", on_request)
+        page.remove_listener("requestfinished", on_done)
+        page.remove_listener("requestfailed", on_done)
+
+
+async def wait_for_dom_settled(frame, quiet_ms: float = 200, timeout: float = None,
+                               budget: WaitBudget = None) -> bool:
+    """
+    Wait until the DOM has had no mutations for quiet_ms
+
+    Useful after opening menus or dropdowns, where nothing navigates but the
+    next element only exists once the DOM has been updated.
+
+    Returns:
+        bool: True if the DOM settled in time
+    """
+    ms = resolve_timeout(timeout, budget)
+    try:
+        return bool(await js_helpers.call(frame, "domSettled", quiet_ms, ms))
+    except Exception:
+        return False
@@ -7,17 +7,41 @@ import random
 import json
 from pathlib import Path
 
+from emr_common.waits import (
+    WaitBudget,
+    expect_frame,
+    find_frame,
+    wait_for_dom_settled,
+    wait_for_frame,
+    wait_for_network_quiet,
+    wait_for_url,
+)
+from emr_common import BASE_URL, js_helpers
+from emr_common.nav_index import NAV_INDEX
+from emr_common.route_policy import ROUTE_POLICY
+from emr_common.run_profile import current_profile
+from emr_common.session_cache import SESSION_CACHE
+from .schema import FormSchema
+
 BASE_DIR = Path(__file__).parent
 SELECTORS = json.loads((BASE_DIR / "selectors.json").read_text())
 OPERATIONS = json.loads((BASE_DIR / "operations.json").read_text())
 
+# Compiled once: field kinds, selectors and limits of the Address Book add form
+ADDRESS_FORM = FormSchema.compile(SELECTORS, OPERATIONS, "add_address_entry")
+
 # Login credentials
-LOGIN_URL = "https://demo.openemr.io/openemr/interface/login/login.php?site=default"
+LOGIN_URL = f"{BASE_URL}/interface/login/login.php?site=default"
 DEFAULT_USERNAME = "admin"
 DEFAULT_PASSWORD = "pass"
 
 
-async def login(page, username=DEFAULT_USERNAME, password=DEFAULT_PASSWORD):
+def is_logged_in(page) -> bool:
+    """True if the page is already inside the OpenEMR app (not the login screen)"""
+    return "/interface/main/" in page.url
+
+
+async def login(page, username=DEFAULT_USERNAME, password=DEFAULT_PASSWORD, timeout=15000):
     """
     Login to OpenEMR
 
@@ -25,26 +49,64 @@ async def login(page, username=DEFAULT_USERNAME, password=DEFAULT_PASSWORD):
         page: Playwright page object
         username: Login username
         password: Login password
+        timeout: Wait timeout in milliseconds for the post-login redirect
 
     Returns:
         bool: True if login successful
     """
-    await page.goto(LOGIN_URL, wait_until="networkidle")
+    await page.goto(LOGIN_URL, wait_until="domcontentloaded")
     await page.fill("[name='authUser']", username)
     await page.fill("[name='clearPass']", password)
     await page.click("#login-button")
 
-    try:
-        await page.wait_for_load_state("networkidle", timeout=15000)
-    except Exception:
-        pass
-    await asyncio.sleep(2)
+    # Login posts to main_screen.php?auth=login, then redirects to the tabs UI
+    await wait_for_url(page, lambda url: "login" not in url.lower(), timeout=timeout)
 
     title = await page.title()
     return "OpenEMR" in title and "Login" not in title
 
 
-async def navigate_to(page, menu_path: list, timeout=15000):
+async def open_logged_in_page(browser, username=DEFAULT_USERNAME, password=DEFAULT_PASSWORD,
+                              cache=None, policy=ROUTE_POLICY, fresh=False, **context_kwargs):
+    """
+    Open a new context and page that is logged in to OpenEMR
+
+    Reuses a cached storage_state when it is still valid and only falls back
+    to login() when it is not.
+
+    Args:
+        browser: Playwright browser
+        username: Login username
+        password: Login password
+        cache: SessionCache to use (defaults to the shared SESSION_CACHE)
+        policy: RoutePolicy for the context (None loads everything)
+        fresh: Skip the cache and log in, for a PHP session of its own
+        **context_kwargs: Extra browser.new_context() arguments
+
+    Returns:
+        tuple (context, page, logged_in)
+    """
+    cache = cache or SESSION_CACHE
+    return await cache.open_context(browser, BASE_URL, username, password, login,
+                                    policy=policy, fresh=fresh, **context_kwargs)
+
+
+async def click_menu_item(page, item: str) -> bool:
+    """
+    Click a menu label or dropdown toggle by its text
+
+    Args:
+        page: Playwright page object
+        item: Menu label text
+
+    Returns:
+        bool: True if the item was found and clicked
+    """
+    # Use JavaScript to click menu items for reliability
+    return await js_helpers.call(page, "menuClick", item)
+
+
+async def navigate_to(page, menu_path: list, timeout=15000, wait_frame: str = None, use_index=True):
     """
     Navigate through menu items
 
@@ -52,51 +114,53 @@ async def navigate_to(page, menu_path: list, timeout=15000):
         page: Playwright page object
         menu_path: List of menu items to click, e.g. ["Admin", "Address Book"]
         timeout: Wait timeout in milliseconds
+        wait_frame: Optional keyword of the frame URL the last item loads
+            (e.g. "addrbook_list"). When given, navigation completes as soon
+            as that frame has loaded; otherwise it waits for the network to
+            go quiet.
+        use_index: Load the target frame URL directly when the navigation
+            index has learned it, falling back to menu clicks otherwise
 
     Returns:
         bool: True if navigation successful
     """
-    for i, item in enumerate(menu_path):
-        try:
-            # Use JavaScript to click menu items for reliability
-            clicked = await page.evaluate(f"""
-                () => {{
-                    const items = document.querySelectorAll('.menuLabel');
-                    for (const el of items) {{
-                        if (el.textContent.trim() === '{item}') {{
-                            el.click();
-                            return true;
-                        }}
-                    }}
-                    // Try dropdown toggles
-                    const dropdowns = document.querySelectorAll('.dropdown-toggle');
-                    for (const el of dropdowns) {{
-                        if (el.textContent.trim() === '{item}') {{
-                            el.click();
-                            return true;
-                        }}
-                    }}
-                    return false;
-                }}
-            """)
-
-            if clicked:
-                await asyncio.sleep(0.5)
-            else:
-                print(f"Menu item not found: {item}")
+    budget = WaitBudget(total_ms=timeout)
+
+    async def click_through():
+        for i, item in enumerate(menu_path):
+            is_last = i == len(menu_path) - 1
+            try:
+                if is_last and wait_frame:
+                    async with expect_frame(page, wait_frame, budget=budget) as nav:
+                        clicked = await click_menu_item(page, item)
+                        if not clicked:
+                            nav.cancel()
+                    if clicked and not nav.frame:
+                        # Tab was already showing the page and did not reload
+                        await wait_for_frame(page, wait_frame, budget=budget)
+                else:
+                    clicked = await click_menu_item(page, item)
+
+                if not clicked:
+                    print(f"Menu item not found: {item}")
+                    return False
+
+                if not is_last:
+                    # Let the dropdown open before looking for the next label
+                    await wait_for_dom_settled(page, quiet_ms=100, timeout=500)
+
+            except Exception as e:
+                print(f"Navigation error at '{item}': {e}")
                 return False
 
-        except Exception as e:
-            print(f"Navigation error at '{item}': {e}")
-            return False
+        if not wait_frame:
+            await wait_for_network_quiet(page, quiet_ms=500, budget=budget)
 
-    try:
-        await page.wait_for_load_state("networkidle", timeout=timeout)
-    except Exception:
-        pass
-    await asyncio.sleep(2)
+        return True
 
-    return True
+    if not use_index:
+        return await click_through()
+    return await NAV_INDEX.navigate(page, menu_path, click_through, wait_frame, budget)
 
 
 async def find_content_frame(page, keyword):
@@ -110,61 +174,126 @@ async def find_content_frame(page, keyword):
     Returns:
         Frame object or None
     """
-    for frame in page.frames:
-        if keyword in frame.url:
-            return frame
-    return None
+    return find_frame(page, keyword)
 
 
-async def type_human(page, text, delay_range=(30, 80)):
+async def type_human(page, text, delay_range=None):
     """
     Type text with human-like delays using page.keyboard
 
+    The throughput run profile has no per-key delay, so the text is typed in
+    one call.
+
     Args:
         page: Playwright page object (NOT frame - frames don't have keyboard)
         text: Text to type
         delay_range: Tuple of (min_ms, max_ms) delay between keystrokes
+            (defaults to the run profile's)
     """
+    delay_range = delay_range or current_profile().key_delay_ms
+    if not delay_range:
+        await page.keyboard.type(text)
+        return
     for char in text:
         await page.keyboard.type(char)
         await asyncio.sleep(random.uniform(delay_range[0], delay_range[1]) / 1000)
 
 
-async def fill_form(frame, field_data: dict, selectors: dict = None):
+async def fill_field(frame, field_name: str, selector: str, value, kind: str = None) -> str:
+    """
+    Fill one field with real Playwright input (fill/select_option/check)
+
+    Args:
+        kind: Field kind from the schema; looked up in the DOM if not given
+
+    Returns:
+        str: "ok", "missing" or "error"
+    """
+    try:
+        if kind == "select":
+            await frame.select_option(selector, value)
+            return "ok"
+        if kind in ("text", "textarea"):
+            await frame.fill(selector, str(value))
+            return "ok"
+
+        element = await frame.query_selector(selector)
+        if not element:
+            return "missing"
+        tag = "checkbox" if kind == "checkbox" else await element.evaluate("el => el.tagName.toLowerCase()")
+
+        if tag == "select":
+            await frame.select_option(selector, value)
+        elif tag == "textarea":
+            await frame.fill(selector, str(value))
+        else:
+            input_type = "checkbox" if kind == "checkbox" else await element.get_attribute("type")
+            if input_type == "checkbox":
+                if value:
+                    await element.check()
+            else:
+                await frame.fill(selector, str(value))
+        return "ok"
+    except Exception as e:
+        print(f"Error filling {field_name}: {e}")
+        return "error"
+
+
+async def fill_form(frame, field_data: dict, selectors: dict = None, batched: bool = True,
+                    keystroke_fields=(), schema: FormSchema = None) -> dict:
     """
     Fill form fields in an iframe
 
+    By default all fields are set in one call to the fillForm helper. Fields
+    the batch cannot set (e.g. a select value with no matching option), and
+    fields listed in keystroke_fields, go through the per-field path.
+
     Args:
         frame: Playwright frame object
         field_data: Dict of field_name -> value
         selectors: Optional dict of field_name -> selector (defaults to [name='field_name'])
+        batched: Set fields in one round trip (False fills field by field)
+        keystroke_fields: Field names that need real input events
+        schema: Optional FormSchema; values are validated first and fields are
+            filled by their recorded kind without inspecting the DOM
+
+    Returns:
+        dict: field_name -> "ok", "missing" or "error"
+
+    Raises:
+        SchemaError: If schema is given and field_data does not fit it
     """
+    if schema:
+        field_data, _ = schema.prepare(field_data)
+
+    fields = []
     for field_name, value in field_data.items():
         if value is None or value == "":
             continue
-
-        selector = f"[name='{field_name}']"
+        spec = schema.fields[field_name] if schema else None
+        selector = spec.selector if spec else f"[name='{field_name}']"
         if selectors and field_name in selectors:
             selector = selectors[field_name]
+        fields.append({"name": field_name, "selector": selector, "value": value,
+                       "kind": spec.kind if spec else None})
+
+    status = {}
+    if batched:
+        batch = [f for f in fields if f["name"] not in keystroke_fields]
+        if batch:
+            try:
+                status = await js_helpers.call(frame, "fillForm", batch)
+            except Exception as e:
+                print(f"Batched fill failed, filling field by field: {e}")
+                status = {}
+
+    for field in fields:
+        if status.get(field["name"]) in ("ok", "missing"):
+            continue
+        status[field["name"]] = await fill_field(frame, field["name"], field["selector"], field["value"],
+                                                 field["kind"])
 
-        try:
-            element = await frame.query_selector(selector)
-            if element:
-                tag = await element.evaluate("el => el.tagName.toLowerCase()")
-
-                if tag == "select":
-                    await frame.select_option(selector, value)
-                elif tag == "textarea":
-                    await frame.fill(selector, str(value))
-                else:
-                    input_type = await element.get_attribute("type")
-                    if input_type == "checkbox":
-                        if value:
-                            await element.check()
-                    else:
-                        await frame.fill(selector, str(value))
-        except Exception as e:
-            print(f"Error filling {field_name}: {e}")
+    return status
 
 
 async def wait_for_success(frame, indicator: dict, timeout=10000):
@@ -181,8 +310,10 @@ async def wait_for_success(frame, indicator: dict, timeout=10000):
     """
     try:
         if indicator.get("type") == "frame_url_change":
-            await asyncio.sleep(2)
-            return indicator.get("value", "") in frame.url
+            value = indicator.get("value", "")
+            if value in frame.url:
+                return True
+            return await wait_for_frame(frame.page, value, timeout=timeout) is not None
         else:
             await frame.wait_for_selector(
                 indicator["selector"],
@@ -226,31 +357,128 @@ async def extract_table_data(frame, table_selector="table"):
         list: List of dicts with column headers as keys
     """
     try:
-        data = await frame.evaluate(f"""
-            () => {{
-                const table = document.querySelector('{table_selector}');
-                if (!table) return [];
-
-                const headers = Array.from(table.querySelectorAll('th'))
-                    .map(th => th.textContent.trim());
-
-                const rows = [];
-                table.querySelectorAll('tbody tr').forEach(tr => {{
-                    const row = {{}};
-                    tr.querySelectorAll('td').forEach((td, i) => {{
-                        row[headers[i] || `col_${{i}}`] = td.textContent.trim();
-                    }});
-                    rows.push(row);
-                }});
-                return rows;
-            }}
-        """)
-        return data
+        return await js_helpers.call(frame, "tableData", table_selector)
     except Exception as e:
         print(f"Error extracting table: {e}")
         return []
 
 
+async def _wait_for_rows(frame, table_selector: str, changed, timeout: float) -> bool:
+    """Poll the table's first chunk until changed(chunk) holds, or timeout (ms)"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout / 1000
+    while loop.time() < deadline:
+        try:
+            chunk = await js_helpers.call(frame, "tableChunk", table_selector, 0, 0, None)
+            if changed(chunk):
+                return True
+        except Exception:
+            # The frame is mid-navigation to the next page
+            pass
+        await asyncio.sleep(0.05)
+    return False
+
+
+async def iter_table_rows(frame, table_selector="table", columns: list = None, chunk_size: int = 500,
+                          next_selector: str = None, scroll: bool = False, timeout=10000):
+    """
+    Yield table rows in bounded chunks
+
+    Each chunk is one evaluate of at most chunk_size rows, so neither the
+    page nor Python materializes the whole table at once. When the rendered
+    rows run out, the table is advanced:
+
+    - next_selector: pagination link to click (e.g. '.paginate_button.next:not(.disabled)');
+      iteration ends when it no longer matches or the page does not change.
+    - scroll: scroll the table's container to load more rows of a virtual
+      list; iteration ends when no new rows arrive within timeout.
+
+    Args:
+        frame: Playwright frame object
+        table_selector: CSS selector for the table
+        columns: Header texts to read; None reads every column
+        chunk_size: Rows per chunk
+        next_selector: Selector of the next-page control, if paginated
+        scroll: Scroll to load more rows (virtual lists)
+        timeout: Milliseconds to wait for the next page or more rows
+
+    Yields:
+        list: Up to chunk_size dicts keyed by column header
+    """
+    while True:
+        start = 0
+        chunk = {"total": 0, "signature": ""}
+        while True:
+            try:
+                chunk = await js_helpers.call(frame, "tableChunk", table_selector, start, chunk_size, columns)
+            except Exception as e:
+                print(f"Error extracting table: {e}")
+                return
+            if chunk["rows"]:
+                start += len(chunk["rows"])
+                yield chunk["rows"]
+            if start < chunk["total"]:
+                continue
+            if scroll and await js_helpers.call(frame, "scrollTable", table_selector):
+                if await _wait_for_rows(frame, table_selector, lambda c: c["total"] > start, timeout):
+                    continue
+            break
+
+        if not next_selector:
+            return
+        signature = chunk["signature"]
+        try:
+            if not await js_helpers.call(frame, "click", next_selector):
+                return
+        except Exception:
+            return
+        if not await _wait_for_rows(frame, table_selector, lambda c: c["signature"] != signature, timeout):
+            return
+
+
+async def search_address_book(page, fname: str = "", lname: str = "", budget: WaitBudget = None):
+    """
+    Filter the Address Book list with its own search form
+
+    The search runs server-side, so the reloaded list holds only matching
+    entries however large the book is.
+
+    Returns:
+        The reloaded addrbook_list frame, or None
+    """
+    list_frame = await find_content_frame(page, "addrbook_list")
+    if not list_frame:
+        return None
+    await list_frame.fill("input[name='form_fname']", fname)
+    await list_frame.fill("input[name='form_lname']", lname)
+    async with expect_frame(page, "addrbook_list", budget=budget) as nav:
+        await list_frame.click("input[name='form_search']")
+    return nav.frame or await find_content_frame(page, "addrbook_list")
+
+
+async def find_address_entries(frame, data: dict) -> list:
+    """
+    Userids of list rows matching mapped Address Book data
+
+    Compares first/last name, email, phone and specialty where given.
+
+    Returns:
+        list of userid strings (None for a row without an edit handler)
+    """
+    expected = {
+        "fname": data.get("form_fname", ""),
+        "lname": data.get("form_lname", ""),
+        "email": data.get("form_email", ""),
+        "phone": data.get("form_phonecell") or data.get("form_phone", ""),
+        "specialty": data.get("form_specialty", ""),
+    }
+    try:
+        return await js_helpers.call(frame, "matchEntries", expected)
+    except Exception as e:
+        print(f"Error matching entries: {e}")
+        return []
+
+
 def map_profile_to_address(profile: dict) -> dict:
     """
     Map external profile data to Address Book fields
@@ -10,28 +10,40 @@ from pathlib import Path
 from camoufox.async_api import AsyncCamoufox
 
 BASE_DIR = Path(__file__).parent
-SELECTORS = json.loads((BASE_DIR / "selectors.json").read_text())
 OPERATIONS = json.loads((BASE_DIR / "operations.json").read_text())
 
 from . import (
-    login,
+    ADDRESS_FORM,
+    NAV_INDEX,
+    ROUTE_POLICY,
+    SESSION_CACHE,
+    open_logged_in_page,
     navigate_to,
     find_content_frame,
     fill_form,
-    map_profile_to_address
+    find_address_entries,
+    map_profile_to_address,
+    search_address_book,
 )
+from .schema import SchemaError
+from emr_common.har_replay import HAR_MODE
+from emr_common.run_profile import DEFAULT_PROFILE, PROFILES, current_profile, use_profile
+from emr_common.tracing import TRACER
+from emr_common.waits import WaitBudget, expect_frame, wait_for_visible
 
 
 class AddAddressEntry:
     """Add a new entry to the Address Book"""
 
-    def __init__(self, page, frame=None):
+    def __init__(self, page, frame=None, timeout=60000):
         self.page = page
         self.frame = frame
+        self.timeout = timeout
         self.operation = next(
             o for o in OPERATIONS["operations"] if o["name"] == "add_address_entry"
         )
 
+    @TRACER.traced("add_address_entry")
     async def execute(self, data: dict) -> dict:
         """
         Execute add_address_entry operation
@@ -62,7 +74,20 @@ class AddAddressEntry:
         Returns:
             dict with success status and result data
         """
+        # Validate against the form schema before touching the browser
         try:
+            data, truncated = ADDRESS_FORM.prepare(data)
+        except SchemaError as e:
+            return {"success": False, "message": str(e), "data": None}
+        if truncated:
+            print(f"    Truncated to maxlength: {', '.join(truncated)}")
+
+        budget = WaitBudget(total_ms=self.timeout)
+        try:
+            # Entries that already match, so verify() only accepts a new one
+            with TRACER.span("baseline"):
+                existing = await self.matching_userids(data, budget)
+
             # 1. Find the address book list frame
             list_frame = await find_content_frame(self.page, "addrbook_list")
             if not list_frame:
@@ -73,39 +98,39 @@ class AddAddressEntry:
             if not add_btn:
                 return {"success": False, "message": "Add New button not found", "data": None}
 
-            await add_btn.click()
-            await asyncio.sleep(2)
+            with TRACER.span("open_form"):
+                async with expect_frame(self.page, "addrbook_edit", budget=budget) as nav:
+                    await add_btn.click()
 
             # 3. Find the add form frame
-            add_frame = await find_content_frame(self.page, "addrbook_edit")
+            add_frame = nav.frame or await find_content_frame(self.page, "addrbook_edit")
             if not add_frame:
                 return {"success": False, "message": "Add form frame not found", "data": None}
 
             # 4. Fill the form
-            await fill_form(add_frame, data)
-            await asyncio.sleep(0.5)
+            with TRACER.span("fill"):
+                await wait_for_visible(add_frame, ADDRESS_FORM.submit_selector, budget=budget)
+                await fill_form(add_frame, data, schema=ADDRESS_FORM)
 
             # 5. Submit the form
-            save_btn = await add_frame.query_selector("input[name='form_save']")
+            save_btn = await add_frame.query_selector(ADDRESS_FORM.submit_selector)
             if not save_btn:
                 return {"success": False, "message": "Save button not found", "data": None}
 
-            await save_btn.click()
-            await asyncio.sleep(2)
-
-            # 6. Check for success - should return to list page
-            # Refresh frame reference
-            list_frame = await find_content_frame(self.page, "addrbook_list")
-            if list_frame:
-                # Verify entry exists in list
-                name_check = f"{data.get('form_lname', '')}"
-                content = await list_frame.content()
-                if name_check and name_check in content:
-                    return {
-                        "success": True,
-                        "message": f"Added entry: {data.get('form_fname', '')} {data.get('form_lname', '')}",
-                        "data": data
-                    }
+            # Saving closes the dialog and reloads the list frame
+            with TRACER.span("save"):
+                async with expect_frame(self.page, "addrbook_list", budget=budget):
+                    await save_btn.click()
+
+            # 6. Verify - search the list for just the new entry and match its fields
+            with TRACER.span("verify"):
+                userid = await self.verify(data, budget, existing)
+            if userid:
+                return {
+                    "success": True,
+                    "message": f"Added entry: {data.get('form_fname', '')} {data.get('form_lname', '')} (userid {userid})",
+                    "data": {**data, "userid": userid}
+                }
 
             # Check for error in add frame
             add_frame = await find_content_frame(self.page, "addrbook_edit")
@@ -116,14 +141,48 @@ class AddAddressEntry:
                     return {"success": False, "message": f"Form error: {error_text}", "data": None}
 
             return {
-                "success": True,
-                "message": f"Entry likely added: {data.get('form_fname', '')} {data.get('form_lname', '')}",
+                "success": False,
+                "verified": False,
+                "message": f"Saved but no new entry found: {data.get('form_fname', '')} {data.get('form_lname', '')}",
                 "data": data
             }
 
         except Exception as e:
             return {"success": False, "message": str(e), "data": None}
 
+    async def matching_userids(self, data: dict, budget: WaitBudget = None) -> set:
+        """
+        Userids of Address Book entries matching mapped data
+
+        Filters the list server-side by first/last name, then compares name,
+        email, phone and specialty on the few remaining rows, so the cost does
+        not grow with the size of the book.
+        """
+        list_frame = await search_address_book(
+            self.page, data.get("form_fname", ""), data.get("form_lname", ""), budget
+        )
+        if not list_frame:
+            return set()
+        return {u for u in await find_address_entries(list_frame, data) if u}
+
+    async def verify(self, data: dict, budget: WaitBudget = None, existing: set = frozenset()):
+        """
+        Look up a just-saved entry in the Address Book
+
+        Args:
+            data: Prepared form data that was saved
+            budget: Optional WaitBudget for the search
+            existing: Userids that matched before the save; these are
+                never taken for the new entry
+
+        Returns:
+            str userid of the newest matching entry not in existing, or None
+        """
+        userids = await self.matching_userids(data, budget) - set(existing)
+        if not userids:
+            return None
+        return max(userids, key=int)
+
 
 async def main():
     """Test execution with external data"""
@@ -158,14 +217,12 @@ async def main():
         }
         print("Testing with generated data")
 
-    async with AsyncCamoufox(headless=False, humanize=0.5) as browser:
-        ctx = await browser.new_context()
-        page = await ctx.new_page()
-        page.set_default_timeout(30000)
-
-        # Login
+    async with AsyncCamoufox(**current_profile().launch_options(headless=False)) as browser:
+        # Login (reuses a cached session when possible)
         print("\n[1] Logging in...")
-        success = await login(page)
+        with TRACER.span("login"):
+            ctx, page, success = await open_logged_in_page(browser)
+        page.set_default_timeout(30000)
         if not success:
             print("    Login failed!")
             await ctx.close()
@@ -175,7 +232,8 @@ async def main():
 
         # Navigate to Address Book
         print("\n[2] Navigating to Address Book...")
-        success = await navigate_to(page, ["Admin", "Address Book"])
+        with TRACER.span("navigate"):
+            success = await navigate_to(page, ["Admin", "Address Book"], wait_frame="addrbook_list")
         if not success:
             print("    Navigation failed!")
             await ctx.close()
@@ -192,9 +250,37 @@ async def main():
         print("\n[4] Result:")
         print(json.dumps(result, indent=2))
 
-        await asyncio.sleep(3)
+        print(f"\n{SESSION_CACHE.report()}")
+        print(NAV_INDEX.report())
+        print(ROUTE_POLICY.report())
+        print(TRACER.report())
+        for path in TRACER.finish():
+            print(f"Trace written: {path}")
+
+        await asyncio.sleep(current_profile().linger_seconds)
         await ctx.close()
+        print(HAR_MODE.report())
 
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Add one entry to the OpenEMR Address Book")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help="Run profile: human (humanized cursor, typing delays) or throughput (direct actions)")
+    parser.add_argument("--trace", default=None, metavar="DIR",
+                        help="Record step and Playwright spans; write trace_summary.json and trace.json here")
+    har = parser.add_mutually_exclusive_group()
+    har.add_argument("--record-har", default=None, metavar="DIR",
+                     help="Record each browser context's traffic to a HAR file in DIR")
+    har.add_argument("--replay-har", default=None, metavar="FILE",
+                     help="Serve all browser traffic from a recorded HAR file (no network)")
+    args = parser.parse_args()
+    use_profile(args.profile)
+    if args.trace:
+        TRACER.enable(args.trace)
+    if args.record_har:
+        HAR_MODE.record(args.record_har, "add_address_entry")
+    elif args.replay_har:
+        HAR_MODE.replay(args.replay_har)
+
     asyncio.run(main())
@@ -0,0 +1,118 @@
+"""
+Address Book Duplicate Index
+
+Scrapes the Address Book list once into an in-memory set of fingerprints so
+an import only sends genuinely new records to the browser. A fingerprint is
+the normalized (last name, first name, contact), where contact is the email
+or the phone digits; an entry with both yields two fingerprints, and an
+entry with neither is matched on name alone.
+
+Records that pass the filter are added to the index, so duplicates within
+the same input are skipped as well.
+"""
+import re
+from typing import Iterable, Iterator, Tuple
+
+from . import find_content_frame, iter_table_rows
+
+PHONE_FIELDS = ("form_phonecell", "form_phone", "form_phonew1")
+LIST_COLUMNS = ["Name", "Email", "Mobile", "Phone(W)"]
+
+
+def normalize_text(value: str) -> str:
+    return " ".join(str(value or "").lower().split())
+
+
+def normalize_phone(value: str) -> str:
+    return re.sub(r"\D", "", str(value or ""))
+
+
+def fingerprints(last: str, first: str, email: str = "", phones: Iterable[str] = ()) -> set:
+    """All fingerprints for one entry"""
+    name = (normalize_text(last), normalize_text(first))
+    contacts = {normalize_text(email)} | {normalize_phone(p) for p in phones}
+    contacts.discard("")
+    if not contacts:
+        return {name + ("",)}
+    return {name + (c,) for c in contacts}
+
+
+class DuplicateIndex:
+    """Fingerprints of entries already in the Address Book"""
+
+    def __init__(self):
+        self.keys = set()
+        self.entries = 0
+        self.skipped = 0
+
+    def add(self, last: str, first: str, email: str = "", phones: Iterable[str] = ()):
+        self.keys |= fingerprints(last, first, email, phones)
+        self.entries += 1
+
+    @staticmethod
+    def mapped_fingerprints(data: dict) -> set:
+        return fingerprints(
+            data.get("form_lname", ""),
+            data.get("form_fname", ""),
+            data.get("form_email", ""),
+            [data.get(f, "") for f in PHONE_FIELDS],
+        )
+
+    def contains(self, data: dict) -> bool:
+        """True if mapped Address Book data matches an indexed entry"""
+        return not self.keys.isdisjoint(self.mapped_fingerprints(data))
+
+    def add_mapped(self, data: dict):
+        self.keys |= self.mapped_fingerprints(data)
+        self.entries += 1
+
+    def add_rows(self, rows: list):
+        """
+        Index rows read from the addrbook_list table
+
+        The Name column reads "First Middle Last"; the first and last words
+        are taken as first and last name.
+        """
+        for row in rows:
+            words = row.get("Name", "").split()
+            if not words:
+                continue
+            phones = [row.get("Mobile", ""), row.get("Phone(W)", "")]
+            self.add(words[-1], words[0] if len(words) > 1 else "", row.get("Email", ""), phones)
+
+    @classmethod
+    async def from_address_book(cls, page) -> "DuplicateIndex":
+        """
+        Build the index from the Address Book list on a page
+
+        The page must already show the Address Book (addrbook_list frame).
+        Only the columns used for fingerprints are read, one chunk at a
+        time, so a large book is never held as a whole.
+        """
+        index = cls()
+        list_frame = await find_content_frame(page, "addrbook_list")
+        if list_frame:
+            async for rows in iter_table_rows(list_frame, columns=LIST_COLUMNS):
+                index.add_rows(rows)
+        return index
+
+    def filter(self, items: Iterable[Tuple[int, dict, dict]], on_skip=None) -> Iterator[Tuple[int, dict, dict]]:
+        """
+        Pass through (index, profile, mapped_data) items that are not duplicates
+
+        Args:
+            items: Items as yielded by streaming.iter_mapped()
+            on_skip: Optional callable(index, profile) for each skipped item
+        """
+        for item in items:
+            mapped_data = item[2]
+            if self.contains(mapped_data):
+                self.skipped += 1
+                if on_skip:
+                    on_skip(item[0], item[1])
+                continue
+            self.add_mapped(mapped_data)
+            yield item
+
+    def report(self) -> str:
+        return f"Duplicate index: {self.entries} entries, {self.skipped} duplicate(s) skipped"
@@ -0,0 +1,123 @@
+"""
+Browserless Address Book Submit
+
+The add form is a plain POST of named fields to addrbook_edit.php?userid=.
+HttpAddressBookClient borrows the authenticated cookies of a browser
+context and submits records with a pooled, keep-alive HTTP client instead of
+rendering, filling and clicking the form for every record.
+
+- The CSRF token is scraped from one load of the add form and reused; it is
+  scraped again after any rejected submit.
+- Requests in flight are bounded by max_connections.
+- Every field of the form is sent, as the browser would, with empty values
+  for fields the record does not set (unchecked checkboxes are omitted).
+- Anything other than the dialog-closing success page raises SubmitRejected,
+  so the caller can fall back to the browser path. SubmitNotSent means the
+  record was never posted (no CSRF token), so a fallback cannot duplicate it;
+  after any other error the record may have been saved.
+
+Requires httpx (optional; only imported when the client is opened).
+"""
+import asyncio
+import re
+
+from emr_common.http_client import open_http_client
+
+from . import ADDRESS_FORM, BASE_URL
+
+EDIT_PATH = "/interface/usergroup/addrbook_edit.php"
+CSRF_PATTERN = re.compile(r'name=["\']csrf_token_form["\'][^>]*value=["\']([^"\']+)')
+# The save handler answers with a script that closes the dialog
+SUCCESS_MARKER = "dlgclose"
+
+
+class SubmitRejected(Exception):
+    """The server did not answer a submit the way a successful save does"""
+
+
+class SubmitNotSent(SubmitRejected):
+    """The submit failed before the record was posted"""
+
+
+class HttpAddressBookClient:
+    """Pooled HTTP transport for Address Book adds, authenticated by a browser context"""
+
+    def __init__(self, base_url: str = BASE_URL, max_connections: int = 8, timeout: float = 30.0):
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.client = None
+        self.token = None
+        self.semaphore = asyncio.Semaphore(max_connections)
+        self.stats = {"submitted": 0, "rejected": 0}
+
+    async def open(self, context):
+        """Create the HTTP client with the context's cookies and user agent"""
+        self.client = await open_http_client(context, self.base_url, self.max_connections, self.timeout)
+        return self
+
+    async def close(self):
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def csrf_token(self) -> str:
+        """CSRF token from one load of the add form"""
+        if self.token is None:
+            response = await self.client.get(f"{EDIT_PATH}?type=")
+            match = CSRF_PATTERN.search(response.text) if response.status_code == 200 else None
+            if not match:
+                raise SubmitNotSent(f"No CSRF token in add form (HTTP {response.status_code})")
+            self.token = match.group(1)
+        return self.token
+
+    def form_body(self, data: dict) -> dict:
+        """Full form body for prepared Address Book data"""
+        body = {}
+        for name, spec in ADDRESS_FORM.fields.items():
+            value = data.get(name, "")
+            if spec.kind == "checkbox":
+                if value:
+                    body[name] = "1"
+            else:
+                body[name] = "" if value is None else str(value)
+        body["form_save"] = "Save"
+        return body
+
+    async def submit(self, data: dict):
+        """
+        Add one entry
+
+        Args:
+            data: Address Book data, already passed through ADDRESS_FORM.prepare()
+
+        Raises:
+            SubmitNotSent: If the record could not be posted
+            SubmitRejected: On any response other than a successful save
+        """
+        async with self.semaphore:
+            try:
+                token = await self.csrf_token()
+            except SubmitNotSent:
+                raise
+            except Exception as e:
+                raise SubmitNotSent(f"Add form not loaded: {e}") from e
+            body = {"csrf_token_form": token, **self.form_body(data)}
+            response = await self.client.post(f"{EDIT_PATH}?userid=", data=body)
+
+        if response.status_code != 200 or SUCCESS_MARKER not in response.text \
+                or "csrf_token_form" in response.text:
+            self.stats["rejected"] += 1
+            self.token = None
+            raise SubmitRejected(f"Unexpected response to submit (HTTP {response.status_code})")
+        self.stats["submitted"] += 1
+
+    def report(self) -> str:
+        s = self.stats
+        return f"HTTP submit: {s['submitted']} submitted, {s['rejected']} rejected (sent to the browser)"
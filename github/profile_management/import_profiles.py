@@ -4,40 +4,147 @@ Auto-generated from EMR analysis
 
 Imports multiple profiles from external data file to OpenEMR Address Book
 """
+import argparse
 import asyncio
-import json
+import time
+from contextlib import nullcontext
 from pathlib import Path
+from typing import Iterable
 from camoufox.async_api import AsyncCamoufox
 
 BASE_DIR = Path(__file__).parent
-SELECTORS = json.loads((BASE_DIR / "selectors.json").read_text())
-OPERATIONS = json.loads((BASE_DIR / "operations.json").read_text())
 
 from . import (
-    login,
+    ADDRESS_FORM,
+    DEFAULT_USERNAME,
+    DEFAULT_PASSWORD,
+    NAV_INDEX,
+    ROUTE_POLICY,
+    SESSION_CACHE,
+    open_logged_in_page,
     navigate_to,
     find_content_frame,
     fill_form,
-    map_profile_to_address
+    find_address_entries,
+    map_profile_to_address,
+    search_address_book,
 )
+from .dedup import DuplicateIndex
+from .http_submit import HttpAddressBookClient, SubmitNotSent, SubmitRejected
+from .journal import ImportJournal, record_key
+from .schema import SchemaError
+from .streaming import ResultWriter, iter_mapped, iter_records
+from emr_common.har_replay import HAR_MODE
+from emr_common.run_profile import DEFAULT_PROFILE, PROFILES, current_profile, use_profile
+from emr_common.tracing import TRACER
+from emr_common.waits import WaitBudget, expect_frame, wait_for_visible
 
 
 class ImportProfiles:
     """Bulk import profiles to Address Book"""
 
-    def __init__(self, page):
+    def __init__(self, page, timeout=60000, http: HttpAddressBookClient = None,
+                 journal: ImportJournal = None, check_existing: bool = False):
         self.page = page
-
+        self.timeout = timeout
+        self.http = http
+        self.journal = journal
+        # Look each record up before adding it (resume without a duplicate index)
+        self.check_existing = check_existing
+        # One form at a time on the page, however many HTTP submits are in flight
+        self.browser_lock = asyncio.Lock()
+
+    @TRACER.traced("import_record")
     async def import_single(self, data: dict) -> dict:
         """
         Import a single profile to Address Book
 
+        With an HTTP client the record is posted directly. If the post was
+        never sent, or was answered but the record is not in the Address
+        Book, the form is filled in the browser instead. If the post failed
+        without an answer (e.g. a timeout) and the record is not found, it is
+        reported as failed rather than added a second time.
+
         Args:
             data: Mapped profile data for Address Book form
 
         Returns:
             dict with success status and result
         """
+        # Validate against the form schema before touching the browser
+        try:
+            data, truncated = ADDRESS_FORM.prepare(data)
+        except SchemaError as e:
+            return {"success": False, "message": str(e), "data": None}
+        if truncated:
+            print(f"    Truncated to maxlength: {', '.join(truncated)}")
+
+        if self.http:
+            try:
+                with TRACER.span("http_submit"):
+                    await self.http.submit(data)
+                return {
+                    "success": True,
+                    "message": f"Added via HTTP: {data.get('form_fname', '')} {data.get('form_lname', '')}",
+                    "data": data
+                }
+            except SubmitNotSent as e:
+                print(f"    HTTP submit not sent ({e}), using the browser")
+            except Exception as e:
+                # The post went out: the server may have saved it anyway
+                if await self.find_existing(data):
+                    return {
+                        "success": True,
+                        "message": f"Added via HTTP (found after: {e}): "
+                                   f"{data.get('form_fname', '')} {data.get('form_lname', '')}",
+                        "data": data
+                    }
+                if not isinstance(e, SubmitRejected):
+                    return {"success": False, "message": f"HTTP submit unconfirmed ({e}), not found in Address Book",
+                            "data": None}
+                print(f"    HTTP submit rejected ({e}), not saved, using the browser")
+
+        async with self.browser_lock:
+            return await self.submit_in_browser(data)
+
+    async def import_record(self, index: int, profile: dict, data: dict) -> dict:
+        """
+        Import one record through the journal, if there is one
+
+        A record an earlier run may have saved (submitted or failed) is looked
+        up in the Address Book first and only added again if it is missing.
+        The submitted mark is durable before the save is sent.
+        """
+        if not self.journal:
+            return await self.import_single(data)
+
+        key = record_key(index, profile)
+        if self.journal.unconfirmed(key) or self.check_existing:
+            if await self.find_existing(data):
+                self.journal.stats["found"] += 1
+                self.journal.mark(key, "verified", "Found in Address Book")
+                return {"success": True, "skipped": True, "message": "Already in Address Book", "data": None}
+            if self.journal.unconfirmed(key):
+                self.journal.stats["resubmitted"] += 1
+
+        self.journal.mark(key, "submitted")
+        result = await self.import_single(data)
+        self.journal.mark(key, "verified" if result["success"] else "failed", result["message"])
+        return result
+
+    async def find_existing(self, data: dict) -> bool:
+        """True if the Address Book already has an entry matching mapped data"""
+        try:
+            data, _ = ADDRESS_FORM.prepare(data)
+        except SchemaError:
+            return False
+        async with self.browser_lock:
+            list_frame = await search_address_book(self.page, data.get("form_fname", ""), data.get("form_lname", ""))
+            return bool(list_frame and await find_address_entries(list_frame, data))
+
+    async def submit_in_browser(self, data: dict) -> dict:
+        """Add one prepared record by filling and saving the add form"""
+        budget = WaitBudget(total_ms=self.timeout)
         try:
             # Find list frame
             list_frame = await find_content_frame(self.page, "addrbook_list")
@@ -49,23 +156,26 @@ class ImportProfiles:
             if not add_btn:
                 return {"success": False, "message": "Add button not found", "data": None}
 
-            await add_btn.click()
-            await asyncio.sleep(2)
+            with TRACER.span("open_form"):
+                async with expect_frame(self.page, "addrbook_edit", budget=budget) as nav:
+                    await add_btn.click()
 
             # Find add form frame
-            add_frame = await find_content_frame(self.page, "addrbook_edit")
+            add_frame = nav.frame or await find_content_frame(self.page, "addrbook_edit")
             if not add_frame:
                 return {"success": False, "message": "Add form not found", "data": None}
 
             # Fill form
-            await fill_form(add_frame, data)
-            await asyncio.sleep(0.5)
+            with TRACER.span("fill"):
+                await wait_for_visible(add_frame, ADDRESS_FORM.submit_selector, budget=budget)
+                await fill_form(add_frame, data, schema=ADDRESS_FORM)
 
-            # Submit
-            save_btn = await add_frame.query_selector("input[name='form_save']")
+            # Submit - wait for the list frame to reload before the next record
+            save_btn = await add_frame.query_selector(ADDRESS_FORM.submit_selector)
             if save_btn:
-                await save_btn.click()
-                await asyncio.sleep(2)
+                with TRACER.span("save"):
+                    async with expect_frame(self.page, "addrbook_list", budget=budget):
+                        await save_btn.click()
 
             return {
                 "success": True,
@@ -76,107 +186,441 @@ class ImportProfiles:
         except Exception as e:
             return {"success": False, "message": str(e), "data": None}
 
-    async def import_all(self, profiles: list) -> dict:
+    async def import_all(self, profiles: Iterable[dict], writer: ResultWriter = None,
+                         dedup: DuplicateIndex = None) -> dict:
         """
-        Import all profiles from list
+        Import all profiles from a list or any iterable of records
 
         Args:
-            profiles: List of raw profile dicts (will be mapped internally)
+            profiles: Raw profile dicts (mapped lazily as they are imported)
+            writer: Optional ResultWriter; each result is appended to it as
+                it finishes instead of being kept in `details`
+            dedup: Optional DuplicateIndex; records already in the Address
+                Book are counted as skipped without touching the browser
+
+        Records verified in the journal by an earlier run are skipped too.
 
         Returns:
-            dict with success count, failure count, and details
+            dict with success, failure and skipped counts, and details
         """
-        results = {
-            "total": len(profiles),
-            "success": 0,
-            "failed": 0,
-            "details": []
-        }
+        results = new_results(len(profiles) if hasattr(profiles, "__len__") else None)
+        started = time.perf_counter()
+
+        items = filter_done(iter_mapped(profiles), self.journal, dedup, lambda i, profile, message: record_result(
+            results, i, profile, {"success": True, "skipped": True, "message": message, "data": None}, writer))
 
-        for i, profile in enumerate(profiles):
-            print(f"  [{i+1}/{len(profiles)}] Importing {profile.get('first_name', '')} {profile.get('last_name', '')}...")
+        if self.http:
+            await self.import_concurrently(items, results, writer)
+            finish_results(results, time.perf_counter() - started)
+            return results
 
-            # Map profile to Address Book format
-            mapped_data = map_profile_to_address(profile)
+        for i, profile, mapped_data in items:
+            print(f"  [{i+1}/{results['total'] or '?'}] Importing {profile.get('first_name', '')} {profile.get('last_name', '')}...")
 
             # Import
-            result = await self.import_single(mapped_data)
+            result = await self.import_record(i, profile, mapped_data)
 
             if result["success"]:
-                results["success"] += 1
                 print(f"    SUCCESS")
             else:
-                results["failed"] += 1
                 print(f"    FAILED: {result['message']}")
 
-            results["details"].append({
-                "profile_id": profile.get("id", f"row_{i}"),
-                "name": f"{profile.get('first_name', '')} {profile.get('last_name', '')}",
-                "result": result
-            })
+            record_result(results, i, profile, result, writer)
+
+        finish_results(results, time.perf_counter() - started)
+        return results
+
+    async def import_concurrently(self, items, results: dict, writer: ResultWriter = None):
+        """
+        Import with up to http.max_connections records in flight
 
-            # Small delay between imports
-            await asyncio.sleep(1)
+        Items are pulled from the iterator only as slots free up. Without a
+        writer, details are recorded in input order once all are done.
+        """
+        window = asyncio.Semaphore(self.http.max_connections)
+        finished = {}
+        tasks = set()
+
+        async def run(i, profile, mapped_data):
+            try:
+                result = await self.import_record(i, profile, mapped_data)
+                status = "SUCCESS" if result["success"] else f"FAILED: {result['message']}"
+                print(f"  [{i+1}/{results['total'] or '?'}] "
+                      f"{profile.get('first_name', '')} {profile.get('last_name', '')}: {status}")
+                if writer:
+                    record_result(results, i, profile, result, writer)
+                else:
+                    finished[i] = (profile, result)
+            finally:
+                window.release()
+
+        for item in items:
+            await window.acquire()
+            task = asyncio.create_task(run(*item))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+
+        for i in sorted(finished):
+            profile, result = finished[i]
+            record_result(results, i, profile, result)
+
+
+class ImportWorkerPool:
+    """
+    Bulk import profiles across several logged-in browser contexts
+
+    Each worker owns one context/page that is logged in and parked on the
+    Address Book. Workers pull records from one small shared queue, so one
+    slow context does not hold up the batch. Results are written back by
+    input index, so `details` keeps the order of the source file.
+
+    Every worker logs in on its own, so each has its own PHP session: with
+    one shared session PHP's session lock would serialize their requests.
+    max_in_flight optionally caps how many workers log in or import at once
+    (default: all of them).
+    """
+
+    def __init__(self, browser, workers: int = 4, max_in_flight: int = None,
+                 username: str = DEFAULT_USERNAME, password: str = DEFAULT_PASSWORD,
+                 journal: ImportJournal = None, check_existing: bool = False):
+        self.browser = browser
+        self.workers = max(1, workers)
+        self.max_in_flight = max(1, min(max_in_flight or self.workers, self.workers))
+        self.semaphore = asyncio.Semaphore(self.max_in_flight)
+        self.username = username
+        self.password = password
+        self.journal = journal
+        self.check_existing = check_existing
+
+    async def open_worker(self, worker_id: int):
+        """
+        Create a logged-in context parked on the Address Book
 
+        Returns:
+            tuple (context, page) or (None, None) if login/navigation failed
+        """
+        async with self.semaphore:
+            ctx, page, logged_in = await open_logged_in_page(self.browser, self.username, self.password,
+                                                             fresh=worker_id > 0)
+            page.set_default_timeout(30000)
+            if not logged_in:
+                print(f"  [worker {worker_id}] Login failed")
+                await ctx.close()
+                return None, None
+            if not await navigate_to(page, ["Admin", "Address Book"], wait_frame="addrbook_list"):
+                print(f"  [worker {worker_id}] Navigation failed")
+                await ctx.close()
+                return None, None
+
+        print(f"  [worker {worker_id}] Ready")
+        return ctx, page
+
+    async def import_all(self, profiles: Iterable[dict], writer: ResultWriter = None,
+                         dedup: DuplicateIndex = None) -> dict:
+        """
+        Import all profiles using the worker pool
+
+        Records are read lazily from profiles into a small bounded queue that
+        all workers pull from, so a large file is never held in memory and a
+        slow context simply takes fewer records.
+
+        Args:
+            profiles: Raw profile dicts, a list or any iterable
+            writer: Optional ResultWriter; each result is appended to it as
+                it finishes instead of being kept in `details`
+            dedup: Optional DuplicateIndex; records already in the Address
+                Book are counted as skipped and never queued
+
+        Returns:
+            dict with success, failure and skipped counts, details (in input
+            order) and throughput figures
+        """
+        results = new_results(len(profiles) if hasattr(profiles, "__len__") else None)
+        finished = {}
+        started = time.perf_counter()
+        feed = asyncio.Queue(maxsize=self.workers * 2)
+        alive = [self.workers]
+
+        def record(i, profile, result):
+            if writer:
+                record_result(results, i, profile, result, writer)
+            else:
+                finished[i] = (profile, result)
+
+        async def produce():
+            items = filter_done(iter_mapped(profiles), self.journal, dedup, lambda i, profile, message: record(
+                i, profile, {"success": True, "skipped": True, "message": message, "data": None}))
+            try:
+                for item in items:
+                    await feed.put(item)
+            finally:
+                # Release the workers even if reading the input fails
+                for _ in range(self.workers):
+                    await feed.put(None)
+
+        async def run_worker(worker_id):
+            ctx, page = await self.open_worker(worker_id)
+            if page is None:
+                alive[0] -= 1
+                if alive[0] == 0:
+                    # Every worker failed to start: fail the remaining records
+                    while (item := await feed.get()) is not None:
+                        i, profile, _ = item
+                        record(i, profile, {"success": False, "message": "No worker available", "data": None})
+                return
+            importer = ImportProfiles(page, journal=self.journal, check_existing=self.check_existing)
+            try:
+                while (item := await feed.get()) is not None:
+                    i, profile, mapped_data = item
+                    async with self.semaphore:
+                        result = await importer.import_record(i, profile, mapped_data)
+
+                    status = "SUCCESS" if result["success"] else f"FAILED: {result['message']}"
+                    print(f"  [worker {worker_id}] [{i+1}/{results['total'] or '?'}] "
+                          f"{profile.get('first_name', '')} {profile.get('last_name', '')}: {status}")
+                    record(i, profile, result)
+            finally:
+                await ctx.close()
+
+        await asyncio.gather(produce(), *(run_worker(w) for w in range(self.workers)))
+
+        for i in sorted(finished):
+            profile, result = finished[i]
+            record_result(results, i, profile, result)
+
+        finish_results(results, time.perf_counter() - started)
         return results
 
 
-async def main():
-    """Run bulk import with sample data"""
-    # Load external data
-    external_file = BASE_DIR.parent / "sample-profile-data.json"
+def filter_done(items, journal: ImportJournal = None, dedup: DuplicateIndex = None, on_skip=None):
+    """
+    Drop records an earlier run finished (journal) or already in the Address Book (dedup)
+
+    on_skip(index, profile, message) is called for each dropped record.
+    """
+    if journal:
+        items = journal.filter(items, lambda i, profile: on_skip(i, profile, "Imported by an earlier run"))
+    if dedup:
+        def skip_duplicate(i, profile):
+            if journal:
+                journal.mark(record_key(i, profile), "verified", "Already in Address Book")
+            on_skip(i, profile, "Already in Address Book")
+        items = dedup.filter(items, skip_duplicate)
+    return items
+
+
+def new_results(total: int = None) -> dict:
+    """Empty import results in the shape returned by import_all (total None if not known yet)"""
+    return {
+        "total": total,
+        "success": 0,
+        "failed": 0,
+        "skipped": 0,
+        "details": []
+    }
+
+
+def record_result(results: dict, index: int, profile: dict, result: dict, writer: ResultWriter = None):
+    """Count a single import result and append its detail row (to writer if given)"""
+    if result.get("skipped"):
+        results["skipped"] += 1
+    elif result["success"]:
+        results["success"] += 1
+    else:
+        results["failed"] += 1
+
+    row = {
+        "profile_id": profile.get("id", f"row_{index}"),
+        "name": f"{profile.get('first_name', '')} {profile.get('last_name', '')}",
+        "result": result
+    }
+    if writer:
+        writer.write(index, row)
+    else:
+        results["details"].append(row)
+
+
+def finish_results(results: dict, elapsed: float):
+    """Attach wall time and throughput to import results"""
+    processed = results["success"] + results["failed"]
+    if results["total"] is None:
+        results["total"] = processed + results["skipped"]
+    results["elapsed_seconds"] = round(elapsed, 2)
+    results["records_per_second"] = round(processed / elapsed, 3) if elapsed > 0 else 0.0
+
+
+async def build_duplicate_index(browser) -> DuplicateIndex:
+    """Scrape the Address Book once in a short-lived context"""
+    ctx, page, logged_in = await open_logged_in_page(browser)
+    try:
+        if logged_in and await navigate_to(page, ["Admin", "Address Book"], wait_frame="addrbook_list"):
+            return await DuplicateIndex.from_address_book(page)
+        return DuplicateIndex()
+    finally:
+        await ctx.close()
+
+
+async def main(workers: int = 1, input_file: Path = None, output_file: Path = None,
+               skip_existing: bool = True, http_connections: int = 0,
+               journal_file: Path = None, resume: bool = False, max_in_flight: int = None):
+    """Run bulk import with sample data (or input_file, a JSON array or JSONL)"""
+    # Stream external data - records are read as they are imported
+    external_file = Path(input_file or BASE_DIR.parent / "sample-profile-data.json")
 
     if not external_file.exists():
         print(f"ERROR: External data file not found: {external_file}")
         return
 
-    with open(external_file) as f:
-        profiles = json.load(f)
-
-    print(f"Loaded {len(profiles)} profiles from {external_file}")
-
-    async with AsyncCamoufox(headless=False, humanize=0.5) as browser:
-        ctx = await browser.new_context()
-        page = await ctx.new_page()
-        page.set_default_timeout(30000)
-
-        # Login
-        print("\n[1] Logging in...")
-        success = await login(page)
-        if not success:
-            print("    Login failed!")
-            await ctx.close()
-            return
-
-        print("    Login successful")
-
-        # Navigate to Address Book
-        print("\n[2] Navigating to Address Book...")
-        success = await navigate_to(page, ["Admin", "Address Book"])
-        if not success:
-            print("    Navigation failed!")
-            await ctx.close()
-            return
-
-        print("    Navigation successful")
-
-        # Bulk import
-        print("\n[3] Starting bulk import...")
-        importer = ImportProfiles(page)
-        results = await importer.import_all(profiles)
-
-        # Print summary
-        print("\n" + "=" * 70)
-        print("IMPORT SUMMARY")
-        print("=" * 70)
-        print(f"  Total: {results['total']}")
-        print(f"  Success: {results['success']}")
-        print(f"  Failed: {results['failed']}")
-        print("=" * 70)
-
-        await asyncio.sleep(3)
-        await ctx.close()
+    profiles = iter_records(external_file)
+    print(f"Reading profiles from {external_file}")
+    if output_file:
+        print(f"Writing results to {output_file}")
+
+    if http_connections and workers > 1:
+        print("HTTP submit mode runs from one browser context; ignoring --workers")
+        workers = 1
+
+    journal = None
+    if journal_file or resume:
+        journal_file = Path(journal_file or external_file.with_name(external_file.name + ".journal.sqlite"))
+        journal = ImportJournal(journal_file, resume=resume)
+        print(f"Journal: {journal_file}" + (f" (resuming, {len(journal.previous)} record(s) known)" if resume else ""))
+
+    # On resume the journal covers finished records; the rest are looked up
+    # one at a time rather than indexing the whole Address Book
+    check_existing = resume and skip_existing
+    if check_existing:
+        skip_existing = False
+
+    with (ResultWriter(output_file) if output_file else nullcontext()) as writer, (journal or nullcontext()):
+        async with AsyncCamoufox(**current_profile().launch_options(headless=False)) as browser:
+            if workers > 1:
+                # Worker pool - each worker logs in with its own context
+                dedup = None
+                if skip_existing:
+                    with TRACER.span("dedup_index"):
+                        dedup = await build_duplicate_index(browser)
+                    print(f"\n    Indexed {dedup.entries} existing Address Book entries")
+
+                pool = ImportWorkerPool(browser, workers=workers, max_in_flight=max_in_flight,
+                                        journal=journal, check_existing=check_existing)
+                print(f"\n[1] Starting {workers} workers ({pool.max_in_flight} in flight)...")
+
+                print("\n[2] Starting bulk import...")
+                results = await pool.import_all(profiles, writer, dedup)
+            else:
+                # Login (reuses a cached session when possible)
+                print("\n[1] Logging in...")
+                with TRACER.span("login"):
+                    ctx, page, success = await open_logged_in_page(browser)
+                page.set_default_timeout(30000)
+                if not success:
+                    print("    Login failed!")
+                    await ctx.close()
+                    return
+
+                print("    Login successful")
+
+                # Navigate to Address Book
+                print("\n[2] Navigating to Address Book...")
+                with TRACER.span("navigate"):
+                    success = await navigate_to(page, ["Admin", "Address Book"], wait_frame="addrbook_list")
+                if not success:
+                    print("    Navigation failed!")
+                    await ctx.close()
+                    return
+
+                print("    Navigation successful")
+
+                # Index existing entries so a re-run only adds new records
+                dedup = None
+                if skip_existing:
+                    with TRACER.span("dedup_index"):
+                        dedup = await DuplicateIndex.from_address_book(page)
+                    print(f"    Indexed {dedup.entries} existing Address Book entries")
+
+                # Borrow the session cookies for browserless submits
+                http = None
+                if http_connections:
+                    try:
+                        http = await HttpAddressBookClient(max_connections=http_connections).open(ctx)
+                        print(f"    HTTP submit mode: {http_connections} connection(s)")
+                    except ImportError as e:
+                        print(f"    {e} - using the browser only")
+
+                # Bulk import
+                print("\n[3] Starting bulk import...")
+                importer = ImportProfiles(page, http=http, journal=journal, check_existing=check_existing)
+                results = await importer.import_all(profiles, writer, dedup)
+                if http:
+                    print(f"    {http.report()}")
+                    await http.close()
+
+                await asyncio.sleep(current_profile().linger_seconds)
+                await ctx.close()
+
+            # Print summary
+            print("\n" + "=" * 70)
+            print("IMPORT SUMMARY")
+            print("=" * 70)
+            print(f"  Total: {results['total']}")
+            print(f"  Success: {results['success']}")
+            print(f"  Failed: {results['failed']}")
+            print(f"  Skipped (already in Address Book): {results['skipped']}")
+            print(f"  Elapsed: {results['elapsed_seconds']}s")
+            print(f"  Throughput: {results['records_per_second']} records/s")
+            print(f"  {SESSION_CACHE.report()}")
+            print(f"  {NAV_INDEX.report()}")
+            print(f"  {ROUTE_POLICY.report()}")
+            print(f"  {TRACER.report()}")
+            print(f"  {HAR_MODE.report()}")
+            if journal:
+                print(f"  {journal.report()}")
+            for path in TRACER.finish():
+                print(f"  Trace written: {path}")
+            print("=" * 70)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Bulk import profiles to the OpenEMR Address Book")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of logged-in browser contexts to import with (default: 1)")
+    parser.add_argument("--max-in-flight", type=int, default=None, metavar="N",
+                        help="Most workers logging in or importing at once (default: all of --workers)")
+    parser.add_argument("--input", default=None,
+                        help="Profiles file, JSON array or JSONL (default: sample-profile-data.json)")
+    parser.add_argument("--output", default=None,
+                        help="Append one JSONL result line per record here instead of keeping details in memory")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="Import every record, even if it is already in the Address Book")
+    parser.add_argument("--http", type=int, default=0, metavar="CONNECTIONS",
+                        help="Submit records over HTTP with this many pooled connections, "
+                             "falling back to the browser on unexpected responses (needs httpx)")
+    parser.add_argument("--journal", default=None, metavar="FILE",
+                        help="Record each profile id as pending/submitted/verified in this SQLite journal "
+                             "(default with --resume: <input>.journal.sqlite)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue from the journal: skip verified records and check submitted ones "
+                             "against the Address Book before adding them again")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help="Run profile: human (humanized cursor, typing delays) or throughput (direct actions)")
+    parser.add_argument("--trace", default=None, metavar="DIR",
+                        help="Record step and Playwright spans; write trace_summary.json and trace.json here")
+    har = parser.add_mutually_exclusive_group()
+    har.add_argument("--record-har", default=None, metavar="DIR",
+                     help="Record each browser context's traffic to a HAR file in DIR")
+    har.add_argument("--replay-har", default=None, metavar="FILE",
+                     help="Serve all browser traffic from a recorded HAR file (no network)")
+    args = parser.parse_args()
+    use_profile(args.profile)
+    if args.trace:
+        TRACER.enable(args.trace)
+    if args.record_har:
+        HAR_MODE.record(args.record_har, "import_profiles")
+    elif args.replay_har:
+        HAR_MODE.replay(args.replay_har)
+
+    asyncio.run(main(workers=args.workers, input_file=args.input, output_file=args.output,
+                     skip_existing=not args.no_dedup, http_connections=args.http,
+                     journal_file=args.journal, resume=args.resume, max_in_flight=args.max_in_flight))
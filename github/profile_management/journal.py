@@ -0,0 +1,154 @@
+"""
+Import Journal
+
+Write-ahead record of a bulk import, so a run that dies part way (browser
+crash, OOM, expired session) can be resumed without redoing or duplicating
+work. Each profile id moves through:
+
+- pending:   read from the input and queued
+- submitted: about to be saved; written and fsynced before the save is sent
+- verified:  save confirmed, or found in the Address Book on resume
+- failed:    the import reported an error (it may still have saved)
+
+The journal is an append-only SQLite table of (record_id, state) events in
+WAL mode; the latest event per id is its state. Only "submitted" is
+committed on its own, since it is the one that prevents a double insert;
+other events are committed in batches (every batch_size events or
+batch_seconds). An event lost in a crash only means that record is checked
+again on resume.
+
+On resume:
+- verified records are skipped without touching the browser,
+- submitted and failed records are looked up in the Address Book first and
+  only added again if missing,
+- everything else is imported as new.
+"""
+import sqlite3
+import time
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+
+STATES = ("pending", "submitted", "verified", "failed")
+# States whose save may have reached the server
+UNCONFIRMED = ("submitted", "failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    record_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    message TEXT,
+    at REAL NOT NULL
+)
+"""
+
+
+def record_key(index: int, profile: dict) -> str:
+    """Journal id of a profile: its id, else its position in the input"""
+    return str(profile.get("id") or f"row_{index}")
+
+
+class ImportJournal:
+    """Append-only import journal in a SQLite file"""
+
+    def __init__(self, path: Path, resume: bool = False, batch_size: int = 100, batch_seconds: float = 1.0):
+        """
+        Args:
+            path: Journal file (created if missing)
+            resume: Keep the states of earlier runs; otherwise the journal
+                is cleared and this run starts from scratch
+            batch_size: Events per commit for pending/verified/failed
+            batch_seconds: Longest time such an event stays uncommitted
+        """
+        self.path = Path(path)
+        self.resume = resume
+        self.batch_size = batch_size
+        self.batch_seconds = batch_seconds
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=FULL")
+        self.db.execute(SCHEMA)
+        if not resume:
+            self.db.execute("DELETE FROM events")
+        self.db.commit()
+
+        # Latest state per id as of the start of this run, and as of now
+        self.previous = dict(self.db.execute("SELECT record_id, state FROM events ORDER BY seq"))
+        self.states = dict(self.previous)
+        self.uncommitted = 0
+        self.last_commit = time.monotonic()
+        self.stats = {"done_before": 0, "found": 0, "resubmitted": 0, "commits": 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        if self.db is not None:
+            self.commit()
+            self.db.close()
+            self.db = None
+
+    def commit(self):
+        if self.uncommitted:
+            self.db.commit()
+            self.stats["commits"] += 1
+        self.uncommitted = 0
+        self.last_commit = time.monotonic()
+
+    def mark(self, record_id: str, state: str, message: str = ""):
+        """Append a state event; "submitted" is durable when this returns"""
+        if state not in STATES:
+            raise ValueError(f"Unknown journal state {state!r}")
+        self.db.execute("INSERT INTO events (record_id, state, message, at) VALUES (?, ?, ?, ?)",
+                        (record_id, state, message, time.time()))
+        self.states[record_id] = state
+        self.uncommitted += 1
+        if (state == "submitted" or self.uncommitted >= self.batch_size
+                or time.monotonic() - self.last_commit >= self.batch_seconds):
+            self.commit()
+
+    def state(self, record_id: str) -> Optional[str]:
+        return self.states.get(record_id)
+
+    def unconfirmed(self, record_id: str) -> bool:
+        """True if an earlier run may have saved this record without confirming it"""
+        return self.previous.get(record_id) in UNCONFIRMED
+
+    def filter(self, items: Iterable[Tuple[int, dict, dict]], on_skip=None) -> Iterator[Tuple[int, dict, dict]]:
+        """
+        Pass through (index, profile, mapped_data) items not verified by an earlier run
+
+        Passed items are marked pending.
+
+        Args:
+            items: Items as yielded by streaming.iter_mapped()
+            on_skip: Optional callable(index, profile) for each skipped item
+        """
+        for item in items:
+            key = record_key(item[0], item[1])
+            if self.previous.get(key) == "verified":
+                self.stats["done_before"] += 1
+                if on_skip:
+                    on_skip(item[0], item[1])
+                continue
+            if not self.unconfirmed(key):
+                self.mark(key, "pending")
+            yield item
+
+    def counts(self) -> dict:
+        counts = dict.fromkeys(STATES, 0)
+        for state in self.states.values():
+            counts[state] += 1
+        return counts
+
+    def report(self) -> str:
+        c = self.counts()
+        s = self.stats
+        resumed = (f", resumed: {s['done_before']} already done, {s['found']} found after restart, "
+                   f"{s['resubmitted']} resubmitted") if self.resume else ""
+        return (f"Journal {self.path.name}: {c['verified']} verified, {c['failed']} failed, "
+                f"{c['submitted']} submitted, {c['pending']} pending{resumed}")
@@ -0,0 +1,126 @@
+"""
+Compiled Form Schema
+
+Builds a FormSchema once, from selectors.json and operations.json, holding
+each field's kind, selector, maxlength and select options. Fills dispatch on
+the recorded kind instead of inspecting the DOM, and values are checked
+before the browser is touched:
+- unknown fields raise SchemaError
+- text values longer than maxlength are truncated
+- select values may be given as option value or option text; anything else
+  raises SchemaError
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+
+class SchemaError(ValueError):
+    """Field data does not fit the form schema"""
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    """One form field as recorded in selectors.json"""
+    name: str
+    kind: str  # "text", "textarea", "select" or "checkbox"
+    selector: str
+    maxlength: Optional[int] = None
+    options: Dict[str, str] = field(default_factory=dict)  # option text -> value
+
+    @classmethod
+    def from_json(cls, spec: dict) -> "FieldSpec":
+        maxlength = spec.get("maxlength")
+        return cls(
+            name=spec["name"],
+            kind=spec.get("type") or "text",
+            selector=spec.get("selector") or f"[name='{spec['name']}']",
+            maxlength=int(maxlength) if maxlength else None,
+            options={o["text"]: o["value"] for o in spec.get("options", [])},
+        )
+
+    def coerce(self, value) -> Tuple[object, bool]:
+        """
+        Convert a value to what the field accepts
+
+        Returns:
+            tuple (value, truncated)
+        """
+        if self.kind == "checkbox":
+            return bool(value), False
+
+        text = str(value)
+        if self.kind == "select":
+            if text in self.options.values():
+                return text, False
+            if text in self.options:
+                return self.options[text], False
+            raise SchemaError(f"{self.name}: '{text}' is not one of the field's options")
+
+        if self.maxlength and len(text) > self.maxlength:
+            return text[:self.maxlength], True
+        return text, False
+
+
+@dataclass
+class FormSchema:
+    """Fields, submit button and success indicator of one form operation"""
+    name: str
+    fields: Dict[str, FieldSpec]
+    submit_selector: Optional[str] = None
+    success_indicator: Optional[dict] = None
+
+    @classmethod
+    def compile(cls, selectors: dict, operations: dict, operation: str,
+                form: str = "theform") -> "FormSchema":
+        """
+        Build the schema for an operation from the parsed JSON files
+
+        Args:
+            selectors: Parsed selectors.json
+            operations: Parsed operations.json
+            operation: Operation name (e.g. "add_address_entry")
+            form: Form name in selectors.json
+
+        Returns:
+            FormSchema with every field of the form
+        """
+        op = next(o for o in operations["operations"] if o["name"] == operation)
+        fields = {f["name"]: FieldSpec.from_json(f) for f in selectors["forms"][form]["fields"]}
+
+        # operations.json and selectors.json are generated separately; keep them in step
+        missing = [n for n in op.get("form_fields", []) if n not in fields]
+        if missing:
+            raise SchemaError(f"{operation}: fields not in selectors.json: {', '.join(missing)}")
+
+        return cls(
+            name=operation,
+            fields=fields,
+            submit_selector=(op.get("submit") or {}).get("selector"),
+            success_indicator=op.get("success_indicator"),
+        )
+
+    def prepare(self, field_data: dict) -> Tuple[dict, List[str]]:
+        """
+        Validate and coerce field data before filling
+
+        Empty values are dropped.
+
+        Returns:
+            tuple (field_name -> value ready to fill, names of truncated fields)
+
+        Raises:
+            SchemaError: On an unknown field or an invalid select value
+        """
+        unknown = [n for n in field_data if n not in self.fields]
+        if unknown:
+            raise SchemaError(f"Unknown field(s) for {self.name}: {', '.join(unknown)}")
+
+        prepared = {}
+        truncated = []
+        for name, value in field_data.items():
+            if value is None or value == "":
+                continue
+            prepared[name], was_truncated = self.fields[name].coerce(value)
+            if was_truncated:
+                truncated.append(name)
+        return prepared, truncated
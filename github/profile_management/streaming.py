@@ -0,0 +1,114 @@
+"""
+Streaming Profile Input/Output
+
+Keeps memory flat for large imports:
+- iter_records() reads a JSON array or JSONL file one record at a time
+- iter_mapped() maps records with map_profile_to_address as they are consumed
+- ResultWriter appends one JSONL line per finished record, flushed immediately,
+  so results are durable while the run is still going
+"""
+import json
+from pathlib import Path
+from typing import Iterable, Iterator, Tuple
+
+from . import map_profile_to_address
+
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_records(path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """
+    Yield records from a JSON array or JSONL file without loading it whole
+
+    The format is picked from the first non-whitespace character: "[" means a
+    JSON array, anything else is read as JSONL (blank lines are skipped).
+    Array elements must be separated by exactly one comma.
+
+    Raises:
+        ValueError: On an invalid JSONL line or a malformed JSON array
+    """
+    with open(path) as f:
+        # Leading whitespace may span several chunks
+        head = ""
+        while True:
+            chunk = f.read(chunk_size)
+            head = (head + chunk).lstrip()
+            if head or not chunk:
+                break
+
+        if not head.startswith("["):
+            f.seek(0)
+            for line_no, line in enumerate(f, 1):
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError as e:
+                        raise ValueError(f"{path}:{line_no}: invalid JSON line: {e}") from None
+            return
+
+        decoder = json.JSONDecoder()
+        buffer = head[1:]
+        count = 0
+        # "first": a record or "]"; "record": a record after ","; "separator": "," or "]"
+        expect = "first"
+        eof = False
+        while True:
+            buffer = buffer.lstrip()
+            if buffer:
+                if expect == "separator":
+                    if buffer[0] == "]":
+                        return
+                    if buffer[0] != ",":
+                        raise ValueError(f"{path}: expected ',' or ']' after record {count}")
+                    buffer = buffer[1:]
+                    expect = "record"
+                    continue
+                if buffer[0] == "]" and expect == "first":
+                    return
+                if buffer[0] in ",]":
+                    raise ValueError(f"{path}: expected a record after record {count}, got {buffer[0]!r}")
+                try:
+                    record, end = decoder.raw_decode(buffer)
+                except json.JSONDecodeError:
+                    record, end = None, None
+                # A record is complete only once something follows it; otherwise
+                # it may be cut off at the chunk edge (e.g. a number)
+                if end is not None and buffer[end:].strip():
+                    yield record
+                    count += 1
+                    buffer = buffer[end:]
+                    expect = "separator"
+                    continue
+            if eof:
+                raise ValueError(f"{path}: truncated or invalid JSON array")
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+
+
+def iter_mapped(profiles: Iterable[dict]) -> Iterator[Tuple[int, dict, dict]]:
+    """Yield (index, profile, mapped Address Book data) lazily"""
+    for index, profile in enumerate(profiles):
+        yield index, profile, map_profile_to_address(profile)
+
+
+class ResultWriter:
+    """Appends one JSON line per import result"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.file = None
+        self.written = 0
+
+    def __enter__(self):
+        self.file = open(self.path, "a")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.file.close()
+        return False
+
+    def write(self, index: int, row: dict):
+        self.file.write(json.dumps({"index": index, **row}) + "\n")
+        self.file.flush()
+        self.written += 1
@@ -5,19 +5,37 @@ Camoufox Server Launcher with Persistent State
 Starts a camoufox browser and maintains a persistent context/page.
 The server keeps the browser connection alive so state persists across script executions.
 
+With --browsers N (or "auto", sized to the CPU cores and memory) it runs a
+pool of browser processes instead of one. All endpoints are published in
+.camoufox_pool.json, dead browsers are detected within seconds and relaunched,
+and clients lease the least-loaded browser through the lease/release
+operations. Browser 0 holds the persistent page.
+
+It also listens on a local Unix socket (.camoufox_cmd.sock) for JSON-RPC
+commands. Each command names an operation (login, create_visit,
+get_visit_history, add_address_entry, ...) which the server runs against its
+already logged-in page, so callers skip browser launch and login entirely.
+See command_client.py.
+
 Usage:
     uv run python start_server.py
     uv run python start_server.py --headless
+    uv run python start_server.py --login
+    uv run python start_server.py --headless --browsers auto
+    uv run python start_server.py --trace traces
 """
 
 import argparse
 import asyncio
 import base64
+import inspect
+import os
 import re
 import secrets
 import signal
 import subprocess
 import sys
+import time
 from pathlib import Path
 
 import orjson
@@ -27,12 +45,36 @@ from playwright.async_api import async_playwright
 from camoufox.pkgman import LOCAL_DATA
 from camoufox.utils import launch_options
 
+from profile_management import (
+    DEFAULT_USERNAME,
+    DEFAULT_PASSWORD,
+    ROUTE_POLICY,
+    SESSION_CACHE,
+    is_logged_in,
+    login,
+    navigate_to,
+    open_logged_in_page,
+)
+from emr_common.tracing import TRACER
+from profile_management.add_address_entry import AddAddressEntry
+from profile_management.import_profiles import ImportProfiles
+from visits.create_visit import VisitData, create_visit_on_page
+from visits.current import get_current_visit_on_page
+from visits.visit_history import get_visit_history_on_page
+
 
 LAUNCH_SCRIPT: Path = LOCAL_DATA / "launchServer.js"
 WS_URL_FILE = Path(__file__).parent / ".camoufox_ws_url"
 SESSION_ID_FILE = Path(__file__).parent / ".camoufox_session_id"
+CMD_SOCKET_FILE = Path(__file__).parent / ".camoufox_cmd.sock"
+POOL_FILE = Path(__file__).parent / ".camoufox_pool.json"
 WS_URL = None
 SESSION_ID = None
+POOL = None
+
+BROWSER_MEMORY_MB = 700   # Rough resident size of one Camoufox process
+HEALTH_INTERVAL = 2.0     # Seconds between health probes
+LEASE_TTL = 600.0         # Seconds before an unreleased lease expires
 
 
 def camel_case(snake_str: str) -> str:
@@ -59,6 +101,14 @@ def cleanup(signum, frame):
         WS_URL_FILE.unlink()
     if SESSION_ID_FILE.exists():
         SESSION_ID_FILE.unlink()
+    if CMD_SOCKET_FILE.exists():
+        CMD_SOCKET_FILE.unlink()
+    if POOL:
+        POOL.kill()
+    if POOL_FILE.exists():
+        POOL_FILE.unlink()
+    for path in TRACER.finish():
+        print(f"[TRACE] Written: {path}", flush=True)
     sys.exit(0)
 
 
@@ -103,8 +153,424 @@ async def launch_browser(headless: bool = False):
     return None, process
 
 
-async def main(headless: bool = False):
-    global WS_URL, SESSION_ID
+def default_pool_size() -> int:
+    """One browser per core, as far as memory allows"""
+    cores = os.cpu_count() or 1
+    try:
+        memory_mb = os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return cores
+    return max(1, min(cores, memory_mb // BROWSER_MEMORY_MB))
+
+
+class PooledBrowser:
+    """One browser process of the pool and the leases held on it"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.ws_url = None
+        self.process = None
+        self.browser = None
+        self.status = "starting"
+        self.leases = {}  # lease_id -> expiry (time.time())
+        self.restarts = 0
+        self.launched_at = None
+        self.needs_rebuild = False  # on_relaunch has not succeeded since the last relaunch
+
+    def alive(self) -> bool:
+        return (self.process is not None and self.process.returncode is None
+                and self.browser is not None and self.browser.is_connected())
+
+    def entry(self) -> dict:
+        return {
+            "id": self.index,
+            "ws_url": self.ws_url,
+            "pid": self.process.pid if self.process else None,
+            "status": self.status,
+            "leases": len(self.leases),
+            "restarts": self.restarts,
+            "launched_at": self.launched_at,
+        }
+
+
+class BrowserPool:
+    """
+    N Camoufox processes with health checks, relaunch and least-loaded leasing
+
+    A browser counts as dead as soon as its process exits or its Playwright
+    connection drops; both wake the monitor immediately, and it also probes
+    every HEALTH_INTERVAL seconds. Dead browsers are relaunched on the same
+    slot, their leases dropped, and the registry file rewritten. A failing
+    on_relaunch leaves the new browser up and is retried on every probe.
+    """
+
+    def __init__(self, playwright, size: int, headless: bool = False,
+                 registry_file: Path = POOL_FILE, on_relaunch=None):
+        self.playwright = playwright
+        self.headless = headless
+        self.registry_file = registry_file
+        self.on_relaunch = on_relaunch
+        self.slots = [PooledBrowser(i) for i in range(size)]
+        self.wake = asyncio.Event()
+        self.tasks = set()
+
+    async def start(self):
+        await asyncio.gather(*(self.launch(slot) for slot in self.slots))
+
+    async def launch(self, slot: PooledBrowser):
+        ws_url, process = await launch_browser(self.headless)
+        if not ws_url:
+            if process.returncode is None:
+                process.kill()
+            raise RuntimeError(f"Browser {slot.index} did not report a WebSocket URL")
+
+        slot.ws_url, slot.process = ws_url, process
+        slot.browser = await self.playwright.firefox.connect(ws_url)
+        slot.browser.on("disconnected", lambda _: self.wake.set())
+        slot.status = "up"
+        slot.launched_at = time.time()
+        self.spawn(self.watch(slot, process))
+        self.write_registry()
+
+    def spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def watch(self, slot: PooledBrowser, process):
+        """Drain the launcher's output and wake the monitor when it exits"""
+        while await process.stdout.readline():
+            pass
+        await process.wait()
+        if slot.process is process:
+            print(f"[POOL] Browser {slot.index} exited ({process.returncode})", flush=True)
+        self.wake.set()
+
+    async def relaunch(self, slot: PooledBrowser):
+        slot.status = "restarting"
+        slot.leases.clear()
+        self.write_registry()
+        try:
+            if slot.browser:
+                await slot.browser.close()
+        except Exception:
+            pass
+        if slot.process and slot.process.returncode is None:
+            slot.process.kill()
+
+        await self.launch(slot)
+        slot.restarts += 1
+        print(f"[POOL] Browser {slot.index} relaunched: {slot.ws_url}", flush=True)
+        slot.needs_rebuild = True
+        await self.rebuild(slot)
+
+    async def rebuild(self, slot: PooledBrowser):
+        """Run on_relaunch for a relaunched browser; on failure it is retried later"""
+        if not self.on_relaunch:
+            slot.needs_rebuild = False
+            return
+        try:
+            await self.on_relaunch(slot)
+            slot.needs_rebuild = False
+        except Exception as e:
+            print(f"[POOL] Rebuild after relaunch of browser {slot.index} failed: {e}", flush=True)
+
+    async def monitor(self):
+        """Relaunch dead browsers and expire stale leases, until cancelled"""
+        while True:
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout=HEALTH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+
+            now = time.time()
+            for slot in self.slots:
+                for lease_id, expires in list(slot.leases.items()):
+                    if expires < now:
+                        del slot.leases[lease_id]
+                # A failed relaunch leaves the slot "down"; it is retried on the next probe
+                if not slot.alive() or slot.status != "up":
+                    print(f"[POOL] Browser {slot.index} is down - relaunching", flush=True)
+                    try:
+                        await self.relaunch(slot)
+                    except Exception as e:
+                        slot.status = "down"
+                        self.write_registry()
+                        print(f"[POOL] Relaunch of browser {slot.index} failed: {e}", flush=True)
+                elif slot.needs_rebuild:
+                    await self.rebuild(slot)
+
+    def lease(self, ttl: float = LEASE_TTL) -> dict:
+        """
+        Lease the up browser with the fewest leases
+
+        Returns:
+            dict with lease_id, browser id, ws_url and expires_at
+
+        Raises:
+            RuntimeError: If no browser is up
+        """
+        candidates = [s for s in self.slots if s.status == "up" and s.alive()]
+        if not candidates:
+            raise RuntimeError("No browser available")
+        slot = min(candidates, key=lambda s: len(s.leases))
+        lease_id = secrets.token_hex(8)
+        slot.leases[lease_id] = time.time() + ttl
+        self.write_registry()
+        return {"lease_id": lease_id, "id": slot.index, "ws_url": slot.ws_url,
+                "expires_at": slot.leases[lease_id]}
+
+    def release(self, lease_id: str) -> bool:
+        for slot in self.slots:
+            if slot.leases.pop(lease_id, None) is not None:
+                self.write_registry()
+                return True
+        return False
+
+    def write_registry(self):
+        """Publish every endpoint (readable by the owner only)"""
+        data = {"updated_at": time.time(), "browsers": [s.entry() for s in self.slots]}
+        tmp = self.registry_file.with_suffix(".tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        tmp.replace(self.registry_file)
+
+    def report(self) -> str:
+        up = sum(1 for s in self.slots if s.status == "up")
+        leases = sum(len(s.leases) for s in self.slots)
+        restarts = sum(s.restarts for s in self.slots)
+        return f"Pool: {up}/{len(self.slots)} browser(s) up, {leases} lease(s), {restarts} restart(s)"
+
+    def kill(self):
+        """Kill every browser process (synchronous, for signal handlers)"""
+        for slot in self.slots:
+            if slot.process and slot.process.returncode is None:
+                slot.process.kill()
+
+    async def close(self):
+        for task in list(self.tasks):
+            task.cancel()
+        for slot in self.slots:
+            try:
+                if slot.browser:
+                    await slot.browser.close()
+            except Exception:
+                pass
+        self.kill()
+        if self.registry_file.exists():
+            self.registry_file.unlink()
+
+
+# Named operations callable over the command socket.
+# Each handler receives the persistent page plus the request params.
+# Exclusive operations use the page and run one at a time; the others
+# (pool bookkeeping) answer immediately.
+OPERATIONS = {}
+
+
+def operation(name: str, exclusive: bool = True):
+    def register(handler):
+        handler.exclusive = exclusive
+        OPERATIONS[name] = handler
+        return handler
+    return register
+
+
+async def ensure_app(page, username: str = DEFAULT_USERNAME, password: str = DEFAULT_PASSWORD) -> bool:
+    """Log in only if the persistent page is not already inside OpenEMR."""
+    if is_logged_in(page):
+        return True
+    return await login(page, username, password)
+
+
+async def ensure_address_book(page) -> bool:
+    if not await ensure_app(page):
+        return False
+    return await navigate_to(page, ["Admin", "Address Book"], wait_frame="addrbook_list")
+
+
+@operation("ping")
+async def op_ping(page):
+    return {"url": page.url, "logged_in": is_logged_in(page)}
+
+
+@operation("login")
+async def op_login(page, username: str = DEFAULT_USERNAME, password: str = DEFAULT_PASSWORD):
+    return {"success": await login(page, username, password)}
+
+
+@operation("navigate")
+async def op_navigate(page, menu_path: list, wait_frame: str = None):
+    if not await ensure_app(page):
+        return {"success": False, "message": "Login failed"}
+    return {"success": await navigate_to(page, menu_path, wait_frame=wait_frame)}
+
+
+@operation("add_address_entry")
+async def op_add_address_entry(page, data: dict):
+    if not await ensure_address_book(page):
+        return {"success": False, "message": "Could not open Address Book", "data": None}
+    return await AddAddressEntry(page).execute(data)
+
+
+@operation("import_profiles")
+async def op_import_profiles(page, profiles: list):
+    if not await ensure_address_book(page):
+        return {"success": False, "message": "Could not open Address Book"}
+    return await ImportProfiles(page).import_all(profiles)
+
+
+@operation("create_visit")
+async def op_create_visit(page, patient_name: str, visit_data: dict = None, screenshot_dir: str = None):
+    return await create_visit_on_page(
+        page, patient_name, VisitData(**(visit_data or {})), screenshot_dir=screenshot_dir
+    )
+
+
+@operation("get_current_visit")
+async def op_get_current_visit(page, patient_name: str, encounter_date: str = None, screenshot_dir: str = None):
+    return await get_current_visit_on_page(
+        page, patient_name, encounter_date, screenshot_dir=screenshot_dir
+    )
+
+
+@operation("get_visit_history")
+async def op_get_visit_history(page, patient_name: str, screenshot_dir: str = None):
+    return await get_visit_history_on_page(page, patient_name, screenshot_dir=screenshot_dir)
+
+
+@operation("lease", exclusive=False)
+async def op_lease(page, ttl: float = LEASE_TTL):
+    return POOL.lease(ttl)
+
+
+@operation("release", exclusive=False)
+async def op_release(page, lease_id: str):
+    return {"released": POOL.release(lease_id)}
+
+
+@operation("pool_status", exclusive=False)
+async def op_pool_status(page):
+    return {"browsers": [slot.entry() for slot in POOL.slots]}
+
+
+@operation("trace", exclusive=False)
+async def op_trace(page, write: bool = False):
+    files = [str(path) for path in TRACER.finish()] if write else []
+    return {"enabled": TRACER.enabled, "summary": TRACER.summary(), "files": files}
+
+
+@operation("screenshot")
+async def op_screenshot(page, path: str, full_page: bool = False):
+    async with ROUTE_POLICY.lifted(page):
+        await page.screenshot(path=path, full_page=full_page)
+    return {"path": path}
+
+
+class CommandServer:
+    """
+    JSON-RPC endpoint on a Unix socket that runs operations on the persistent page.
+
+    Protocol: one JSON-RPC 2.0 request per line, one response per line.
+    Operations share a single page, so they run one at a time.
+    """
+
+    def __init__(self, page, socket_path: Path = CMD_SOCKET_FILE):
+        self.page = page
+        self.socket_path = socket_path
+        self.lock = asyncio.Lock()
+        self.server = None
+
+    async def start(self):
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+        self.server = await asyncio.start_unix_server(
+            self.handle_client, path=str(self.socket_path), limit=64 * 1024 * 1024
+        )
+        os.chmod(self.socket_path, 0o600)
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self.dispatch(line)
+                writer.write(orjson.dumps(response, default=str) + b"\n")
+                await writer.drain()
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, line: bytes) -> dict:
+        try:
+            request = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            return rpc_error(None, -32700, "Parse error")
+        if not isinstance(request, dict):
+            return rpc_error(None, -32600, "Invalid Request")
+
+        req_id = request.get("id")
+        method = request.get("method")
+        params = request.get("params") or {}
+
+        handler = OPERATIONS.get(method)
+        if handler is None:
+            return rpc_error(req_id, -32601, f"Unknown operation: {method}")
+        # Check params against the handler's signature, so a TypeError raised
+        # inside the handler is reported as a failure, not as bad params
+        try:
+            inspect.signature(handler).bind(self.page, **params)
+        except TypeError as e:
+            return rpc_error(req_id, -32602, f"Invalid params: {e}")
+
+        started = time.perf_counter()
+        try:
+            if handler.exclusive:
+                async with self.lock:
+                    result = await handler(self.page, **params)
+            else:
+                result = await handler(self.page, **params)
+        except Exception as e:
+            print(f"[CMD] {method} failed: {e}", flush=True)
+            return rpc_error(req_id, -32000, str(e))
+
+        print(f"[CMD] {method} ({time.perf_counter() - started:.2f}s)", flush=True)
+        return {"jsonrpc": "2.0", "id": req_id, "result": result}
+
+
+def rpc_error(req_id, code: int, message: str) -> dict:
+    return {"jsonrpc": "2.0", "id": req_id, "error": {"code": code, "message": message}}
+
+
+async def open_persistent_page(browser, do_login: bool = False):
+    """Create the persistent context/page, logged in up front if asked"""
+    viewport = {"width": 1920, "height": 1080}
+    if do_login:
+        # Log in up front, reusing a cached session when possible
+        context, page, logged_in = await open_logged_in_page(browser, viewport=viewport)
+        if not logged_in:
+            print("[WARN] Login failed - commands will retry", flush=True)
+        print(f"[STEP 5] {SESSION_CACHE.report()}", flush=True)
+    else:
+        context = await browser.new_context(viewport=viewport)
+        await ROUTE_POLICY.apply(context)
+        page = await context.new_page()
+    return context, page
+
+
+async def main(headless: bool = False, do_login: bool = False, browsers: int = 1):
+    global WS_URL, SESSION_ID, POOL
 
     # Generate session ID
     SESSION_ID = secrets.token_hex(16)
@@ -114,49 +580,72 @@ async def main(headless: bool = False):
     print("CAMOUFOX SERVER WITH PERSISTENT STATE", flush=True)
     print("=" * 50, flush=True)
     print(f"Headless: {headless}", flush=True)
+    print(f"Browsers: {browsers}", flush=True)
     print("=" * 50, flush=True)
     print(f"SESSION_ID = \"{SESSION_ID}\"", flush=True)
     print("=" * 50, flush=True)
 
-    # Launch browser
-    WS_URL, browser_process = await launch_browser(headless)
-
-    if not WS_URL:
-        print("[ERROR] Failed to capture WebSocket URL", flush=True)
+    # Launch the browser pool
+    p = await async_playwright().start()
+    command_server = None
+
+    async def on_relaunch(slot):
+        # Browser 0 holds the persistent page: rebuild it on the new process
+        global WS_URL
+        if slot.index != 0:
+            return
+        WS_URL = slot.ws_url
+        WS_URL_FILE.write_text(WS_URL)
+        _, new_page = await open_persistent_page(slot.browser, do_login)
+        async with command_server.lock:
+            command_server.page = new_page
+        print("[POOL] Persistent page recreated on browser 0", flush=True)
+
+    POOL = BrowserPool(p, browsers, headless, on_relaunch=on_relaunch)
+    try:
+        await POOL.start()
+    except RuntimeError as e:
+        print(f"[ERROR] {e}", flush=True)
+        await POOL.close()
+        await p.stop()
         return
 
+    WS_URL = POOL.slots[0].ws_url
     print(f"\n[STEP 2] WebSocket URL: {WS_URL}", flush=True)
     WS_URL_FILE.write_text(WS_URL)
-    print(f"[STEP 3] Saved to {WS_URL_FILE}", flush=True)
+    print(f"[STEP 3] Saved to {WS_URL_FILE}; all endpoints in {POOL_FILE}", flush=True)
 
-    # Connect to browser and create persistent context/page
+    # Create the persistent context/page on browser 0
     print("[STEP 4] Creating persistent context and page...", flush=True)
+    context, page = await open_persistent_page(POOL.slots[0].browser, do_login)
 
-    p = await async_playwright().start()
-    browser = await p.firefox.connect(WS_URL)
-
-    context = await browser.new_context(viewport={"width": 1920, "height": 1080})
-    page = await context.new_page()
+    print("[STEP 6] Persistent context and page created!", flush=True)
 
-    print("[STEP 5] Persistent context and page created!", flush=True)
+    command_server = CommandServer(page)
+    await command_server.start()
+    monitor = asyncio.create_task(POOL.monitor())
+    print(f"[STEP 7] Command channel listening on {CMD_SOCKET_FILE}", flush=True)
     print("=" * 50, flush=True)
     print("SERVER READY - State will persist across scripts", flush=True)
     print("=" * 50, flush=True)
 
-    # Keep the connection alive forever
+    # Keep the connection alive forever; the pool monitor handles dead browsers
     try:
         while True:
             await asyncio.sleep(60)
-            # Heartbeat - check if browser is still connected
             try:
-                contexts = browser.contexts
-                print(f"[HEARTBEAT] {len(contexts)} context(s), page URL: {page.url}", flush=True)
+                page = command_server.page
+                print(f"[HEARTBEAT] {len(page.context.pages)} page(s), page URL: {page.url}", flush=True)
             except Exception as e:
-                print(f"[ERROR] Browser disconnected: {e}", flush=True)
-                break
+                print(f"[HEARTBEAT] Persistent page unavailable: {e}", flush=True)
+            print(f"[HEARTBEAT] {POOL.report()}", flush=True)
+            print(f"[HEARTBEAT] {ROUTE_POLICY.report()}", flush=True)
     except asyncio.CancelledError:
         print("[SHUTDOWN] Server stopping...", flush=True)
     finally:
+        monitor.cancel()
+        await command_server.close()
+        await POOL.close()
         await p.stop()
         if WS_URL_FILE.exists():
             WS_URL_FILE.unlink()
@@ -164,12 +653,29 @@ async def main(headless: bool = False):
             SESSION_ID_FILE.unlink()
 
 
+def pool_size(value: str) -> int:
+    """--browsers value: a count, or "auto" to size by cores and memory"""
+    if value == "auto":
+        return default_pool_size()
+    size = int(value)
+    if size < 1:
+        raise argparse.ArgumentTypeError("need at least one browser")
+    return size
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Launch camoufox with persistent state")
     parser.add_argument("--headless", action="store_true", help="Run headless")
+    parser.add_argument("--login", action="store_true", help="Log in to OpenEMR at startup")
+    parser.add_argument("--browsers", type=pool_size, default=1, metavar="N|auto",
+                        help="Browser processes in the pool (auto: one per core, as memory allows)")
+    parser.add_argument("--trace", default=None, metavar="DIR",
+                        help="Record step and Playwright spans; write trace_summary.json and trace.json here on exit")
     args = parser.parse_args()
+    if args.trace:
+        TRACER.enable(args.trace)
 
     signal.signal(signal.SIGINT, cleanup)
     signal.signal(signal.SIGTERM, cleanup)
 
-    asyncio.run(main(headless=args.headless))
+    asyncio.run(main(headless=args.headless, do_login=args.login, browsers=args.browsers))
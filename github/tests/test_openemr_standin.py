@@ -0,0 +1,121 @@
+"""
+Smoke test for the offline OpenEMR stand-in (benchmarks/openemr_standin.py)
+
+Starts the stand-in on a free port and drives it over plain HTTP: login,
+Address Book list, add form save, and encounter history. The workflow
+benchmark depends on all of these.
+
+Usage:
+    python -m pytest tests/test_openemr_standin.py
+"""
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from pathlib import Path
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, build_opener
+
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from benchmarks.openemr_standin import (
+    CSRF_INPUT,
+    DEMOGRAPHICS_PATH,
+    EDIT_PATH,
+    HISTORY_PATH,
+    LIST_PATH,
+    MAIN_PATH,
+    PASSWORD,
+    USERNAME,
+    StandinServer,
+    StandinStore,
+)
+
+
+@pytest.fixture
+def server():
+    with StandinServer(store=StandinStore.seeded()) as server:
+        yield server
+
+
+def logged_in(server):
+    """urllib opener holding a logged-in stand-in session"""
+    opener = build_opener(HTTPCookieProcessor(CookieJar()))
+    body = urlencode({"authUser": USERNAME, "clearPass": PASSWORD}).encode()
+    response = opener.open(f"{server.base_url}/interface/main/main_screen.php?auth=login&site=default", body)
+    assert response.url.endswith(MAIN_PATH)
+    assert "tabs_view_model" in response.read().decode()
+    return opener
+
+
+def get(opener, server, path: str, form: dict = None) -> str:
+    data = urlencode(form).encode() if form is not None else None
+    return opener.open(f"{server.base_url}{path}", data).read().decode()
+
+
+def csrf_token(opener, server) -> str:
+    """CSRF token from one load of the add form"""
+    form = get(opener, server, f"{EDIT_PATH}?type=")
+    return CSRF_INPUT.search(form).group(0).split('value="')[1].rstrip('"')
+
+
+def test_requires_login(server):
+    opener = build_opener(HTTPCookieProcessor(CookieJar()))
+    response = opener.open(f"{server.base_url}{MAIN_PATH}")
+    assert "login/login.php" in response.url
+    assert 'id="authUser"' in response.read().decode()
+
+
+def test_address_book_save_and_list(server):
+    opener = logged_in(server)
+    assert "address_names" in get(opener, server, LIST_PATH)
+
+    token = csrf_token(opener, server)
+    saved = get(opener, server, f"{EDIT_PATH}?userid=", {
+        "csrf_token_form": token, "form_fname": "Smoke", "form_lname": "Tester",
+        "form_abook_type": "oth", "form_save": "Save",
+    })
+    assert "dlgclose" in saved
+
+    listed = get(opener, server, LIST_PATH, {"form_fname": "", "form_lname": "Tester"})
+    assert "Smoke" in listed and "Tester" in listed
+    assert listed.count("address_names") == 1
+
+
+def test_save_rejects_bad_csrf(server):
+    opener = logged_in(server)
+    entries = len(server.store.address_book)
+    answer = get(opener, server, f"{EDIT_PATH}?userid=", {
+        "csrf_token_form": "wrong", "form_lname": "Nobody", "form_save": "Save",
+    })
+    # The form comes back instead of the dialog-closing page
+    assert 'name="csrf_token_form"' in answer
+    assert len(server.store.address_book) == entries
+
+
+def test_encounter_history(server):
+    opener = logged_in(server)
+    assert "Belford" in get(opener, server, f"{DEMOGRAPHICS_PATH}?set_pid=1")
+    history = get(opener, server, HISTORY_PATH)
+    assert history.count("Follow-up") == 3
+
+
+def test_concurrent_saves_and_lists(server):
+    opener = logged_in(server)
+    token = csrf_token(opener, server)
+    entries = len(server.store.address_book)
+
+    def save(i):
+        return get(opener, server, f"{EDIT_PATH}?userid=", {
+            "csrf_token_form": token, "form_fname": f"Load{i}", "form_lname": "Parallel", "form_save": "Save",
+        })
+
+    with ThreadPoolExecutor(8) as pool:
+        saves = pool.map(save, range(40))
+        lists = [pool.submit(get, opener, server, LIST_PATH) for _ in range(40)]
+        assert all("dlgclose" in s for s in saves)
+        assert all("address_names" in f.result() for f in lists)
+    assert len(server.store.address_book) == entries + 40
@@ -11,11 +11,39 @@ Usage:
 
 import asyncio
 import argparse
+import re
+import sys
+import time
 from pathlib import Path
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
 from camoufox.async_api import AsyncCamoufox
 
+# Make the shared helpers importable when run as a script
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from emr_common.waits import (
+    WaitBudget,
+    expect_frame,
+    wait_for_dom_settled,
+    wait_for_frame,
+    wait_for_network_quiet,
+    wait_for_url,
+    wait_for_visible,
+)
+from emr_common import BASE_URL, js_helpers
+from emr_common.frame_registry import frame_registry
+from emr_common.har_replay import HAR_MODE
+from emr_common.nav_index import NAV_INDEX
+from emr_common.patient_cache import DEMOGRAPHICS_PATH, PATIENT_CACHE, normalize_name
+from emr_common.route_policy import ROUTE_POLICY
+from emr_common.run_profile import DEFAULT_PROFILE, PROFILES, current_profile, use_profile
+from emr_common.session_cache import SESSION_CACHE
+from emr_common.tracing import TRACER, format_timings
+
 
 @dataclass
 class VisitData:
@@ -35,223 +63,353 @@ class CreateVisitResult:
     encounter_id: Optional[str] = None
     message: str = ""
     screenshot_path: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)   # step -> seconds
 
 
 class OpenEMRSession:
     """Manages OpenEMR browser session"""
 
-    def __init__(self, base_url: str = "https://demo.openemr.io/openemr"):
+    def __init__(self, base_url: str = BASE_URL, budget: WaitBudget = None):
         self.base_url = base_url
         self.login_url = f"{base_url}/interface/login/login.php?site=default"
         self.browser = None
+        self.context = None
         self.page = None
+        self.budget = budget or WaitBudget()
+
+    async def open(self, browser, username: str = "admin", password: str = "pass", cache=None,
+                   policy=ROUTE_POLICY, fresh: bool = False) -> bool:
+        """
+        Open a logged-in page in a new context, reusing a cached session when possible
+
+        With fresh the cache is skipped and the context logs in with a PHP
+        session of its own (needed when contexts select patients concurrently).
+        """
+        async def do_login(page, username, password):
+            self.page = page
+            return await self.login(username, password)
+
+        cache = cache or SESSION_CACHE
+        self.browser = browser
+        self.context, self.page, logged_in = await cache.open_context(
+            browser, self.base_url, username, password, do_login, policy=policy, fresh=fresh
+        )
+        return logged_in
+
+    def is_logged_in(self) -> bool:
+        """True if the page is already inside the OpenEMR app"""
+        return self.page is not None and "/interface/main/" in self.page.url
 
     async def login(self, username: str = "admin", password: str = "pass") -> bool:
         """Login to OpenEMR"""
-        await self.page.goto(self.login_url)
-        await asyncio.sleep(2)
+        await self.page.goto(self.login_url, wait_until="domcontentloaded")
         await self.page.fill('#authUser', username)
-        await asyncio.sleep(0.3)
         await self.page.fill('#clearPass', password)
-        await asyncio.sleep(0.3)
         await self.page.click('#login-button')
-        await asyncio.sleep(4)
-        return 'login' not in self.page.url.lower()
+        return await wait_for_url(self.page, lambda url: 'login' not in url.lower(), budget=self.budget)
+
+    async def select_patient(self, patient_name: str, cache=None) -> bool:
+        """
+        Select a patient, by cached pid when known, otherwise via Finder
+
+        Args:
+            patient_name: Name (or part of it) as shown in the Finder
+            cache: PatientCache to use (defaults to the shared PATIENT_CACHE)
+
+        Returns:
+            bool: True if the patient is now the active patient
+        """
+        cache = cache or PATIENT_CACHE
+        started = time.perf_counter()
+
+        pid = cache.get(self.base_url, patient_name)
+        if pid:
+            with TRACER.span("set_patient_by_pid"):
+                found = await self.set_patient_by_pid(pid, patient_name)
+            if found:
+                cache.record(True, time.perf_counter() - started)
+                return True
+            cache.invalidate(self.base_url, patient_name)
+
+        with TRACER.span("finder"):
+            demographics = await self.select_patient_via_finder(patient_name)
+        if demographics is None:
+            return False
+
+        pid = parse_qs(urlsplit(demographics.url).query).get("set_pid", [None])[0]
+        if not pid:
+            pid = await js_helpers.call(self.page, "currentPid")
+        if pid:
+            cache.put(self.base_url, patient_name, pid)
+        cache.record(False, time.perf_counter() - started)
+        return True
 
-    async def select_patient(self, patient_name: str) -> bool:
-        """Select a patient via Finder"""
+    async def set_patient_by_pid(self, pid: str, patient_name: str) -> bool:
+        """
+        Set the active patient by loading its demographics page directly
+
+        Returns:
+            bool: True if the page loaded and shows patient_name
+        """
+        url = f"{self.base_url}{DEMOGRAPHICS_PATH}?set_pid={pid}"
+        async with expect_frame(self.page, "demographics", budget=self.budget) as nav:
+            if not await js_helpers.call(self.page, "navigateTab", url, "pat"):
+                nav.cancel()
+        if nav.frame is None:
+            return False
+
+        # A pid that was deleted or reassigned no longer shows the expected name
+        try:
+            text = await nav.frame.inner_text("body")
+        except:
+            return False
+        return normalize_name(patient_name) in normalize_name(text)
+
+    async def select_patient_via_finder(self, patient_name: str):
+        """
+        Select a patient via Finder
+
+        Returns:
+            The demographics frame, or None if the patient was not found
+        """
         await self.page.click('text=Finder')
-        await asyncio.sleep(5)
-
-        # Wait for finder to load, retry checking frames
-        for attempt in range(3):
-            for frame in self.page.frames:
-                try:
-                    link = await frame.query_selector(f'a:has-text("{patient_name}")')
-                    if link:
+
+        # Wait for the finder frame and its patient rows
+        finder = await wait_for_frame(self.page, "finder", budget=self.budget)
+        if finder:
+            await wait_for_visible(finder, f'a:has-text("{patient_name}")', budget=self.budget)
+
+        # The link is in the Finder frame; every frame is searched only if
+        # the Finder never loaded
+        for frame in frame_registry(self.page).candidates("finder"):
+            try:
+                link = await frame.query_selector(f'a:has-text("{patient_name}")')
+                if link:
+                    async with expect_frame(self.page, "demographics", budget=self.budget) as nav:
                         await link.click()
-                        await asyncio.sleep(4)
-                        return True
-                except:
-                    pass
-            await asyncio.sleep(2)
-
-        return False
-
-    async def navigate_to_menu(self, *menu_path: str) -> bool:
-        """Navigate through menu hierarchy"""
-        for i, item in enumerate(menu_path):
-            if i == 0:
-                await self.page.click(f'text={item}')
-                await asyncio.sleep(0.5)
+                    return nav.frame or await wait_for_frame(self.page, "demographics", budget=self.budget)
+            except:
+                pass
+
+        return None
+
+    async def navigate_to_menu(self, *menu_path: str, wait_frame: Optional[str] = None) -> bool:
+        """
+        Navigate through menu hierarchy
+
+        Clicks the top-level item, hovers intermediate submenus and clicks the
+        last item; the throughput run profile clicks the last label element
+        directly instead of moving the mouse. When the navigation index has
+        learned the target URL, the frame is loaded directly instead.
+        """
+        async def click_last(click):
+            if wait_frame:
+                async with expect_frame(self.page, wait_frame, budget=self.budget):
+                    await click()
             else:
-                # Hover and click for submenus
-                pos = await self.page.evaluate(f"""
-                    () => {{
-                        const el = Array.from(document.querySelectorAll('.menuLabel'))
-                            .find(e => e.textContent.trim() === '{item}');
-                        if (el) {{
-                            const r = el.getBoundingClientRect();
-                            return {{x: r.x + r.width/2, y: r.y + r.height/2, disabled: el.classList.contains('menuDisabled')}};
-                        }}
-                        return null;
-                    }}
-                """)
-                if pos and not pos.get('disabled'):
-                    await self.page.mouse.move(pos['x'], pos['y'])
-                    await asyncio.sleep(0.5)
-                    await self.page.mouse.click(pos['x'], pos['y'])
-                    await asyncio.sleep(2)
-                else:
+                await click()
+                await wait_for_network_quiet(self.page, quiet_ms=500, budget=self.budget)
+
+        async def click_through():
+            for i, item in enumerate(menu_path):
+                is_last = i == len(menu_path) - 1
+                if i == 0:
+                    if is_last:
+                        await click_last(lambda: self.page.click(f'text={item}'))
+                    else:
+                        await self.page.click(f'text={item}')
+                        await wait_for_dom_settled(self.page, quiet_ms=100, timeout=500)
+                    continue
+
+                pos = await js_helpers.call(self.page, "menuPosition", item)
+                if not pos or (is_last and pos.get('disabled')):
                     return False
-        return True
 
+                if not current_profile().hover_clicks:
+                    # Menu labels handle clicks even while their submenu is
+                    # closed, so only the last one needs clicking
+                    if is_last:
+                        await click_last(lambda: js_helpers.call(self.page, "menuClick", item))
+                    continue
 
-async def create_visit(
+                await self.page.mouse.move(pos['x'], pos['y'])
+                if is_last:
+                    await click_last(lambda: self.page.mouse.click(pos['x'], pos['y']))
+                else:
+                    # Hovering opens the submenu holding the next item; a locator
+                    # matches its label exactly, quotes and all
+                    next_label = self.page.locator(".menuLabel").filter(
+                        has_text=re.compile(rf"^\s*{re.escape(menu_path[i + 1])}\s*$"))
+                    try:
+                        await next_label.first.wait_for(state="visible", timeout=500)
+                    except Exception:
+                        pass
+            return True
+
+        return await NAV_INDEX.navigate(self.page, list(menu_path), click_through, wait_frame, self.budget)
+
+
+@TRACER.traced("create_visit")
+async def create_visit_on_page(
+    page,
     patient_name: str,
     visit_data: Optional[VisitData] = None,
     username: str = "admin",
     password: str = "pass",
-    headless: bool = False,
     screenshot_dir: Optional[Path] = None
 ) -> CreateVisitResult:
     """
-    Create a new visit/encounter for a patient.
+    Create a new visit/encounter for a patient on an existing page.
+
+    Logs in only if the page is not already inside the OpenEMR app, so it
+    can run against a warm page such as the one held by start_server.py.
 
     Args:
+        page: Playwright page object (logged in or not)
         patient_name: Name or partial name to search for patient
         visit_data: Optional VisitData with encounter details
         username: OpenEMR username
         password: OpenEMR password
-        headless: Run browser in headless mode
         screenshot_dir: Directory to save screenshots
 
     Returns:
-        CreateVisitResult with success status and details
+        CreateVisitResult with success status and details (timings per step)
     """
     if visit_data is None:
         visit_data = VisitData()
 
     result = CreateVisitResult(success=False)
+    timings = result.timings
 
-    async with AsyncCamoufox(headless=headless) as browser:
-        page = await browser.new_page()
-        page.set_default_timeout(10000)
+    budget = WaitBudget()
+    session = OpenEMRSession(budget=budget)
+    session.page = page
 
-        session = OpenEMRSession()
-        session.page = page
-
-        # Login
+    # Login (skipped when the page is already inside the app)
+    if not session.is_logged_in():
         print(f"[1] Logging in...")
-        if not await session.login(username, password):
+        with TRACER.span("login", timings):
+            logged_in = await session.login(username, password)
+        if not logged_in:
             result.message = "Login failed"
             return result
 
-        # Select patient
-        print(f"[2] Selecting patient: {patient_name}")
-        if not await session.select_patient(patient_name):
-            result.message = f"Patient '{patient_name}' not found"
-            return result
-
-        # Navigate to Create Visit
-        print(f"[3] Opening Create Visit form...")
-        await page.click('text=Patient')
-        await asyncio.sleep(0.5)
-
-        # Hover on Visits submenu
-        visits_pos = await page.evaluate("""
-            () => {
-                const el = Array.from(document.querySelectorAll('.menuLabel'))
-                    .find(e => e.textContent.trim() === 'Visits');
-                if (el) {
-                    const r = el.getBoundingClientRect();
-                    return {x: r.x + r.width/2, y: r.y + r.height/2};
-                }
-                return null;
-            }
-        """)
-
-        if visits_pos:
-            await page.mouse.move(visits_pos['x'], visits_pos['y'])
-            await asyncio.sleep(0.5)
-
-        # Click Create Visit
-        create_pos = await page.evaluate("""
-            () => {
-                const el = Array.from(document.querySelectorAll('.menuLabel'))
-                    .find(e => e.textContent.trim() === 'Create Visit');
-                if (el && !el.classList.contains('menuDisabled')) {
-                    const r = el.getBoundingClientRect();
-                    return {x: r.x + r.width/2, y: r.y + r.height/2};
-                }
-                return null;
-            }
-        """)
-
-        if not create_pos:
-            result.message = "Create Visit menu item not available"
-            return result
-
-        await page.mouse.click(create_pos['x'], create_pos['y'])
-        await asyncio.sleep(4)
+    # Select patient
+    print(f"[2] Selecting patient: {patient_name}")
+    with TRACER.span("select_patient", timings):
+        found = await session.select_patient(patient_name)
+    if not found:
+        result.message = f"Patient '{patient_name}' not found"
+        return result
 
-        # Wait for form to load in iframe
-        print(f"[4] Waiting for encounter form to load...")
-        await asyncio.sleep(2)
+    # Navigate to Create Visit
+    print(f"[3] Opening Create Visit form...")
+    with TRACER.span("navigate", timings):
+        opened = await session.navigate_to_menu("Patient", "Visits", "Create Visit", wait_frame="newpatient")
+    if not opened:
+        result.message = "Create Visit menu item not available"
+        return result
 
-        # Find and fill form in iframe
-        form_found = False
-        for frame in page.frames:
-            try:
-                # Look for the encounter form by checking for specific fields
-                save_btn = await frame.query_selector('#save-form, button:has-text("Save"), input[name="form_save"]')
-                if not save_btn:
-                    continue
+    # Wait for form to load in iframe
+    print(f"[4] Waiting for encounter form to load...")
+    with TRACER.span("wait_form", timings):
+        form_frame = await wait_for_frame(page, "new_encounter", budget=budget)
+        if form_frame:
+            await wait_for_visible(form_frame, '#save-form, button:has-text("Save"), input[name="form_save"]',
+                                   budget=budget)
+
+    # Find and fill form in iframe
+    form_found = False
+    for frame in frame_registry(page).candidates("new_encounter"):
+        try:
+            # Look for the encounter form by checking for specific fields
+            save_btn = await frame.query_selector('#save-form, button:has-text("Save"), input[name="form_save"]')
+            if not save_btn:
+                continue
 
-                form_found = True
-                print(f"[5] Found encounter form, filling fields...")
+            form_found = True
+            print(f"[5] Found encounter form, filling fields...")
 
+            with TRACER.span("fill", timings):
                 # Fill visit category if provided
                 if visit_data.visit_category:
                     cat_select = await frame.query_selector('select[name*="category"], #pc_catid')
                     if cat_select:
                         await cat_select.select_option(label=visit_data.visit_category)
-                        await asyncio.sleep(0.3)
 
                 # Fill reason if provided
                 if visit_data.reason:
                     reason_input = await frame.query_selector('textarea[name*="reason"], #reason')
                     if reason_input:
                         await reason_input.fill(visit_data.reason)
-                        await asyncio.sleep(0.3)
 
-                # Click Save
-                print(f"[6] Saving encounter...")
+            # Click Save
+            print(f"[6] Saving encounter...")
+            with TRACER.span("save", timings):
                 await save_btn.click()
-                await asyncio.sleep(4)
+                await wait_for_network_quiet(page, quiet_ms=500, budget=budget)
+
+            result.success = True
+            result.message = "Encounter created successfully"
+            break
+
+        except Exception as e:
+            print(f"    Frame error: {str(e)[:50]}")
+            continue
+
+    if not form_found:
+        result.message = "Encounter form not found in any frame"
+
+    # Take screenshot if directory provided
+    if screenshot_dir:
+        screenshot_dir = Path(screenshot_dir)
+        screenshot_dir.mkdir(exist_ok=True)
+        screenshot_path = screenshot_dir / "create_visit_result.png"
+        with TRACER.span("screenshot", timings):
+            async with ROUTE_POLICY.lifted(page):
+                await page.screenshot(path=str(screenshot_path))
+        result.screenshot_path = str(screenshot_path)
+        print(f"[6] Screenshot saved: {screenshot_path}")
 
-                result.success = True
-                result.message = "Encounter created successfully"
-                break
+    return result
 
-            except Exception as e:
-                print(f"    Frame error: {str(e)[:50]}")
-                continue
 
-        if not form_found:
-            result.message = "Encounter form not found in any frame"
+async def create_visit(
+    patient_name: str,
+    visit_data: Optional[VisitData] = None,
+    username: str = "admin",
+    password: str = "pass",
+    headless: bool = False,
+    screenshot_dir: Optional[Path] = None
+) -> CreateVisitResult:
+    """
+    Create a new visit/encounter for a patient.
 
-        # Take screenshot if directory provided
-        if screenshot_dir:
-            screenshot_dir = Path(screenshot_dir)
-            screenshot_dir.mkdir(exist_ok=True)
-            screenshot_path = screenshot_dir / "create_visit_result.png"
-            await page.screenshot(path=str(screenshot_path))
-            result.screenshot_path = str(screenshot_path)
-            print(f"[6] Screenshot saved: {screenshot_path}")
+    Args:
+        patient_name: Name or partial name to search for patient
+        visit_data: Optional VisitData with encounter details
+        username: OpenEMR username
+        password: OpenEMR password
+        headless: Run browser in headless mode
+        screenshot_dir: Directory to save screenshots
 
-        return result
+    Returns:
+        CreateVisitResult with success status and details
+    """
+    async with AsyncCamoufox(**current_profile().launch_options(headless=headless)) as browser:
+        session = OpenEMRSession()
+        timings = {}
+        with TRACER.span("open_session", timings):
+            await session.open(browser, username, password)
+        page = session.page
+        page.set_default_timeout(10000)
 
+        result = await create_visit_on_page(
+            page, patient_name, visit_data, username, password, screenshot_dir
+        )
+        result.timings = {**timings, **result.timings}
+        await HAR_MODE.finish()
+        return result
 
 async def main():
     parser = argparse.ArgumentParser(description="Create a new visit/encounter in OpenEMR")
@@ -261,9 +419,25 @@ async def main():
     parser.add_argument("--username", default="admin", help="OpenEMR username")
     parser.add_argument("--password", default="pass", help="OpenEMR password")
     parser.add_argument("--headless", action="store_true", help="Run in headless mode")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help="Run profile: human (humanized cursor, hover clicks) or throughput (direct actions)")
     parser.add_argument("--screenshot-dir", default="visits_screenshots", help="Screenshot directory")
+    parser.add_argument("--trace", default=None, metavar="DIR",
+                        help="Record step and Playwright spans; write trace_summary.json and trace.json here")
+    har = parser.add_mutually_exclusive_group()
+    har.add_argument("--record-har", default=None, metavar="DIR",
+                     help="Record each browser context's traffic to a HAR file in DIR")
+    har.add_argument("--replay-har", default=None, metavar="FILE",
+                     help="Serve all browser traffic from a recorded HAR file (no network)")
 
     args = parser.parse_args()
+    use_profile(args.profile)
+    if args.trace:
+        TRACER.enable(args.trace)
+    if args.record_har:
+        HAR_MODE.record(args.record_har, "create_visit")
+    elif args.replay_har:
+        HAR_MODE.replay(args.replay_har)
 
     visit_data = VisitData(
         visit_category=args.category,
@@ -288,6 +462,16 @@ async def main():
     print(f"Message: {result.message}")
     if result.screenshot_path:
         print(f"Screenshot: {result.screenshot_path}")
+    if result.timings:
+        print(f"Timings: {format_timings(result.timings)}")
+    print(SESSION_CACHE.report())
+    print(NAV_INDEX.report())
+    print(PATIENT_CACHE.report())
+    print(ROUTE_POLICY.report())
+    print(TRACER.report())
+    print(HAR_MODE.report())
+    for path in TRACER.finish():
+        print(f"Trace written: {path}")
     print("="*60)
 
     return result
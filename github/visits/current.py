@@ -12,11 +12,33 @@ Usage:
 
 import asyncio
 import argparse
+import sys
 from pathlib import Path
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional, List, Dict
 from camoufox.async_api import AsyncCamoufox
 
+# Make the shared helpers importable when run as a script
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from emr_common.waits import (
+    WaitBudget,
+    wait_for_dom_settled,
+    wait_for_frame,
+    wait_for_network_quiet,
+)
+from emr_common.har_replay import HAR_MODE
+from emr_common.nav_index import NAV_INDEX
+from emr_common.patient_cache import PATIENT_CACHE
+from emr_common.route_policy import ROUTE_POLICY
+from emr_common.run_profile import DEFAULT_PROFILE, PROFILES, current_profile, use_profile
+from emr_common.session_cache import SESSION_CACHE
+from emr_common.tracing import TRACER, format_timings
+from visits.create_visit import OpenEMRSession
+from visits.encounter_extract import extract_encounter
+
 
 @dataclass
 class EncounterInfo:
@@ -35,80 +57,66 @@ class CurrentVisitResult:
     soap_notes: Optional[Dict] = None
     message: str = ""
     screenshot_path: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)   # step -> seconds
 
 
-async def get_current_visit(
+@TRACER.traced("get_current_visit")
+async def get_current_visit_on_page(
+    page,
     patient_name: str,
     encounter_date: Optional[str] = None,
     username: str = "admin",
     password: str = "pass",
-    headless: bool = False,
     screenshot_dir: Optional[Path] = None
 ) -> CurrentVisitResult:
     """
-    View the current/active encounter for a patient.
+    View the current/active encounter for a patient on an existing page.
+
+    Logs in only if the page is not already inside the OpenEMR app, so it
+    can run against a warm page such as the one held by start_server.py.
 
     Args:
+        page: Playwright page object (logged in or not)
         patient_name: Name or partial name to search for patient
         encounter_date: Optional specific encounter date to select
         username: OpenEMR username
         password: OpenEMR password
-        headless: Run browser in headless mode
         screenshot_dir: Directory to save screenshots
 
     Returns:
-        CurrentVisitResult with encounter details
+        CurrentVisitResult with encounter details (timings per step)
     """
     result = CurrentVisitResult(success=False)
+    timings = result.timings
 
-    async with AsyncCamoufox(headless=headless) as browser:
-        page = await browser.new_page()
-        page.set_default_timeout(10000)
+    budget = WaitBudget()
+    session = OpenEMRSession(budget=budget)
+    session.page = page
 
-        # Login
+    # Login (skipped when the page is already inside the app)
+    if not session.is_logged_in():
         print(f"[1] Logging in...")
-        await page.goto("https://demo.openemr.io/openemr/interface/login/login.php?site=default")
-        await asyncio.sleep(2)
-        await page.fill('#authUser', username)
-        await page.fill('#clearPass', password)
-        await page.click('#login-button')
-        await asyncio.sleep(4)
-
-        if 'login' in page.url.lower():
+        with TRACER.span("login", timings):
+            logged_in = await session.login(username, password)
+        if not logged_in:
             result.message = "Login failed"
             return result
 
-        # Select patient via Finder
-        print(f"[2] Selecting patient: {patient_name}")
-        await page.click('text=Finder')
-        await asyncio.sleep(5)
-
-        patient_found = False
-        for attempt in range(3):
-            for frame in page.frames:
-                try:
-                    link = await frame.query_selector(f'a:has-text("{patient_name}")')
-                    if link:
-                        await link.click()
-                        await asyncio.sleep(4)
-                        patient_found = True
-                        break
-                except:
-                    pass
-            if patient_found:
-                break
-            await asyncio.sleep(2)
-
-        if not patient_found:
-            result.message = f"Patient '{patient_name}' not found"
-            return result
+    # Select patient (cached pid, or via Finder)
+    print(f"[2] Selecting patient: {patient_name}")
+    with TRACER.span("select_patient", timings):
+        patient_found = await session.select_patient(patient_name)
+    if not patient_found:
+        result.message = f"Patient '{patient_name}' not found"
+        return result
 
-        # Select encounter from dropdown
-        print(f"[3] Selecting encounter...")
+    # Select encounter from dropdown
+    print(f"[3] Selecting encounter...")
+    with TRACER.span("select_encounter", timings):
         enc_btn = await page.query_selector('button:has-text("Select Encounter")')
         if enc_btn:
             await enc_btn.click()
-            await asyncio.sleep(1)
+            await wait_for_dom_settled(page, quiet_ms=150, timeout=1000)
 
             # Find and click encounter option
             options = await page.query_selector_all('.dropdown-item, .dropdown-menu a')
@@ -135,7 +143,7 @@ async def get_current_visit(
                     result.message = "No encounters available to select"
                     return result
 
-                await asyncio.sleep(3)
+                await wait_for_network_quiet(page, quiet_ms=500, budget=budget)
             else:
                 result.message = "No encounter dropdown options found"
                 return result
@@ -143,119 +151,87 @@ async def get_current_visit(
             result.message = "Select Encounter button not found"
             return result
 
-        # Navigate to Current
-        print(f"[4] Opening Current visit...")
-        await page.click('text=Patient')
-        await asyncio.sleep(0.5)
-
-        # Hover on Visits
-        visits_pos = await page.evaluate("""
-            () => {
-                const el = Array.from(document.querySelectorAll('.menuLabel'))
-                    .find(e => e.textContent.trim() === 'Visits');
-                if (el) {
-                    const r = el.getBoundingClientRect();
-                    return {x: r.x + r.width/2, y: r.y + r.height/2};
-                }
-                return null;
-            }
-        """)
-
-        if visits_pos:
-            await page.mouse.move(visits_pos['x'], visits_pos['y'])
-            await asyncio.sleep(0.5)
-
-        # Click Current
-        current_pos = await page.evaluate("""
-            () => {
-                const el = Array.from(document.querySelectorAll('.menuLabel'))
-                    .find(e => e.textContent.trim() === 'Current');
-                if (el && !el.classList.contains('menuDisabled')) {
-                    const r = el.getBoundingClientRect();
-                    return {x: r.x + r.width/2, y: r.y + r.height/2};
-                }
-                return null;
-            }
-        """)
-
-        if not current_pos:
-            result.message = "Current menu item not available (encounter may not be selected)"
-            return result
-
-        await page.mouse.click(current_pos['x'], current_pos['y'])
-        await asyncio.sleep(4)
-
-        # Extract visit information from frames
-        print(f"[5] Extracting visit data...")
-        for frame in page.frames:
-            try:
-                # Look for Visit Summary section
-                summary = await frame.evaluate("""
-                    () => {
-                        const data = {};
-
-                        // Get reason for visit
-                        const reason = document.querySelector('[class*="reason"], .visit-reason');
-                        if (reason) data.reason = reason.textContent.trim();
-
-                        // Get provider
-                        const provider = document.body.innerText.match(/(?:Provider|by)\\s*[:\\-]?\\s*([A-Za-z\\s,]+)/i);
-                        if (provider) data.provider = provider[1].trim();
-
-                        // Get patient type
-                        const patientType = document.body.innerText.match(/(Established Patient|New Patient)/i);
-                        if (patientType) data.patientType = patientType[1];
-
-                        return Object.keys(data).length > 0 ? data : null;
-                    }
-                """)
-
-                if summary:
-                    result.visit_summary = summary
-
-                # Look for SOAP notes
-                soap = await frame.evaluate("""
-                    () => {
-                        const data = {};
-                        const text = document.body.innerText;
-
-                        const subj = text.match(/Subjective[:\\s]+([^\\n]+)/i);
-                        if (subj) data.subjective = subj[1].trim();
-
-                        const obj = text.match(/Objective[:\\s]+([^\\n]+)/i);
-                        if (obj) data.objective = obj[1].trim();
-
-                        const assess = text.match(/Assessment[:\\s]+([^\\n]+)/i);
-                        if (assess) data.assessment = assess[1].trim();
+    # Navigate to Current
+    print(f"[4] Opening Current visit...")
+    with TRACER.span("navigate", timings):
+        opened = await session.navigate_to_menu("Patient", "Visits", "Current", wait_frame="encounter_top")
+    if not opened:
+        result.message = "Current menu item not available (encounter may not be selected)"
+        return result
 
-                        const plan = text.match(/Plan[:\\s]+([^\\n]+)/i);
-                        if (plan) data.plan = plan[1].trim();
+    with TRACER.span("wait_content", timings):
+        content_frame = await wait_for_frame(page, "encounter", budget=budget)
+        if content_frame:
+            await wait_for_dom_settled(content_frame, quiet_ms=300, budget=budget)
+        else:
+            await wait_for_network_quiet(page, quiet_ms=500, budget=budget)
+
+    # Extract visit information from the encounter frame
+    print(f"[5] Extracting visit data...")
+    try:
+        with TRACER.span("extract_encounter", timings):
+            data = await extract_encounter(page)
+    except Exception as e:
+        print(f"    Extraction error: {str(e)[:50]}")
+        data = None
+    if data:
+        result.visit_summary = data["summary"]
+        result.soap_notes = data["soap"]
+
+    result.success = True
+    result.message = "Current visit loaded successfully"
+
+    # Take screenshot
+    if screenshot_dir:
+        screenshot_dir = Path(screenshot_dir)
+        screenshot_dir.mkdir(exist_ok=True)
+        screenshot_path = screenshot_dir / "current_visit.png"
+        with TRACER.span("screenshot", timings):
+            async with ROUTE_POLICY.lifted(page):
+                await page.screenshot(path=str(screenshot_path))
+        result.screenshot_path = str(screenshot_path)
+        print(f"[6] Screenshot saved: {screenshot_path}")
 
-                        return Object.keys(data).length > 0 ? data : null;
-                    }
-                """)
+    return result
 
-                if soap:
-                    result.soap_notes = soap
 
-            except:
-                continue
+async def get_current_visit(
+    patient_name: str,
+    encounter_date: Optional[str] = None,
+    username: str = "admin",
+    password: str = "pass",
+    headless: bool = False,
+    screenshot_dir: Optional[Path] = None
+) -> CurrentVisitResult:
+    """
+    View the current/active encounter for a patient.
 
-        result.success = True
-        result.message = "Current visit loaded successfully"
+    Args:
+        patient_name: Name or partial name to search for patient
+        encounter_date: Optional specific encounter date to select
+        username: OpenEMR username
+        password: OpenEMR password
+        headless: Run browser in headless mode
+        screenshot_dir: Directory to save screenshots
 
-        # Take screenshot
-        if screenshot_dir:
-            screenshot_dir = Path(screenshot_dir)
-            screenshot_dir.mkdir(exist_ok=True)
-            screenshot_path = screenshot_dir / "current_visit.png"
-            await page.screenshot(path=str(screenshot_path))
-            result.screenshot_path = str(screenshot_path)
-            print(f"[6] Screenshot saved: {screenshot_path}")
+    Returns:
+        CurrentVisitResult with encounter details
+    """
+    async with AsyncCamoufox(**current_profile().launch_options(headless=headless)) as browser:
+        session = OpenEMRSession()
+        timings = {}
+        with TRACER.span("open_session", timings):
+            await session.open(browser, username, password)
+        page = session.page
+        page.set_default_timeout(10000)
 
+        result = await get_current_visit_on_page(
+            page, patient_name, encounter_date, username, password, screenshot_dir
+        )
+        result.timings = {**timings, **result.timings}
+        await HAR_MODE.finish()
         return result
 
-
 async def main():
     parser = argparse.ArgumentParser(description="View current encounter in OpenEMR")
     parser.add_argument("--patient", required=True, help="Patient name to search for")
@@ -263,9 +239,25 @@ async def main():
     parser.add_argument("--username", default="admin", help="OpenEMR username")
     parser.add_argument("--password", default="pass", help="OpenEMR password")
     parser.add_argument("--headless", action="store_true", help="Run in headless mode")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help="Run profile: human (humanized cursor, hover clicks) or throughput (direct actions)")
     parser.add_argument("--screenshot-dir", default="visits_screenshots", help="Screenshot directory")
+    parser.add_argument("--trace", default=None, metavar="DIR",
+                        help="Record step and Playwright spans; write trace_summary.json and trace.json here")
+    har = parser.add_mutually_exclusive_group()
+    har.add_argument("--record-har", default=None, metavar="DIR",
+                     help="Record each browser context's traffic to a HAR file in DIR")
+    har.add_argument("--replay-har", default=None, metavar="FILE",
+                     help="Serve all browser traffic from a recorded HAR file (no network)")
 
     args = parser.parse_args()
+    use_profile(args.profile)
+    if args.trace:
+        TRACER.enable(args.trace)
+    if args.record_har:
+        HAR_MODE.record(args.record_har, "current_visit")
+    elif args.replay_har:
+        HAR_MODE.replay(args.replay_har)
 
     print("="*60)
     print("CURRENT VISIT - OpenEMR Automation")
@@ -291,6 +283,16 @@ async def main():
         print(f"SOAP Notes: {result.soap_notes}")
     if result.screenshot_path:
         print(f"Screenshot: {result.screenshot_path}")
+    if result.timings:
+        print(f"Timings: {format_timings(result.timings)}")
+    print(SESSION_CACHE.report())
+    print(NAV_INDEX.report())
+    print(PATIENT_CACHE.report())
+    print(ROUTE_POLICY.report())
+    print(TRACER.report())
+    print(HAR_MODE.report())
+    for path in TRACER.finish():
+        print(f"Trace written: {path}")
     print("="*60)
 
     return result
@@ -0,0 +1,46 @@
+"""
+Encounter Extraction
+
+Reads the visit summary and SOAP notes of the open encounter with one script
+call in one frame:
+
+- The encounter frame comes from the page's FrameRegistry (no frame scan);
+  when it holds the encounter forms in a child frame (forms.php), that child
+  is used.
+- One helper, extractEncounter from the preinstalled bundle
+  (emr_common/helpers.js), returns summary and SOAP sections together.
+  Section bodies run from their heading to the next SOAP heading or form
+  title, so multi-line notes are kept whole.
+"""
+from emr_common import js_helpers
+from emr_common.frame_registry import frame_registry
+
+
+def encounter_frame(page):
+    """The frame showing the encounter forms, or None"""
+    registry = frame_registry(page)
+    frame = registry.get("encounter")
+    if frame is None:
+        return registry.get("forms.php")
+    for child in frame.child_frames:
+        if "forms.php" in child.url:
+            return child
+    return frame
+
+
+async def extract_encounter(page, frame=None) -> dict:
+    """
+    Visit summary and SOAP notes of the open encounter
+
+    Args:
+        page: Playwright page showing Patient > Visits > Current
+        frame: Encounter frame, if already known
+
+    Returns:
+        dict with "summary" and "soap" (each a dict or None), or None if no
+        encounter frame is loaded
+    """
+    frame = frame or encounter_frame(page)
+    if frame is None:
+        return None
+    return await js_helpers.call(frame, "extractEncounter")
@@ -7,16 +7,45 @@ Retrieves the visit history for a selected patient.
 Usage:
     uv run python visits/visit_history.py --patient "Belford"
     uv run python visits/visit_history.py --patient "Belford" --output visits.json
+    uv run python visits/visit_history.py --patients-file patients.txt --output histories.jsonl --contexts 3
+    uv run python visits/visit_history.py --patients-file patients.txt --output histories.jsonl --http
 """
 
 import asyncio
 import argparse
+import sys
 import json
+import re
+import time
+from html.parser import HTMLParser
 from pathlib import Path
-from dataclasses import dataclass, asdict
-from typing import Optional, List
+from dataclasses import dataclass, asdict, field
+from typing import Dict, Optional, List
 from camoufox.async_api import AsyncCamoufox
 
+# Make the shared helpers importable when run as a script
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from emr_common.waits import (
+    WaitBudget,
+    wait_for_dom_settled,
+    wait_for_frame,
+    wait_for_network_quiet,
+)
+from emr_common.http_client import open_http_client
+from emr_common import BASE_URL, js_helpers
+from emr_common.frame_registry import frame_registry
+from emr_common.har_replay import HAR_MODE
+from emr_common.nav_index import NAV_INDEX
+from emr_common.patient_cache import DEMOGRAPHICS_PATH, PATIENT_CACHE, normalize_name
+from emr_common.route_policy import ROUTE_POLICY
+from emr_common.run_profile import DEFAULT_PROFILE, PROFILES, current_profile, use_profile
+from emr_common.session_cache import SESSION_CACHE
+from emr_common.tracing import TRACER, format_timings
+from visits.create_visit import OpenEMRSession
+
 
 @dataclass
 class VisitRecord:
@@ -37,165 +66,272 @@ class VisitHistoryResult:
     visits: List[VisitRecord] = None
     message: str = ""
     screenshot_path: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)   # step -> seconds
 
     def __post_init__(self):
         if self.visits is None:
             self.visits = []
 
 
-async def get_visit_history(
+# Rules shared with the in-browser extraction: the visit table is the first
+# table with a "Date" header, and visit rows start with a YYYY-MM-DD cell
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+ENCOUNTERS_PATH = "/interface/patient_file/history/encounters.php"
+
+
+class TableParser(HTMLParser):
+    """
+    Collects every table of a page as header texts and rows of cell texts
+
+    Cell text is the concatenated text of everything inside the cell, like
+    textContent in the browser. Tables are kept in document order.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tables = []
+        self.open = []
+
+    def _close_cell(self, table):
+        if table["cell"] is not None:
+            text = "".join(table["cell"]).strip()
+            if table["cell_tag"] == "th":
+                table["headers"].append(text)
+            elif table["row"] is not None:
+                table["row"].append(text)
+            table["cell"] = None
+
+    def _close_row(self, table):
+        self._close_cell(table)
+        if table["row"] is not None:
+            table["rows"].append(table["row"])
+            table["row"] = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            table = {"headers": [], "rows": [], "row": None, "cell": None, "cell_tag": None}
+            self.tables.append(table)
+            self.open.append(table)
+        elif self.open and tag == "tr":
+            self._close_row(self.open[-1])
+            self.open[-1]["row"] = []
+        elif self.open and tag in ("td", "th"):
+            table = self.open[-1]
+            self._close_cell(table)
+            if table["row"] is None:
+                table["row"] = []
+            table["cell"] = []
+            table["cell_tag"] = tag
+
+    def handle_endtag(self, tag):
+        if not self.open:
+            return
+        if tag in ("td", "th"):
+            self._close_cell(self.open[-1])
+        elif tag == "tr":
+            self._close_row(self.open[-1])
+        elif tag == "table":
+            self._close_row(self.open.pop())
+
+    def handle_data(self, data):
+        # Text counts for every enclosing cell, as with nested textContent
+        for table in self.open:
+            if table["cell"] is not None:
+                table["cell"].append(data)
+
+
+def parse_visit_history(html: str) -> List[VisitRecord]:
+    """Visit records from encounters.php HTML"""
+    parser = TableParser()
+    parser.feed(html)
+    parser.close()
+
+    for table in parser.tables:
+        if "Date" not in table["headers"]:
+            continue
+        visits = []
+        for cells in table["rows"]:
+            if len(cells) >= 4 and DATE_PATTERN.match(cells[0]):
+                visits.append(VisitRecord(
+                    date=cells[0],
+                    issue=cells[1],
+                    reason_form=cells[2],
+                    provider=cells[3],
+                    billing=cells[4] if len(cells) > 4 else ""
+                ))
+        return visits
+    return []
+
+
+class HttpHistoryReader:
+    """
+    Reads visit history over HTTP with the session of a logged-in browser context
+
+    The active patient is PHP session state, so reads are serialized: each
+    read sets the patient (demographics.php?set_pid=) and then fetches
+    encounters.php over the same keep-alive connection.
+    """
+
+    def __init__(self, base_url: str = BASE_URL, timeout: float = 30.0):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.client = None
+        self.lock = asyncio.Lock()
+
+    async def open(self, context):
+        self.client = await open_http_client(context, self.base_url, max_connections=2, timeout=self.timeout)
+        return self
+
+    async def close(self):
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+
+    async def read(self, pid: str, patient_name: str) -> Optional[List[VisitRecord]]:
+        """
+        Visit records for a patient
+
+        Returns:
+            list of VisitRecord, or None on any unexpected response (logged
+            out, or the pid no longer shows patient_name)
+        """
+        async with self.lock:
+            response = await self.client.get(f"{DEMOGRAPHICS_PATH}?set_pid={pid}")
+            if response.status_code != 200 or normalize_name(patient_name) not in normalize_name(response.text):
+                return None
+            response = await self.client.get(ENCOUNTERS_PATH)
+            if response.status_code != 200:
+                return None
+        return parse_visit_history(response.text)
+
+
+@TRACER.traced("get_visit_history_http")
+async def get_visit_history_http_on_page(
+    page,
+    patient_name: str,
+    reader: HttpHistoryReader,
+    username: str = "admin",
+    password: str = "pass"
+) -> VisitHistoryResult:
+    """
+    Get visit history over HTTP, using the page only when it has to.
+
+    The pid comes from the patient cache; on a miss one Finder lookup in the
+    browser resolves (and caches) it. If the HTTP read fails the full browser
+    path is used instead.
+
+    Args:
+        page: Playwright page of the context the reader was opened with
+        patient_name: Name or partial name to search for patient
+        reader: Open HttpHistoryReader
+        username: OpenEMR username
+        password: OpenEMR password
+
+    Returns:
+        VisitHistoryResult with list of visits
+    """
+    result = VisitHistoryResult(success=False, patient_name=patient_name)
+
+    pid = PATIENT_CACHE.get(reader.base_url, patient_name)
+    if not pid:
+        session = OpenEMRSession(base_url=reader.base_url)
+        session.page = page
+        with TRACER.span("select_patient", result.timings):
+            if session.is_logged_in() or await session.login(username, password):
+                if await session.select_patient(patient_name):
+                    pid = PATIENT_CACHE.get(reader.base_url, patient_name)
+
+    if pid:
+        try:
+            with TRACER.span("http_read", result.timings):
+                visits = await reader.read(pid, patient_name)
+        except Exception as e:
+            print(f"    HTTP read failed: {e}")
+            visits = None
+        if visits is not None:
+            result.visits = visits
+            result.total_visits = len(visits)
+            result.success = True
+            result.message = f"Found {result.total_visits} visit(s)"
+            return result
+        PATIENT_CACHE.invalidate(reader.base_url, patient_name)
+
+    print(f"    Reading visit history for {patient_name} in the browser")
+    fallback = await get_visit_history_on_page(page, patient_name, username, password)
+    fallback.timings = {**result.timings, **fallback.timings}
+    return fallback
+
+
+@TRACER.traced("get_visit_history")
+async def get_visit_history_on_page(
+    page,
     patient_name: str,
     username: str = "admin",
     password: str = "pass",
-    headless: bool = False,
     screenshot_dir: Optional[Path] = None
 ) -> VisitHistoryResult:
     """
-    Get visit history for a patient.
+    Get visit history for a patient on an existing page.
+
+    Logs in only if the page is not already inside the OpenEMR app, so it
+    can run against a warm page such as the one held by start_server.py.
 
     Args:
+        page: Playwright page object (logged in or not)
         patient_name: Name or partial name to search for patient
         username: OpenEMR username
         password: OpenEMR password
-        headless: Run browser in headless mode
         screenshot_dir: Directory to save screenshots
 
     Returns:
-        VisitHistoryResult with list of visits
+        VisitHistoryResult with list of visits (timings per step)
     """
     result = VisitHistoryResult(success=False, patient_name=patient_name)
+    timings = result.timings
 
-    async with AsyncCamoufox(headless=headless) as browser:
-        page = await browser.new_page()
-        page.set_default_timeout(10000)
+    budget = WaitBudget()
+    session = OpenEMRSession(budget=budget)
+    session.page = page
 
-        # Login
+    # Login (skipped when the page is already inside the app)
+    if not session.is_logged_in():
         print(f"[1] Logging in...")
-        await page.goto("https://demo.openemr.io/openemr/interface/login/login.php?site=default")
-        await asyncio.sleep(2)
-        await page.fill('#authUser', username)
-        await page.fill('#clearPass', password)
-        await page.click('#login-button')
-        await asyncio.sleep(4)
-
-        if 'login' in page.url.lower():
+        with TRACER.span("login", timings):
+            logged_in = await session.login(username, password)
+        if not logged_in:
             result.message = "Login failed"
             return result
 
-        # Select patient via Finder
-        print(f"[2] Selecting patient: {patient_name}")
-        await page.click('text=Finder')
-        await asyncio.sleep(5)
-
-        patient_found = False
-        for attempt in range(3):
-            for frame in page.frames:
-                try:
-                    link = await frame.query_selector(f'a:has-text("{patient_name}")')
-                    if link:
-                        await link.click()
-                        await asyncio.sleep(4)
-                        patient_found = True
-                        break
-                except:
-                    pass
-            if patient_found:
-                break
-            await asyncio.sleep(2)
-
-        if not patient_found:
-            result.message = f"Patient '{patient_name}' not found"
-            return result
-
-        # Navigate to Visit History
-        print(f"[3] Opening Visit History...")
-        await page.click('text=Patient')
-        await asyncio.sleep(0.5)
-
-        # Hover on Visits
-        visits_pos = await page.evaluate("""
-            () => {
-                const el = Array.from(document.querySelectorAll('.menuLabel'))
-                    .find(e => e.textContent.trim() === 'Visits');
-                if (el) {
-                    const r = el.getBoundingClientRect();
-                    return {x: r.x + r.width/2, y: r.y + r.height/2};
-                }
-                return null;
-            }
-        """)
-
-        if visits_pos:
-            await page.mouse.move(visits_pos['x'], visits_pos['y'])
-            await asyncio.sleep(0.5)
-
-        # Click Visit History
-        vh_pos = await page.evaluate("""
-            () => {
-                const el = Array.from(document.querySelectorAll('.menuLabel'))
-                    .find(e => e.textContent.trim() === 'Visit History');
-                if (el && !el.classList.contains('menuDisabled')) {
-                    const r = el.getBoundingClientRect();
-                    return {x: r.x + r.width/2, y: r.y + r.height/2};
-                }
-                return null;
-            }
-        """)
-
-        if not vh_pos:
-            result.message = "Visit History menu item not available"
-            return result
+    # Select patient (cached pid, or via Finder)
+    print(f"[2] Selecting patient: {patient_name}")
+    with TRACER.span("select_patient", timings):
+        patient_found = await session.select_patient(patient_name)
+    if not patient_found:
+        result.message = f"Patient '{patient_name}' not found"
+        return result
 
-        await page.mouse.click(vh_pos['x'], vh_pos['y'])
-        await asyncio.sleep(4)
+    # Navigate to Visit History
+    print(f"[3] Opening Visit History...")
+    with TRACER.span("navigate", timings):
+        opened = await session.navigate_to_menu("Patient", "Visits", "Visit History", wait_frame="encounters.php")
+    if not opened:
+        result.message = "Visit History menu item not available"
+        return result
 
-        # Extract visit history from frames
-        print(f"[4] Extracting visit history...")
-        for frame in page.frames:
+    with TRACER.span("wait_content", timings):
+        content_frame = await wait_for_frame(page, "visit_history", budget=budget)
+        if content_frame:
+            await wait_for_dom_settled(content_frame, quiet_ms=300, budget=budget)
+        else:
+            await wait_for_network_quiet(page, quiet_ms=500, budget=budget)
+
+    # Extract visit history from frames
+    print(f"[4] Extracting visit history...")
+    with TRACER.span("extract_history", timings):
+        for frame in frame_registry(page).candidates("visit_history"):
             try:
                 # Look for table with visits - check for Date column header
-                visits_data = await frame.evaluate("""
-                    () => {
-                        // Find the correct table by looking for 'Date' header
-                        const tables = document.querySelectorAll('table');
-                        let visitTable = null;
-
-                        for (const table of tables) {
-                            const headers = table.querySelectorAll('th');
-                            for (const th of headers) {
-                                if (th.textContent.trim() === 'Date') {
-                                    visitTable = table;
-                                    break;
-                                }
-                            }
-                            if (visitTable) break;
-                        }
-
-                        if (!visitTable) return null;
-
-                        const visits = [];
-                        const rows = visitTable.querySelectorAll('tbody tr, tr:not(:first-child)');
-
-                        for (const row of rows) {
-                            const cells = row.querySelectorAll('td');
-                            if (cells.length >= 4) {
-                                const date = cells[0]?.textContent?.trim() || '';
-                                // Skip if date doesn't look like a date (e.g., "M" from calendar)
-                                if (date && date.match(/^\\d{4}-\\d{2}-\\d{2}$/)) {
-                                    visits.push({
-                                        date: date,
-                                        issue: cells[1]?.textContent?.trim() || '',
-                                        reason_form: cells[2]?.textContent?.trim() || '',
-                                        provider: cells[3]?.textContent?.trim() || '',
-                                        billing: cells[4]?.textContent?.trim() || ''
-                                    });
-                                }
-                            }
-                        }
-
-                        return visits.length > 0 ? visits : null;
-                    }
-                """)
+                visits_data = await js_helpers.call(frame, "visitRows")
 
                 if visits_data:
                     result.visits = [VisitRecord(**v) for v in visits_data]
@@ -205,31 +341,239 @@ async def get_visit_history(
             except Exception as e:
                 continue
 
-        result.success = True
-        result.message = f"Found {result.total_visits} visit(s)"
+    result.success = True
+    result.message = f"Found {result.total_visits} visit(s)"
+
+    # Take screenshot
+    if screenshot_dir:
+        screenshot_dir = Path(screenshot_dir)
+        screenshot_dir.mkdir(exist_ok=True)
+        screenshot_path = screenshot_dir / "visit_history.png"
+        with TRACER.span("screenshot", timings):
+            async with ROUTE_POLICY.lifted(page):
+                await page.screenshot(path=str(screenshot_path))
+        result.screenshot_path = str(screenshot_path)
+        print(f"[5] Screenshot saved: {screenshot_path}")
+
+    return result
 
-        # Take screenshot
-        if screenshot_dir:
-            screenshot_dir = Path(screenshot_dir)
-            screenshot_dir.mkdir(exist_ok=True)
-            screenshot_path = screenshot_dir / "visit_history.png"
-            await page.screenshot(path=str(screenshot_path))
-            result.screenshot_path = str(screenshot_path)
-            print(f"[5] Screenshot saved: {screenshot_path}")
 
+async def get_visit_history(
+    patient_name: str,
+    username: str = "admin",
+    password: str = "pass",
+    headless: bool = False,
+    screenshot_dir: Optional[Path] = None,
+    http: bool = False
+) -> VisitHistoryResult:
+    """
+    Get visit history for a patient.
+
+    Args:
+        patient_name: Name or partial name to search for patient
+        username: OpenEMR username
+        password: OpenEMR password
+        headless: Run browser in headless mode
+        screenshot_dir: Directory to save screenshots
+        http: Read the history over HTTP (needs httpx), falling back to the browser
+
+    Returns:
+        VisitHistoryResult with list of visits
+    """
+    async with AsyncCamoufox(**current_profile().launch_options(headless=headless)) as browser:
+        session = OpenEMRSession()
+        timings = {}
+        with TRACER.span("open_session", timings):
+            await session.open(browser, username, password)
+        page = session.page
+        page.set_default_timeout(10000)
+
+        if http:
+            try:
+                reader = await HttpHistoryReader(session.base_url).open(session.context)
+            except ImportError as e:
+                print(f"{e} - using the browser only")
+            else:
+                try:
+                    result = await get_visit_history_http_on_page(page, patient_name, reader, username, password)
+                    result.timings = {**timings, **result.timings}
+                    await HAR_MODE.finish()
+                    return result
+                finally:
+                    await reader.close()
+
+        result = await get_visit_history_on_page(
+            page, patient_name, username, password, screenshot_dir
+        )
+        result.timings = {**timings, **result.timings}
+        await HAR_MODE.finish()
         return result
 
 
+def load_patients(path: Path) -> List[str]:
+    """
+    Read patient names from a file
+
+    Accepts a JSON list (of names, or of objects with "patient_name" or
+    "name") or plain text with one name per line.
+    """
+    text = Path(path).read_text()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return [line.strip() for line in text.splitlines() if line.strip() and not line.startswith("#")]
+    return [p if isinstance(p, str) else p.get("patient_name") or p.get("name") for p in data]
+
+
+def completed_patients(output: Path) -> set:
+    """Patients that already have a successful record in a JSONL output file"""
+    done = set()
+    if not Path(output).exists():
+        return done
+    with open(output) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partial line from an interrupted run
+            if record.get("success"):
+                done.add(record["patient_name"])
+    return done
+
+
+async def get_visit_history_batch(
+    patients: List[str],
+    output: Path,
+    username: str = "admin",
+    password: str = "pass",
+    headless: bool = False,
+    contexts: int = 1,
+    resume: bool = True,
+    http: bool = False
+) -> dict:
+    """
+    Get visit histories for many patients in one browser session.
+
+    Each VisitHistoryResult is appended to the JSONL output as soon as it
+    completes. With resume, patients that already have a successful record
+    in the output are skipped, so a crashed run continues where it stopped.
+
+    Args:
+        patients: Patient names to look up
+        output: JSONL file to append results to
+        username: OpenEMR username
+        password: OpenEMR password
+        headless: Run browser in headless mode
+        contexts: Number of logged-in browser contexts to work with; each
+            logs in with its own PHP session, since the active patient is
+            session state
+        resume: Skip patients already completed in output
+        http: Read histories over HTTP from one context (needs httpx); the
+            patient is session state, so contexts is ignored
+
+    Returns:
+        dict with total, completed, failed, skipped and elapsed_seconds
+    """
+    output = Path(output)
+    done = completed_patients(output) if resume else set()
+    queue = asyncio.Queue()
+    for name in dict.fromkeys(patients):
+        if name not in done:
+            queue.put_nowait(name)
+
+    summary = {"total": len(patients), "completed": 0, "failed": 0,
+               "skipped": len(patients) - queue.qsize()}
+    started = time.perf_counter()
+
+    async with AsyncCamoufox(**current_profile().launch_options(headless=headless)) as browser:
+        # The first context may reuse a cached session; the others log in on
+        # their own, so no two workers share a PHP session (and active patient)
+        sessions = []
+        for i in range(1 if http else max(1, min(contexts, queue.qsize()))):
+            session = OpenEMRSession()
+            if await session.open(browser, username, password, fresh=i > 0):
+                session.page.set_default_timeout(10000)
+                sessions.append(session)
+
+        if not sessions:
+            summary["message"] = "Login failed"
+            await HAR_MODE.finish()
+            return summary
+
+        reader = None
+        if http:
+            try:
+                reader = await HttpHistoryReader(sessions[0].base_url).open(sessions[0].context)
+            except ImportError as e:
+                print(f"{e} - using the browser only")
+
+        with open(output, "a") as out:
+            async def worker(session):
+                while not queue.empty():
+                    name = queue.get_nowait()
+                    try:
+                        if reader:
+                            result = await get_visit_history_http_on_page(session.page, name, reader,
+                                                                          username, password)
+                        else:
+                            result = await get_visit_history_on_page(session.page, name, username, password)
+                    except Exception as e:
+                        result = VisitHistoryResult(success=False, patient_name=name, message=str(e))
+
+                    out.write(json.dumps(asdict(result)) + "\n")
+                    out.flush()
+                    summary["completed" if result.success else "failed"] += 1
+                    print(f"  [{summary['completed'] + summary['failed']}/{summary['total'] - summary['skipped']}] "
+                          f"{name}: {result.message}")
+
+            await asyncio.gather(*(worker(s) for s in sessions))
+
+        if reader:
+            await reader.close()
+        for session in sessions:
+            await session.context.close()
+
+    summary["elapsed_seconds"] = round(time.perf_counter() - started, 2)
+    return summary
+
+
 async def main():
     parser = argparse.ArgumentParser(description="Get visit history from OpenEMR")
-    parser.add_argument("--patient", required=True, help="Patient name to search for")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--patient", help="Patient name to search for")
+    target.add_argument("--patients-file", help="File of patient names (JSON list or one per line) for a batch run")
     parser.add_argument("--username", default="admin", help="OpenEMR username")
     parser.add_argument("--password", default="pass", help="OpenEMR password")
     parser.add_argument("--headless", action="store_true", help="Run in headless mode")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help="Run profile: human (humanized cursor, hover clicks) or throughput (direct actions)")
     parser.add_argument("--screenshot-dir", default="visits_screenshots", help="Screenshot directory")
-    parser.add_argument("--output", default=None, help="Output JSON file for visit data")
+    parser.add_argument("--output", default=None,
+                        help="Output JSON file for visit data (JSONL, appended, with --patients-file)")
+    parser.add_argument("--contexts", type=int, default=1, help="Concurrent browser contexts for a batch run")
+    parser.add_argument("--http", action="store_true",
+                        help="Read histories over HTTP with the browser session's cookies (needs httpx)")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Reprocess patients already completed in the batch output")
+    parser.add_argument("--trace", default=None, metavar="DIR",
+                        help="Record step and Playwright spans; write trace_summary.json and trace.json here")
+    har = parser.add_mutually_exclusive_group()
+    har.add_argument("--record-har", default=None, metavar="DIR",
+                     help="Record each browser context's traffic to a HAR file in DIR")
+    har.add_argument("--replay-har", default=None, metavar="FILE",
+                     help="Serve all browser traffic from a recorded HAR file (no network)")
 
     args = parser.parse_args()
+    use_profile(args.profile)
+    if args.trace:
+        TRACER.enable(args.trace)
+    if args.record_har:
+        HAR_MODE.record(args.record_har, "visit_history")
+    elif args.replay_har:
+        HAR_MODE.replay(args.replay_har)
+
+    if args.patients_file:
+        return await batch_main(args)
 
     print("="*60)
     print("VISIT HISTORY - OpenEMR Automation")
@@ -240,7 +584,8 @@ async def main():
         username=args.username,
         password=args.password,
         headless=args.headless,
-        screenshot_dir=args.screenshot_dir
+        screenshot_dir=args.screenshot_dir,
+        http=args.http
     )
 
     print("\n" + "="*60)
@@ -256,6 +601,16 @@ async def main():
 
     if result.screenshot_path:
         print(f"\nScreenshot: {result.screenshot_path}")
+    if result.timings:
+        print(f"Timings: {format_timings(result.timings)}")
+    print(SESSION_CACHE.report())
+    print(NAV_INDEX.report())
+    print(PATIENT_CACHE.report())
+    print(ROUTE_POLICY.report())
+    print(TRACER.report())
+    print(HAR_MODE.report())
+    for path in TRACER.finish():
+        print(f"Trace written: {path}")
     print("="*60)
 
     # Save to JSON if requested
@@ -272,5 +627,45 @@ async def main():
     return result
 
 
+async def batch_main(args):
+    patients = load_patients(args.patients_file)
+    output = Path(args.output or "visit_history.jsonl")
+
+    print("="*60)
+    print("VISIT HISTORY BATCH - OpenEMR Automation")
+    print("="*60)
+    print(f"Patients: {len(patients)} -> {output}")
+
+    summary = await get_visit_history_batch(
+        patients,
+        output,
+        username=args.username,
+        password=args.password,
+        headless=args.headless,
+        contexts=args.contexts,
+        resume=not args.no_resume,
+        http=args.http
+    )
+
+    print("\n" + "="*60)
+    print(f"Completed: {summary['completed']}")
+    print(f"Failed: {summary['failed']}")
+    print(f"Skipped (already done): {summary['skipped']}")
+    if "elapsed_seconds" in summary:
+        print(f"Elapsed: {summary['elapsed_seconds']}s")
+    if summary.get("message"):
+        print(f"Message: {summary['message']}")
+    print(SESSION_CACHE.report())
+    print(NAV_INDEX.report())
+    print(PATIENT_CACHE.report())
+    print(ROUTE_POLICY.report())
+    print(TRACER.report())
+    print(HAR_MODE.report())
+    for path in TRACER.finish():
+        print(f"Trace written: {path}")
+    print("="*60)
+    return summary
+
+
 if __name__ == "__main__":
     asyncio.run(main())